@@ -0,0 +1,421 @@
+# benchmarks/rendimiento.py
+"""
+Benchmark de carga, ajuste a nodos, ruteo y generación de mapas.
+
+Corre sin conexión sobre el grafo guardado de Puno (datos/puno.graphml, si
+existe) y sobre grafos sintéticos (rejilla y aleatorio) de tamaño creciente.
+Mide latencia (percentiles), memoria pico y nodos asentados de cada etapa y
+escribe el resultado en JSON para comparar versiones:
+
+    python benchmarks/rendimiento.py --salida actual.json
+    python benchmarks/rendimiento.py --salida nuevo.json --comparar actual.json
+
+Todo se ejecuta en un directorio temporal: no modifica datos/, templates/
+ni la caché de rutas del proyecto.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import networkx as nx
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Centro de los grafos sintéticos (Puno) y separación aproximada entre nodos
+CENTRO_LAT = -15.8402
+CENTRO_LON = -70.0219
+SEPARACION_M = 80
+VELOCIDADES_KPH = [25, 30, 40, 50]
+
+PERCENTILES = [50, 90, 95, 99]
+
+def _resumen(valores, escala=1.0, decimales=3):
+    """
+    min, percentiles, max y media de una lista de valores
+    """
+    arreglo = np.asarray(valores, dtype=np.float64) * escala
+    resumen = {'min': round(float(arreglo.min()), decimales)}
+    for p in PERCENTILES:
+        resumen[f'p{p}'] = round(float(np.percentile(arreglo, p)), decimales)
+    resumen['max'] = round(float(arreglo.max()), decimales)
+    resumen['media'] = round(float(arreglo.mean()), decimales)
+    return resumen
+
+def _silencioso(funcion, *args):
+    # Las funciones del proyecto informan por consola; no interesa en el benchmark
+    with contextlib.redirect_stdout(io.StringIO()):
+        return funcion(*args)
+
+def medir(funcion, repeticiones, preparar=None):
+    """
+    Ejecuta funcion(*preparar(i)) repeticiones veces y devuelve
+    (tiempos en segundos, resultados). preparar queda fuera del tiempo medido.
+    """
+    tiempos, resultados = [], []
+    for i in range(repeticiones):
+        args = preparar(i) if preparar else ()
+        inicio = time.perf_counter()
+        resultados.append(_silencioso(funcion, *args))
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos, resultados
+
+def memoria_pico(funcion, preparar=None, indice=0):
+    """
+    Memoria pico (KB) asignada por Python durante una ejecución extra de la etapa
+    (con los argumentos preparar(indice)). Se mide aparte porque tracemalloc
+    hace más lenta la ejecución.
+    """
+    args = preparar(indice) if preparar else ()
+    tracemalloc.start()
+    try:
+        _silencioso(funcion, *args)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(pico / 1024, 1)
+
+def etapa(funcion, repeticiones, preparar=None, asentados=None):
+    """
+    Mide una etapa: latencia en ms, memoria pico y, si se indica, los nodos
+    asentados de cada repetición (asentados(resultado) → int).
+    La ejecución de memoria usa preparar(repeticiones), así no repite argumentos.
+    """
+    tiempos, resultados = medir(funcion, repeticiones, preparar)
+    datos = {
+        'repeticiones': repeticiones,
+        'latencia_ms': _resumen(tiempos, 1000),
+        'memoria_pico_kb': memoria_pico(funcion, preparar, repeticiones)
+    }
+    if asentados is not None:
+        datos['nodos_asentados'] = _resumen([asentados(r) for r in resultados], decimales=1)
+    return datos, resultados
+
+# Grafos sintéticos
+
+def _coordenadas(fila, columna, lado):
+    paso_lat = SEPARACION_M / 111320.0
+    paso_lon = paso_lat / math.cos(math.radians(CENTRO_LAT))
+    return (CENTRO_LAT + (fila - lado / 2) * paso_lat,
+            CENTRO_LON + (columna - lado / 2) * paso_lon)
+
+def _agregar_via(G, u, v, rng, un_sentido=False):
+    from grafo.utilidades import distancia_haversine
+
+    longitud = distancia_haversine(G.nodes[u]['y'], G.nodes[u]['x'],
+                                   G.nodes[v]['y'], G.nodes[v]['x'])
+    velocidad = rng.choice(VELOCIDADES_KPH)
+    datos = {'length': longitud, 'speed_kph': float(velocidad),
+             'travel_time': longitud / (velocidad / 3.6), 'highway': 'residential'}
+    G.add_edge(u, v, 0, **datos)
+    if not un_sentido:
+        G.add_edge(v, u, 0, **dict(datos))
+
+def grafo_rejilla(num_nodos, semilla=0):
+    """
+    Rejilla de calles con coordenadas ligeramente desplazadas, velocidades
+    variadas y un 10% de vías de un solo sentido
+    """
+    rng = random.Random(semilla)
+    lado = max(2, int(math.sqrt(num_nodos)))
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    for fila in range(lado):
+        for columna in range(lado):
+            lat, lon = _coordenadas(fila + rng.uniform(-0.2, 0.2), columna + rng.uniform(-0.2, 0.2), lado)
+            G.add_node(fila * lado + columna + 1, y=lat, x=lon)
+    for fila in range(lado):
+        for columna in range(lado):
+            nodo = fila * lado + columna + 1
+            if columna + 1 < lado:
+                _agregar_via(G, nodo, nodo + 1, rng, rng.random() < 0.1)
+            if fila + 1 < lado:
+                _agregar_via(G, nodo, nodo + lado, rng, rng.random() < 0.1)
+    return G
+
+def grafo_aleatorio(num_nodos, vecinos=3, semilla=0):
+    """
+    Red aleatoria: puntos uniformes unidos a sus vecinos más cercanos, con la
+    componente fuertemente conexa más grande
+    """
+    from scipy.spatial import cKDTree
+
+    rng = random.Random(semilla)
+    lado = max(2, int(math.sqrt(num_nodos)))
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    puntos = []
+    for nodo in range(1, num_nodos + 1):
+        lat, lon = _coordenadas(rng.uniform(0, lado), rng.uniform(0, lado), lado)
+        G.add_node(nodo, y=lat, x=lon)
+        puntos.append((lat, lon * math.cos(math.radians(CENTRO_LAT))))
+
+    _, vecinos_de = cKDTree(puntos).query(puntos, k=vecinos + 1)
+    for i, fila in enumerate(vecinos_de):
+        for j in fila[1:]:
+            u, v = i + 1, int(j) + 1
+            if not G.has_edge(u, v) and not G.has_edge(v, u):
+                _agregar_via(G, u, v, rng, rng.random() < 0.1)
+
+    componente = max(nx.strongly_connected_components(G), key=len)
+    return G.subgraph(componente).copy()
+
+def hospitales_sinteticos(G, cantidad, semilla=0):
+    """
+    Hospitales en coordenadas aleatorias dentro del área del grafo
+    """
+    rng = random.Random(semilla)
+    lats = [d['y'] for _, d in G.nodes(data=True)]
+    lons = [d['x'] for _, d in G.nodes(data=True)]
+    return [{'nombre': f"Hospital {i + 1}",
+             'lat': rng.uniform(min(lats), max(lats)),
+             'lon': rng.uniform(min(lons), max(lons))}
+            for i in range(cantidad)]
+
+# Benchmark de un grafo
+
+def medir_carga(nombre, repeticiones):
+    """
+    Carga con obtener_grafo_ciudad: desde el .graphml (sin snapshot, lo genera)
+    y desde el snapshot. Devuelve (etapas, GrafoCSR cargado desde el snapshot).
+    """
+    from grafo.osm_datos import obtener_grafo_ciudad
+
+    ruta_snapshot = os.path.join('datos', f"{nombre}.snapshot")
+
+    def sin_snapshot(_):
+        shutil.rmtree(ruta_snapshot, ignore_errors=True)
+        return (nombre,)
+
+    etapas = {}
+    etapas['carga_graphml'], _ = etapa(obtener_grafo_ciudad, repeticiones, sin_snapshot)
+    etapas['carga_snapshot'], cargados = etapa(obtener_grafo_ciudad, repeticiones, lambda _: (nombre,))
+    return etapas, cargados[-1]
+
+def medir_grafo(G, hospitales, args, rng):
+    """
+    Mide índice espacial, nodo_mas_cercano, rutas_dijkstra, rutas_mas_cercanas (k=3),
+    procesar_rutas_hospitales y generar_mapa_html sobre un grafo ya cargado
+    """
+    from grafo.csr import obtener_grafo_csr
+    from grafo.grafo import GrafoDijkstra, procesar_rutas_hospitales
+    from grafo.indice_espacial import ajustar_puntos, obtener_indice_espacial
+    from grafo.utilidades import nodo_mas_cercano
+    from mapa import generar_mapa_html
+
+    csr = obtener_grafo_csr(G)
+    nodos = csr.nodos_osm.tolist()
+    lat_min, lat_max = float(csr.lat.min()), float(csr.lat.max())
+    lon_min, lon_max = float(csr.lon.min()), float(csr.lon.max())
+    etapas = {}
+
+    def sin_indice(_):
+        csr.indice_espacial = None
+        return (G,)
+
+    etapas['indice_espacial'], _ = etapa(obtener_indice_espacial, min(args.repeticiones, 5), sin_indice)
+
+    puntos = [(rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max)) for _ in range(args.consultas + 1)]
+    etapas['nodo_mas_cercano'], _ = etapa(nodo_mas_cercano, args.consultas, lambda i: (G,) + puntos[i])
+
+    # Orígenes distintos en cada repetición: sin aciertos de la caché de rutas
+    nodos_hospitales, _ = ajustar_puntos(G, hospitales)
+    repeticiones = min(args.repeticiones, len(nodos) - 1)
+    origenes = rng.sample(nodos, repeticiones + 1)
+    motor = GrafoDijkstra(G)
+
+    def rutas(origen):
+        motor.rutas_dijkstra(origen, nodos_hospitales)
+        return motor.nodos_asentados
+
+    etapas['rutas_dijkstra'], _ = etapa(rutas, repeticiones, lambda i: (origenes[i],),
+                                        asentados=lambda asentados: asentados)
+
+    def rutas_cercanas(origen):
+        motor.rutas_mas_cercanas(origen, nodos_hospitales, 3)
+        return motor.nodos_asentados
+
+    etapas['rutas_3_cercanas'], _ = etapa(rutas_cercanas, repeticiones, lambda i: (origenes[i],),
+                                          asentados=lambda asentados: asentados)
+
+    origenes = rng.sample(nodos, repeticiones + 1)
+    etapas['procesar_rutas_hospitales'], resultados = etapa(
+        procesar_rutas_hospitales, repeticiones, lambda i: (G, origenes[i], hospitales))
+
+    archivo = os.path.join('templates', 'mapa.html')
+    etapas['generar_mapa_html'], _ = etapa(
+        generar_mapa_html, min(args.repeticiones, 10), lambda _: (G, origenes[0], resultados[0], archivo))
+    if os.path.exists(archivo):
+        etapas['generar_mapa_html']['tamano_kb'] = round(os.path.getsize(archivo) / 1024, 1)
+    return etapas
+
+def benchmark_grafo(nombre, tipo, G, hospitales, args, rng):
+    """
+    Guarda G como datos/<nombre>.graphml en el directorio de trabajo y lo mide completo
+    """
+    from grafo.osm_datos import _osmnx
+
+    _silencioso(_osmnx().save_graphml, G, os.path.join('datos', f"{nombre}.graphml"))
+    etapas, G_cargado = medir_carga(nombre, min(args.repeticiones, 3))
+    if G_cargado is None:
+        return {'nombre': nombre, 'tipo': tipo, 'error': 'no se pudo cargar el grafo'}
+    etapas.update(medir_grafo(G_cargado, hospitales, args, rng))
+    return {
+        'nombre': nombre,
+        'tipo': tipo,
+        'nodos': G_cargado.num_nodos,
+        'aristas': G_cargado.num_aristas,
+        'hospitales': len(hospitales),
+        'etapas': etapas
+    }
+
+def benchmark_puno(args, rng):
+    """
+    Grafo real de Puno con los hospitales guardados; se omite si no está descargado
+    """
+    from grafo.osm_datos import cargar_hospitales
+
+    origen = os.path.join(RAIZ, 'datos', 'puno.graphml')
+    if not os.path.exists(origen):
+        return {'nombre': 'puno', 'tipo': 'osm', 'omitido': 'no existe datos/puno.graphml'}
+
+    shutil.copy(origen, os.path.join('datos', 'puno.graphml'))
+    hospitales = _silencioso(cargar_hospitales, os.path.join(RAIZ, 'datos', 'hospitales.json'))
+    etapas, G = medir_carga('puno', min(args.repeticiones, 3))
+    if G is None:
+        return {'nombre': 'puno', 'tipo': 'osm', 'error': 'no se pudo cargar el grafo'}
+    etapas.update(medir_grafo(G, hospitales, args, rng))
+    return {
+        'nombre': 'puno',
+        'tipo': 'osm',
+        'nodos': G.num_nodos,
+        'aristas': G.num_aristas,
+        'hospitales': len(hospitales),
+        'etapas': etapas
+    }
+
+# Comparación entre ejecuciones
+
+def comparar(actual, base, umbral):
+    """
+    Imprime la razón de la mediana de cada etapa respecto a una ejecución
+    anterior y devuelve la lista de regresiones (razón mayor que 1 + umbral)
+    """
+    anteriores = {g['nombre']: g for g in base.get('grafos', [])}
+    regresiones = []
+    print(f"\nComparación con {base.get('version') or 'ejecución anterior'} (mediana, ms):")
+    for grafo in actual['grafos']:
+        previo = anteriores.get(grafo['nombre'])
+        if not previo or 'etapas' not in grafo or 'etapas' not in previo:
+            continue
+        for nombre, datos in grafo['etapas'].items():
+            anterior = previo['etapas'].get(nombre)
+            if not anterior:
+                continue
+            nuevo_p50 = datos['latencia_ms']['p50']
+            viejo_p50 = anterior['latencia_ms']['p50']
+            razon = nuevo_p50 / viejo_p50 if viejo_p50 else math.inf
+            marca = '⚠️' if razon > 1 + umbral else '  '
+            print(f"{marca} {grafo['nombre']:<16} {nombre:<26} {viejo_p50:>10.3f} → {nuevo_p50:>10.3f}  x{razon:.2f}")
+            if razon > 1 + umbral:
+                regresiones.append({'grafo': grafo['nombre'], 'etapa': nombre, 'razon': round(razon, 3)})
+    return regresiones
+
+def _version():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga, ruteo y mapas")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[2500, 10000, 40000],
+                        help="número aproximado de nodos de los grafos sintéticos")
+    parser.add_argument('--tipos', nargs='+', default=['rejilla', 'aleatorio'],
+                        choices=['rejilla', 'aleatorio'])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--consultas', type=int, default=200, help="consultas de nodo_mas_cercano")
+    parser.add_argument('--hospitales', type=int, default=20, help="hospitales de los grafos sintéticos")
+    parser.add_argument('--sin-puno', action='store_true', help="no medir el grafo guardado de Puno")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', default=os.path.join(RAIZ, 'benchmarks', 'resultados.json'))
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior")
+    parser.add_argument('--umbral', type=float, default=0.2,
+                        help="aumento relativo de la mediana que se considera regresión")
+    args = parser.parse_args()
+    salida = os.path.abspath(args.salida)
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+
+    # Directorio de trabajo temporal: los módulos del proyecto usan rutas relativas
+    # (datos/, templates/, caché de rutas), así que se entra antes de importarlos
+    sys.path.insert(0, RAIZ)
+    trabajo = tempfile.mkdtemp(prefix='benchmark_rutas_')
+    os.chdir(trabajo)
+    os.makedirs('datos', exist_ok=True)
+    rng = random.Random(args.semilla)
+
+    resultado = {
+        'version': _version(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': {k: v for k, v in vars(args).items() if k not in ('salida', 'comparar')},
+        'grafos': []
+    }
+
+    try:
+        if not args.sin_puno:
+            print("Midiendo grafo de Puno...")
+            resultado['grafos'].append(benchmark_puno(args, rng))
+
+        for tipo in args.tipos:
+            for tamano in args.tamanos:
+                nombre = f"{tipo}_{tamano}"
+                print(f"Midiendo {nombre}...")
+                G = grafo_rejilla(tamano, args.semilla) if tipo == 'rejilla' else grafo_aleatorio(tamano, semilla=args.semilla)
+                hospitales = hospitales_sinteticos(G, args.hospitales, args.semilla)
+                resultado['grafos'].append(benchmark_grafo(nombre, tipo, G, hospitales, args, rng))
+    finally:
+        os.chdir(RAIZ)
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    # Memoria máxima del proceso completo (ru_maxrss está en KB en Linux)
+    resultado['memoria_max_proceso_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    for grafo in resultado['grafos']:
+        if 'etapas' not in grafo:
+            print(f"{grafo['nombre']}: {grafo.get('omitido') or grafo.get('error')}")
+            continue
+        print(f"\n{grafo['nombre']} ({grafo['nodos']} nodos, {grafo['aristas']} aristas)")
+        for nombre, datos in grafo['etapas'].items():
+            latencia = datos['latencia_ms']
+            extra = f"  asentados p50 {datos['nodos_asentados']['p50']:.0f}" if 'nodos_asentados' in datos else ""
+            print(f"  {nombre:<26} p50 {latencia['p50']:>10.3f} ms  p95 {latencia['p95']:>10.3f} ms  "
+                  f"pico {datos['memoria_pico_kb']:>9.1f} KB{extra}")
+
+    if base is not None:
+        resultado['regresiones'] = comparar(resultado, base, args.umbral)
+
+    os.makedirs(os.path.dirname(salida), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+    return 1 if resultado.get('regresiones') else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,7 +8,13 @@ MAPA_CONFIG = {
     'zoom_inicial': 12,
     'centro_lat': -15.8402,
     'centro_lon': -70.0219,
-    'estilo_mapa': 'mapbox://styles/mapbox/streets-v11'
+    'estilo_mapa': 'mapbox://styles/mapbox/streets-v11',
+    # Las rutas se simplifican sin error visible (medio píxel) hasta este zoom;
+    # en zooms menores Mapbox simplifica con 'tolerancia_mapbox' (píxeles)
+    'zoom_detalle': 17,
+    'tolerancia_mapbox': 0.375,
+    # Decimales de las polilíneas codificadas (6 ≈ 0.1 m)
+    'precision_polilinea': 6
 }
 # Configuración de colores para las rutas
 COLORES = {
@@ -16,4 +22,56 @@ COLORES = {
     'ruta_mas_corta': '#00FF00',
     'marcador_origen': '#0000FF',
     'marcador_destino': '#FF0000'
-}
\ No newline at end of file
+}
+
+# Peso usado para elegir las rutas: 'travel_time' (más rápida) o 'length' (más corta)
+PESO_RUTEO = 'travel_time'
+
+# Velocidades (km/h) por tipo de vía que reemplazan las estimadas por osmnx,
+# p. ej. {'primary': 50, 'secondary': 40, 'residential': 25}
+VELOCIDADES_VIA = {}
+
+# Velocidad (km/h) para aristas sin travel_time ni speed_kph
+VELOCIDAD_POR_DEFECTO = 30
+
+# Caché de resultados de rutas (directorio None para usar solo memoria);
+# 'capacidad_disco' limita los archivos que se conservan en el directorio
+CACHE_RUTAS = {
+    'capacidad': 256,
+    'ttl_segundos': 3600,
+    'directorio': 'datos/cache_rutas',
+    'capacidad_disco': 2048
+}
+
+# Isócronas: umbrales (minutos), colores de cada banda y tamaño de celda (m) de los polígonos
+ISOCRONAS = {
+    'minutos': [5, 10, 15],
+    'colores': ['#2ECC71', '#F1C40F', '#E67E22'],
+    'tamano_celda': 100
+}
+
+# Métricas de rendimiento (tramos por etapa y contadores, expuestos en /metrics);
+# 'log' es un archivo donde registrar cada medición como JSON por líneas (None para no registrar)
+METRICAS = {
+    'habilitadas': True,
+    'log': None
+}
+
+# Ciudades residentes en memoria: presupuesto (MB) y ciudades a precalentar en
+# segundo plano (solo las que ya tienen su .graphml en datos/)
+REGISTRO_CIUDADES = {
+    'presupuesto_mb': 1024,
+    'precalentar': ['Juliaca, Peru']
+}
+
+# Ajuste de hospitales a la red vial: distancia (m) a partir de la cual se marca
+# un hospital como mal ubicado y versiones del grafo que se conservan en el archivo
+AJUSTE_HOSPITALES = {
+    'umbral_m': 150,
+    'versiones': 4
+}
+
+# Servicio web de ruteo: máximo de rutas alternativas por hospital que acepta /rutas
+SERVICIO = {
+    'max_alternativas': 5
+}
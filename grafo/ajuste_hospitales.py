@@ -0,0 +1,94 @@
+# grafo/ajuste_hospitales.py
+"""
+Ajuste persistente de hospitales a nodos del grafo.
+El nodo y la distancia de ajuste de cada hospital se guardan junto a la
+lista de hospitales ('datos/hospitales_ajuste.json'), por versión del grafo.
+Solo se vuelven a ajustar los hospitales nuevos o movidos, y los que quedan
+a más de AJUSTE_HOSPITALES['umbral_m'] metros de la red se marcan como lejanos.
+Una vez ajustados, los cálculos de rutas no consultan el índice espacial.
+"""
+import json
+import os
+from config import AJUSTE_HOSPITALES
+from .indice_espacial import ajustar_puntos
+from .utilidades import version_grafo
+
+def clave_hospital(hospital):
+    """
+    Identifica un hospital por su posición: si solo cambia el nombre no hace falta reajustarlo
+    """
+    return f"{float(hospital['lat']):.7f},{float(hospital['lon']):.7f}"
+
+def archivo_ajuste(archivo_hospitales):
+    """
+    'datos/hospitales.json' → 'datos/hospitales_ajuste.json'
+    """
+    base, _ = os.path.splitext(archivo_hospitales)
+    return f"{base}_ajuste.json"
+
+def _leer(ruta):
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f).get('grafos', {})
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"⚠️ Ajuste de hospitales ilegible ({e}), se recalcula")
+        return {}
+
+def _escribir(ruta, grafos):
+    # Escritura atómica: un archivo a medio escribir nunca reemplaza al anterior
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump({'grafos': grafos}, f, ensure_ascii=False, indent=1)
+    os.replace(temporal, ruta)
+
+def ajustar_hospitales(G, hospitales, archivo_hospitales=None, umbral=None):
+    """
+    Devuelve (nodos, distancias en metros) de los hospitales, como ajustar_puntos.
+    Los ajustes se recuerdan en G.graph['ajuste_hospitales']; con
+    archivo_hospitales además se leen y guardan en su archivo de ajuste.
+    """
+    if not hospitales:
+        return [], []
+    umbral = AJUSTE_HOSPITALES['umbral_m'] if umbral is None else umbral
+    memoria = G.graph.setdefault('ajuste_hospitales', {})
+    claves = [clave_hospital(h) for h in hospitales]
+
+    version = grafos = None
+    if archivo_hospitales:
+        version = version_grafo(G)
+        ruta = archivo_ajuste(archivo_hospitales)
+        grafos = _leer(ruta)
+        for clave, entrada in grafos.get(version, {}).items():
+            memoria.setdefault(clave, (entrada['nodo'], entrada['distancia']))
+
+    # Solo los hospitales nuevos o movidos pasan por el índice espacial
+    pendientes = [i for i, clave in enumerate(claves) if clave not in memoria]
+    if pendientes:
+        nodos, distancias = ajustar_puntos(G, [hospitales[i] for i in pendientes])
+        for i, nodo, distancia in zip(pendientes, nodos, distancias):
+            memoria[claves[i]] = (nodo, distancia)
+            if distancia > umbral:
+                print(f"⚠️ {hospitales[i].get('nombre', claves[i])} está a {distancia:.0f} m "
+                      f"de la red vial: revisar su ubicación")
+
+    if archivo_hospitales and (pendientes or version not in grafos):
+        entradas = {}
+        for hospital, clave in zip(hospitales, claves):
+            nodo, distancia = memoria[clave]
+            entradas[clave] = {'nombre': hospital.get('nombre'), 'nodo': nodo,
+                               'distancia': round(distancia, 2), 'lejano': distancia > umbral}
+        # Se conservan los ajustes de las últimas versiones del grafo (varias ciudades o ediciones)
+        grafos.pop(version, None)
+        grafos[version] = entradas
+        for vieja in list(grafos)[:-AJUSTE_HOSPITALES['versiones']]:
+            del grafos[vieja]
+        try:
+            _escribir(ruta, grafos)
+            print(f"📍 {len(pendientes)} hospitales ajustados al grafo, guardado en {ruta}")
+        except Exception as e:
+            print(f"❌ Error al guardar el ajuste de hospitales: {e}")
+
+    ajustes = [memoria[clave] for clave in claves]
+    return [nodo for nodo, _ in ajustes], [distancia for _, distancia in ajustes]
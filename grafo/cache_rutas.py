@@ -0,0 +1,217 @@
+# grafo/cache_rutas.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+class CacheRutas:
+    """
+    Caché LRU con expiración (TTL) para resultados de rutas.
+    La clave incluye la versión del grafo, el nodo origen, el conjunto de
+    destinos y el peso usado. Opcionalmente guarda una copia en disco (JSON)
+    para que los resultados sobrevivan a un reinicio; el disco se poda cada
+    PODA_CADA escrituras a capacidad_disco archivos y sin archivos vencidos.
+    """
+    PODA_CADA = 32
+
+    def __init__(self, capacidad=256, ttl_segundos=None, directorio=None, capacidad_disco=None):
+        self.capacidad = capacidad
+        self.ttl_segundos = ttl_segundos
+        self.directorio = directorio
+        self.capacidad_disco = capacidad_disco if capacidad_disco is not None else 8 * capacidad
+        self._escrituras = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    @staticmethod
+    def crear_clave(version, nodo_origen, destinos, peso='length'):
+        """
+        Crea la clave de una consulta (el orden de los destinos no importa)
+        """
+        return (version, nodo_origen, tuple(sorted(set(destinos), key=str)), peso)
+
+    def _archivo(self, clave):
+        nombre = hashlib.sha1(repr(clave).encode('utf-8')).hexdigest()
+        # Prefijo con la versión del grafo para poder invalidar por versión
+        return os.path.join(self.directorio, f"{clave[0][:12]}_{nombre}.json")
+
+    def _vigente(self, guardado):
+        return self.ttl_segundos is None or time.time() - guardado <= self.ttl_segundos
+
+    def obtener(self, clave):
+        """
+        Devuelve una copia del valor guardado o None si no existe o expiró
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                guardado, valor = entrada
+                if self._vigente(guardado):
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return _copia(valor)
+                del self._entradas[clave]
+
+        leido = self._leer_disco(clave)
+        with self._lock:
+            if leido is None:
+                self.fallos += 1
+                return None
+            # Conserva la fecha original: leerla de disco no extiende su TTL
+            guardado, valor = leido
+            self.aciertos_disco += 1
+            self._insertar(clave, valor, guardado)
+        return _copia(valor)
+
+    def guardar(self, clave, valor, persistir=True):
+        """
+        Guarda un valor en memoria y, si hay directorio y persistir es True, en disco
+        """
+        with self._lock:
+            self._insertar(clave, _copia(valor), time.time())
+        if persistir:
+            self._escribir_disco(clave, valor)
+
+    def _insertar(self, clave, valor, guardado):
+        self._entradas[clave] = (guardado, valor)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.capacidad:
+            self._entradas.popitem(last=False)
+            self.desalojos += 1
+
+    def invalidar(self, version=None, condicion=None, disco=True):
+        """
+        Elimina las entradas de una versión de grafo (o todas si version es None).
+        condicion(clave, valor) permite limitar la invalidación a entradas de memoria
+        concretas; en disco se borran todos los archivos de la versión, que se
+        reconocen por el nombre sin abrirlos. disco=False deja el disco intacto.
+        Devuelve cuántas entradas de memoria se eliminaron.
+        """
+        with self._lock:
+            claves = [clave for clave, (_, valor) in self._entradas.items()
+                      if (version is None or clave[0] == version)
+                      and (condicion is None or condicion(clave, valor))]
+            for clave in claves:
+                del self._entradas[clave]
+
+        if disco and self.directorio and os.path.isdir(self.directorio):
+            prefijo = version[:12] if version else ''
+            for nombre in os.listdir(self.directorio):
+                if not nombre.startswith(prefijo) or not nombre.endswith('.json'):
+                    continue
+                try:
+                    os.remove(os.path.join(self.directorio, nombre))
+                except OSError:
+                    continue
+        return len(claves)
+
+    def estadisticas(self):
+        """
+        Devuelve los contadores de aciertos y fallos
+        """
+        consultas = self.aciertos + self.aciertos_disco + self.fallos
+        return {
+            'entradas': len(self._entradas),
+            'aciertos': self.aciertos,
+            'aciertos_disco': self.aciertos_disco,
+            'fallos': self.fallos,
+            'desalojos': self.desalojos,
+            'tasa_aciertos': (self.aciertos + self.aciertos_disco) / consultas if consultas else 0.0
+        }
+
+    def _leer_disco(self, clave):
+        """
+        Devuelve (fecha de guardado, rutas) del archivo de la clave, o None
+        """
+        if not self.directorio:
+            return None
+        ruta = self._archivo(clave)
+        try:
+            if not os.path.exists(ruta):
+                return None
+            with open(ruta, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            if _clave_desde_json(datos['clave']) != clave:
+                return None
+            if not self._vigente(datos['guardado']):
+                os.remove(ruta)
+                return None
+            return datos['guardado'], _rutas_desde_json(datos['rutas'])
+        except Exception as e:
+            print(f"⚠️ Error leyendo caché de rutas: {e}")
+            return None
+
+    def _escribir_disco(self, clave, valor):
+        if not self.directorio:
+            return
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            datos = {
+                'guardado': time.time(),
+                'clave': list(clave),
+                'rutas': [[destino, info] for destino, info in valor.items()]
+            }
+            ruta = self._archivo(clave)
+            temporal = f"{ruta}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f)
+            os.replace(temporal, ruta)
+        except Exception as e:
+            print(f"⚠️ Error escribiendo caché de rutas: {e}")
+            return
+
+        with self._lock:
+            self._escrituras += 1
+            # La primera escritura también poda lo que quedó de ejecuciones anteriores
+            podar = self._escrituras % self.PODA_CADA == 1
+        if podar:
+            self._podar_disco()
+
+    def _podar_disco(self):
+        """
+        Borra los archivos vencidos (por fecha de modificación) y, si sobran,
+        los más antiguos hasta quedar en capacidad_disco. Devuelve cuántos borró.
+        """
+        archivos = []
+        try:
+            for entrada in os.scandir(self.directorio):
+                if entrada.name.endswith('.json'):
+                    archivos.append((entrada.stat().st_mtime, entrada.path))
+        except OSError:
+            return 0
+
+        archivos.sort()
+        ahora = time.time()
+        sobrantes = len(archivos) - self.capacidad_disco
+        borrados = 0
+        for modificado, ruta in archivos:
+            vencido = self.ttl_segundos is not None and ahora - modificado > self.ttl_segundos
+            if not vencido and borrados >= sobrantes:
+                break
+            try:
+                os.remove(ruta)
+                borrados += 1
+            except OSError:
+                continue
+        return borrados
+
+def _copia(rutas):
+    """
+    Copia de cada ruta (y de su camino): quien reciba o guarde un resultado
+    puede modificarlo sin alterar la caché
+    """
+    return {destino: dict(info, camino=list(info['camino'])) if 'camino' in info else dict(info)
+            for destino, info in rutas.items()}
+
+def _clave_desde_json(datos):
+    version, origen, destinos, peso = datos
+    return (version, origen, tuple(destinos), peso)
+
+def _rutas_desde_json(datos):
+    return {destino: info for destino, info in datos}
@@ -0,0 +1,187 @@
+# grafo/cercania.py
+import hashlib
+import heapq
+import json
+import os
+import weakref
+from .csr import obtener_grafo_csr
+from .restricciones import capa_activa
+from .utilidades import version_grafo, ruta_tabla_grafo
+
+class CampoCercania:
+    """
+    Tabla con el hospital más cercano, la distancia por la red y el siguiente
+    nodo del camino para cada nodo del grafo.
+    """
+    def __init__(self, hospital, distancia, siguiente, version='', firma='', peso='length',
+                 restricciones=frozenset()):
+        self.hospital = hospital
+        self.distancia = distancia
+        self.siguiente = siguiente
+        self.version = version
+        self.firma = firma
+        self.peso = peso
+        # Restricciones (ids) aplicadas al calcularla; la capa la marca como no vigente
+        # cuando un cambio la afecta
+        self.restricciones = restricciones
+        self.vigente = True
+
+    def hospital_mas_cercano(self, nodo):
+        """
+        Devuelve (nodo_hospital, distancia) o (None, None) si no hay hospital alcanzable
+        """
+        if nodo not in self.hospital:
+            return None, None
+        return self.hospital[nodo], self.distancia[nodo]
+
+    def camino(self, nodo):
+        """
+        Recorre los siguientes nodos hasta llegar al hospital más cercano
+        """
+        if nodo not in self.hospital:
+            return []
+        camino = [nodo]
+        while self.siguiente[nodo] is not None:
+            nodo = self.siguiente[nodo]
+            camino.append(nodo)
+        return camino
+
+def firma_hospitales(nodos_hospitales):
+    """
+    Hash del conjunto de nodos de hospitales usado para invalidar la tabla
+    """
+    contenido = "|".join(sorted(str(n) for n in set(nodos_hospitales)))
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+def calcular_campo_cercania(G, nodos_hospitales, peso='length'):
+    """
+    Dijkstra inverso con múltiples fuentes sembrado desde todos los hospitales.
+    Para cada nodo obtiene el hospital más cercano, la distancia y el siguiente nodo.
+    Respeta los cierres y penalizaciones activos en G.graph['restricciones'].
+    """
+    # En el grafo inverso, la arista j → i corresponde a la arista original i → j
+    inverso = obtener_grafo_csr(G).inverso()
+    desplazamientos = inverso.lista('desplazamientos')
+    destinos = inverso.lista('destinos')
+    capa = capa_activa(G)
+    pesos = capa.pesos_inversos(peso) if capa else inverso.lista(peso)
+    nodos_osm = inverso.nodos_osm.tolist()
+
+    infinito = float('inf')
+    distancias = [infinito] * inverso.num_nodos
+    siguientes = [-1] * inverso.num_nodos
+    origen_hospital = [-1] * inverso.num_nodos
+    heap = []
+    for nodo in set(nodos_hospitales):
+        if nodo in inverso:
+            i = inverso.indice[nodo]
+            distancias[i] = 0.0
+            origen_hospital[i] = i
+            heap.append((0.0, i))
+    heapq.heapify(heap)
+
+    hospital, distancia, siguiente = {}, {}, {}
+    while heap:
+        dist, i = heapq.heappop(heap)
+        if dist > distancias[i]:
+            continue
+        nodo = nodos_osm[i]
+        hospital[nodo] = nodos_osm[origen_hospital[i]]
+        distancia[nodo] = dist
+        siguiente[nodo] = nodos_osm[siguientes[i]] if siguientes[i] != -1 else None
+
+        for arista in range(desplazamientos[i], desplazamientos[i + 1]):
+            j = destinos[arista]
+            nueva = dist + pesos[arista]
+            if nueva < distancias[j]:
+                distancias[j] = nueva
+                siguientes[j] = i
+                origen_hospital[j] = origen_hospital[i]
+                heapq.heappush(heap, (nueva, j))
+
+    campo = CampoCercania(hospital, distancia, siguiente, version_grafo(G),
+                          firma_hospitales(nodos_hospitales), peso,
+                          capa.ids_activos() if capa else frozenset())
+    _registrar_campo(G, campo)
+    return campo
+
+def _registrar_campo(G, campo):
+    """
+    Registra la tabla en G para que la capa de restricciones pueda invalidarla
+    """
+    grafo = getattr(G, 'graph', None)
+    if grafo is not None:
+        grafo.setdefault('campos_cercania', weakref.WeakSet()).add(campo)
+
+def guardar_campo_cercania(campo, archivo):
+    """
+    Guarda la tabla de cercanía en un archivo JSON
+    """
+    try:
+        os.makedirs(os.path.dirname(archivo) or '.', exist_ok=True)
+        datos = {
+            'version_grafo': campo.version,
+            'firma_hospitales': campo.firma,
+            'peso': campo.peso,
+            'nodos': [[nodo, campo.hospital[nodo], campo.distancia[nodo], campo.siguiente[nodo]]
+                      for nodo in campo.distancia]
+        }
+        with open(archivo, 'w', encoding='utf-8') as f:
+            json.dump(datos, f)
+        print(f"💾 Tabla de cercanía guardada en {archivo}")
+        return True
+    except Exception as e:
+        print(f"❌ Error al guardar tabla de cercanía: {e}")
+        return False
+
+def cargar_campo_cercania(archivo, version=None, firma=None):
+    """
+    Carga la tabla de cercanía. Devuelve None si no existe o si no coincide
+    con la versión del grafo o la firma de hospitales indicadas.
+    """
+    try:
+        if not os.path.exists(archivo):
+            return None
+        with open(archivo, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+        if version is not None and datos.get('version_grafo') != version:
+            return None
+        if firma is not None and datos.get('firma_hospitales') != firma:
+            return None
+
+        hospital, distancia, siguiente = {}, {}, {}
+        for nodo, nodo_hospital, dist, sig in datos['nodos']:
+            hospital[nodo] = nodo_hospital
+            distancia[nodo] = dist
+            siguiente[nodo] = sig
+        return CampoCercania(hospital, distancia, siguiente,
+                             datos['version_grafo'], datos['firma_hospitales'], datos.get('peso', 'length'))
+    except Exception as e:
+        print(f"❌ Error al cargar tabla de cercanía: {e}")
+        return None
+
+def obtener_campo_cercania(G, nodos_hospitales, peso='length'):
+    """
+    Devuelve la tabla de cercanía del grafo. Se reutiliza la que está en memoria o en
+    disco si el grafo y los hospitales no han cambiado; en otro caso se recalcula.
+    """
+    clave = f"campo_cercania_{peso}"
+    version = version_grafo(G)
+    firma = firma_hospitales(nodos_hospitales)
+
+    campo = G.graph.get(clave)
+    if campo is not None and campo.vigente and campo.version == version and campo.firma == firma:
+        return campo
+
+    # La tabla en disco corresponde al grafo sin restricciones
+    archivo = None if capa_activa(G) else ruta_tabla_grafo(G, f"cercania_{peso}.json")
+    campo = cargar_campo_cercania(archivo, version, firma) if archivo else None
+    if campo is None:
+        campo = calcular_campo_cercania(G, nodos_hospitales, peso)
+        if archivo:
+            guardar_campo_cercania(campo, archivo)
+    else:
+        _registrar_campo(G, campo)
+
+    G.graph[clave] = campo
+    return campo
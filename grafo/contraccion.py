@@ -0,0 +1,310 @@
+# grafo/contraccion.py
+"""
+Contraction Hierarchies (CH) para consultas punto a punto muy rápidas.
+La jerarquía se construye una sola vez a partir del grafo y se guarda junto al
+.graphml ('puno_ch_length.npz'). Para construirla por adelantado:
+
+    python -m grafo.contraccion "Puno, Peru"
+"""
+import heapq
+import os
+import sys
+import numpy as np
+from .csr import obtener_grafo_csr
+from .utilidades import version_grafo, ruta_tabla_grafo
+
+INFINITO = float('inf')
+
+class JerarquiaContraccion:
+    """
+    Grafo de búsqueda hacia arriba de una jerarquía de contracción.
+    'arriba' guarda las aristas u → x con rango[x] > rango[u];
+    'abajo' guarda, para cada x, las aristas u → x con rango[u] > rango[x].
+    """
+    def __init__(self, nodos_osm, rango, arriba, abajo, medios, peso='length', version=''):
+        self.nodos_osm = nodos_osm
+        self.indice = {nodo: i for i, nodo in enumerate(nodos_osm.tolist())}
+        self.rango = rango
+        self.arriba = arriba
+        self.abajo = abajo
+        self.medios = medios
+        self.peso = peso
+        self.version = version
+        self.nodos_asentados = 0
+
+    def consulta(self, nodo_origen, nodo_destino):
+        """
+        Búsqueda bidireccional hacia arriba. Devuelve (distancia, camino en ids OSM)
+        o (None, None) si no hay camino.
+        """
+        if nodo_origen not in self.indice or nodo_destino not in self.indice:
+            return None, None
+        s = self.indice[nodo_origen]
+        t = self.indice[nodo_destino]
+        if s == t:
+            self.nodos_asentados = 1
+            return 0.0, [nodo_origen]
+
+        distancias = ({s: 0.0}, {t: 0.0})
+        predecesores = ({s: -1}, {t: -1})
+        heaps = ([(0.0, s)], [(0.0, t)])
+        adyacencias = (self.arriba, self.abajo)
+        mejor = INFINITO
+        encuentro = -1
+        asentados = 0
+
+        while heaps[0] or heaps[1]:
+            tope_f = heaps[0][0][0] if heaps[0] else INFINITO
+            tope_b = heaps[1][0][0] if heaps[1] else INFINITO
+            if min(tope_f, tope_b) >= mejor:
+                break
+            lado = 0 if tope_f <= tope_b else 1
+            dist, u = heapq.heappop(heaps[lado])
+            propias = distancias[lado]
+            if dist > propias[u]:
+                continue
+            asentados += 1
+
+            otra = distancias[1 - lado].get(u)
+            if otra is not None and dist + otra < mejor:
+                mejor = dist + otra
+                encuentro = u
+
+            # Stall-on-demand: si un nodo superior ya llega a u más barato, no expandir u
+            if any(propias.get(x, INFINITO) + w < dist for x, w in adyacencias[1 - lado][u]):
+                continue
+
+            pred = predecesores[lado]
+            for x, w in adyacencias[lado][u]:
+                nueva = dist + w
+                if nueva < propias.get(x, INFINITO):
+                    propias[x] = nueva
+                    pred[x] = u
+                    heapq.heappush(heaps[lado], (nueva, x))
+
+        self.nodos_asentados = asentados
+        if encuentro == -1:
+            return None, None
+
+        # Camino en el grafo de búsqueda: s → encuentro ← t
+        ida = []
+        nodo = encuentro
+        while nodo != -1:
+            ida.append(nodo)
+            nodo = predecesores[0][nodo]
+        ida.reverse()
+        nodo = predecesores[1][encuentro]
+        while nodo != -1:
+            ida.append(nodo)
+            nodo = predecesores[1][nodo]
+
+        return mejor, self.nodos_osm[self._desempaquetar(ida)].tolist()
+
+    def _desempaquetar(self, camino):
+        """
+        Reemplaza cada atajo por los dos tramos que representa hasta obtener
+        solo aristas del grafo original
+        """
+        resultado = [camino[0]]
+        pila = [(camino[i], camino[i + 1]) for i in range(len(camino) - 2, -1, -1)]
+        while pila:
+            u, x = pila.pop()
+            medio = self.medios.get((u, x))
+            if medio is None:
+                resultado.append(x)
+            else:
+                pila.append((medio, x))
+                pila.append((u, medio))
+        return resultado
+
+def construir_jerarquia(G, peso='length', limite_testigo=64):
+    """
+    Construye la jerarquía ordenando los nodos por diferencia de aristas
+    (con actualización perezosa) y agregando atajos cuando la búsqueda de
+    testigos no encuentra un camino alternativo igual o más corto.
+    """
+    csr = obtener_grafo_csr(G)
+    n = csr.num_nodos
+    salida = [dict() for _ in range(n)]
+    entrada = [dict() for _ in range(n)]
+    pesos = csr.lista(peso)
+    for u, x, w in zip(csr.lista('origenes'), csr.lista('destinos'), pesos):
+        if u != x and w < salida[u].get(x, INFINITO):
+            salida[u][x] = w
+            entrada[x][u] = w
+
+    medios = {}
+    contraido = bytearray(n)
+    profundidad = [0] * n
+    rango = [0] * n
+
+    def buscar_testigos(u, excluido, costo_maximo):
+        distancias = {u: 0.0}
+        heap = [(0.0, u)]
+        asentados = 0
+        while heap and asentados < limite_testigo:
+            dist, a = heapq.heappop(heap)
+            if dist > distancias[a]:
+                continue
+            if dist > costo_maximo:
+                break
+            asentados += 1
+            for b, w in salida[a].items():
+                if b == excluido or contraido[b]:
+                    continue
+                nueva = dist + w
+                if nueva < distancias.get(b, INFINITO):
+                    distancias[b] = nueva
+                    heapq.heappush(heap, (nueva, b))
+        return distancias
+
+    def calcular_atajos(v):
+        entrantes = [(u, w) for u, w in entrada[v].items() if not contraido[u]]
+        salientes = [(x, w) for x, w in salida[v].items() if not contraido[x]]
+        atajos = []
+        if salientes:
+            maximo_saliente = max(w for _, w in salientes)
+            for u, wu in entrantes:
+                distancias = buscar_testigos(u, v, wu + maximo_saliente)
+                for x, wx in salientes:
+                    if x != u and distancias.get(x, INFINITO) > wu + wx:
+                        atajos.append((u, x, wu + wx))
+        return atajos, len(entrantes) + len(salientes)
+
+    def prioridad(v):
+        atajos, aristas = calcular_atajos(v)
+        return len(atajos) - aristas + profundidad[v], atajos
+
+    heap = [(prioridad(v)[0], v) for v in range(n)]
+    heapq.heapify(heap)
+    orden = 0
+    while heap:
+        _, v = heapq.heappop(heap)
+        if contraido[v]:
+            continue
+        # Actualización perezosa: si la prioridad empeoró, volver a encolar
+        actual, atajos = prioridad(v)
+        if heap and actual > heap[0][0]:
+            heapq.heappush(heap, (actual, v))
+            continue
+
+        for u, x, w in atajos:
+            if w < salida[u].get(x, INFINITO):
+                salida[u][x] = w
+                entrada[x][u] = w
+                medios[(u, x)] = v
+
+        contraido[v] = 1
+        rango[v] = orden
+        orden += 1
+        for vecino in list(entrada[v]) + list(salida[v]):
+            if not contraido[vecino]:
+                profundidad[vecino] = max(profundidad[vecino], profundidad[v] + 1)
+
+    arriba = [[] for _ in range(n)]
+    abajo = [[] for _ in range(n)]
+    for u in range(n):
+        for x, w in salida[u].items():
+            if rango[x] > rango[u]:
+                arriba[u].append((x, w))
+            else:
+                abajo[x].append((u, w))
+
+    print(f"Jerarquía construida: {n} nodos, {len(medios)} atajos")
+    return JerarquiaContraccion(csr.nodos_osm, rango, arriba, abajo, medios, peso, version_grafo(G))
+
+def _aplanar(listas):
+    desplazamientos = np.zeros(len(listas) + 1, dtype=np.int64)
+    np.cumsum([len(l) for l in listas], out=desplazamientos[1:])
+    destinos = np.fromiter((x for l in listas for x, _ in l), dtype=np.int32, count=desplazamientos[-1])
+    pesos = np.fromiter((w for l in listas for _, w in l), dtype=np.float64, count=desplazamientos[-1])
+    return desplazamientos, destinos, pesos
+
+def _desaplanar(desplazamientos, destinos, pesos):
+    destinos = destinos.tolist()
+    pesos = pesos.tolist()
+    desplazamientos = desplazamientos.tolist()
+    return [list(zip(destinos[desplazamientos[i]:desplazamientos[i + 1]],
+                     pesos[desplazamientos[i]:desplazamientos[i + 1]]))
+            for i in range(len(desplazamientos) - 1)]
+
+def guardar_jerarquia(jerarquia, archivo):
+    """
+    Guarda la jerarquía en un archivo .npz
+    """
+    try:
+        os.makedirs(os.path.dirname(archivo) or '.', exist_ok=True)
+        arriba = _aplanar(jerarquia.arriba)
+        abajo = _aplanar(jerarquia.abajo)
+        medios = np.array([(u, x, m) for (u, x), m in jerarquia.medios.items()],
+                          dtype=np.int32).reshape(-1, 3)
+        np.savez(
+            archivo,
+            version=np.array(jerarquia.version),
+            peso=np.array(jerarquia.peso),
+            nodos_osm=jerarquia.nodos_osm,
+            rango=np.asarray(jerarquia.rango, dtype=np.int32),
+            arriba_desplazamientos=arriba[0], arriba_destinos=arriba[1], arriba_pesos=arriba[2],
+            abajo_desplazamientos=abajo[0], abajo_destinos=abajo[1], abajo_pesos=abajo[2],
+            medios=medios
+        )
+        print(f"💾 Jerarquía de contracción guardada en {archivo}")
+        return True
+    except Exception as e:
+        print(f"❌ Error al guardar jerarquía: {e}")
+        return False
+
+def cargar_jerarquia(archivo, version=None):
+    """
+    Carga la jerarquía guardada, o None si no existe o no coincide con la versión del grafo
+    """
+    try:
+        if not os.path.exists(archivo):
+            return None
+        with np.load(archivo) as datos:
+            if version is not None and str(datos['version']) != version:
+                return None
+            medios = {(u, x): m for u, x, m in datos['medios'].tolist()}
+            return JerarquiaContraccion(
+                datos['nodos_osm'],
+                datos['rango'].tolist(),
+                _desaplanar(datos['arriba_desplazamientos'], datos['arriba_destinos'], datos['arriba_pesos']),
+                _desaplanar(datos['abajo_desplazamientos'], datos['abajo_destinos'], datos['abajo_pesos']),
+                medios,
+                str(datos['peso']),
+                str(datos['version'])
+            )
+    except Exception as e:
+        print(f"❌ Error al cargar jerarquía: {e}")
+        return None
+
+def obtener_jerarquia(G, peso='length'):
+    """
+    Devuelve la jerarquía del grafo para el peso indicado. Se reutiliza la que
+    está en memoria o en disco si el grafo no cambió; si no, se construye.
+    """
+    clave = f"jerarquia_{peso}"
+    version = version_grafo(G)
+    jerarquia = G.graph.get(clave)
+    if jerarquia is not None and jerarquia.version == version:
+        return jerarquia
+
+    archivo = ruta_tabla_grafo(G, f"ch_{peso}.npz")
+    jerarquia = cargar_jerarquia(archivo, version) if archivo else None
+    if jerarquia is None:
+        jerarquia = construir_jerarquia(G, peso)
+        if archivo:
+            guardar_jerarquia(jerarquia, archivo)
+
+    G.graph[clave] = jerarquia
+    return jerarquia
+
+if __name__ == '__main__':
+    from .osm_datos import obtener_grafo_ciudad
+    from config import CIUDAD_DEFAULT
+
+    ciudad = sys.argv[1] if len(sys.argv) > 1 else CIUDAD_DEFAULT
+    G = obtener_grafo_ciudad(ciudad)
+    if G is not None:
+        for peso in ('length', 'travel_time'):
+            obtener_jerarquia(G, peso)
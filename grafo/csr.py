@@ -0,0 +1,212 @@
+# grafo/csr.py
+import numpy as np
+from config import VELOCIDADES_VIA, VELOCIDAD_POR_DEFECTO
+
+class GrafoCSR:
+    """
+    Representación compacta del grafo para ruteo (formato CSR).
+    Los nodos se numeran de 0 a n-1; las aristas salientes del nodo i son
+    destinos[desplazamientos[i]:desplazamientos[i+1]].
+    """
+    def __init__(self, nodos_osm, desplazamientos, destinos, longitud, tiempo, lat, lon, claves=None,
+                 highway=None, tipos_via=None, velocidades=None):
+        self.nodos_osm = nodos_osm
+        self.desplazamientos = desplazamientos
+        self.destinos = destinos
+        self.lat = lat
+        self.lon = lon
+        self.claves = claves if claves is not None else np.zeros(len(destinos), dtype=np.int32)
+        self.highway = highway if highway is not None else np.zeros(len(destinos), dtype=np.int16)
+        self.tipos_via = tipos_via or ['']
+        # travel_time tal como viene de OSM/osmnx, antes de aplicar VELOCIDADES_VIA
+        self.tiempo_osm = tiempo
+        self.pesos = {
+            'length': longitud,
+            'travel_time': tiempo_con_velocidades(longitud, tiempo, self.highway, self.tipos_via,
+                                                  VELOCIDADES_VIA if velocidades is None else velocidades)
+        }
+        self.indice = {nodo: i for i, nodo in enumerate(nodos_osm.tolist())}
+        self.graph = {}
+        self._listas = {}
+        self._inverso = None
+
+    def __getstate__(self):
+        """
+        Al enviar el grafo a otro proceso no se copian las cachés derivadas
+        """
+        estado = self.__dict__.copy()
+        estado['_listas'] = {}
+        estado['_inverso'] = None
+        estado['graph'] = {}
+        estado.pop('indice_espacial', None)
+        return estado
+
+    @property
+    def num_nodos(self):
+        return len(self.nodos_osm)
+
+    @property
+    def num_aristas(self):
+        return len(self.destinos)
+
+    def __contains__(self, nodo):
+        return nodo in self.indice
+
+    def __len__(self):
+        return self.num_nodos
+
+    @property
+    def origenes(self):
+        """
+        Nodo origen (índice) de cada arista
+        """
+        if 'origenes' not in self._listas:
+            grados = np.diff(self.desplazamientos)
+            self._listas['origenes'] = np.repeat(np.arange(self.num_nodos, dtype=np.int32), grados)
+        return self._listas['origenes']
+
+    def lista(self, nombre):
+        """
+        Devuelve un arreglo como lista de Python (más rápido en bucles puros).
+        nombre puede ser 'desplazamientos', 'destinos', 'origenes' o un peso.
+        """
+        clave = f"lista_{nombre}"
+        if clave not in self._listas:
+            if nombre in self.pesos:
+                arreglo = self.pesos[nombre]
+            elif nombre == 'origenes':
+                arreglo = self.origenes
+            else:
+                arreglo = getattr(self, nombre)
+            self._listas[clave] = arreglo.tolist()
+        return self._listas[clave]
+
+    def coordenadas(self, nodo):
+        """
+        Obtiene (lat, lon) de un nodo por su id OSM
+        """
+        i = self.indice[nodo]
+        return float(self.lat[i]), float(self.lon[i])
+
+    def coordenadas_camino(self, camino):
+        """
+        Convierte un camino de ids OSM a una lista [lon, lat] para Mapbox
+        """
+        indices = np.fromiter((self.indice[n] for n in camino), dtype=np.int64, count=len(camino))
+        return np.column_stack((self.lon[indices], self.lat[indices])).tolist()
+
+    def inverso(self):
+        """
+        Devuelve el grafo con las aristas invertidas (para búsquedas hacia atrás).
+        El arreglo 'aristas' del inverso indica la arista original de cada posición.
+        """
+        if self._inverso is None:
+            orden = np.argsort(self.destinos, kind='stable')
+            grados = np.bincount(self.destinos, minlength=self.num_nodos)
+            desplazamientos = np.zeros(self.num_nodos + 1, dtype=np.int64)
+            np.cumsum(grados, out=desplazamientos[1:])
+            inverso = GrafoCSR.__new__(GrafoCSR)
+            inverso.nodos_osm = self.nodos_osm
+            inverso.desplazamientos = desplazamientos
+            inverso.destinos = self.origenes[orden]
+            inverso.pesos = {peso: arreglo[orden] for peso, arreglo in self.pesos.items()}
+            inverso.lat = self.lat
+            inverso.lon = self.lon
+            inverso.claves = self.claves[orden]
+            inverso.highway = self.highway[orden]
+            inverso.tipos_via = self.tipos_via
+            inverso.tiempo_osm = self.tiempo_osm[orden]
+            inverso.aristas = orden.astype(np.int64)
+            inverso.indice = self.indice
+            inverso.graph = {}
+            inverso._listas = {}
+            inverso._inverso = self
+            self._inverso = inverso
+        return self._inverso
+
+def tiempo_con_velocidades(longitud, tiempo, highway, tipos_via, velocidades):
+    """
+    Recalcula travel_time (s) de las aristas cuyo tipo de vía tiene una
+    velocidad definida en velocidades (km/h); el resto queda igual
+    """
+    if not velocidades:
+        return tiempo
+    resultado = np.array(tiempo, dtype=np.float32)
+    for codigo, tipo in enumerate(tipos_via):
+        if tipo in velocidades:
+            mascara = highway == codigo
+            resultado[mascara] = longitud[mascara] / (velocidades[tipo] / 3.6)
+    return resultado
+
+def tipo_via(valor):
+    """
+    Tipo de vía principal de una arista (osmnx puede guardar listas en aristas simplificadas)
+    """
+    if isinstance(valor, list):
+        return valor[0] if valor else ''
+    return str(valor) if valor is not None else ''
+
+def compilar_grafo_csr(G, velocidades=None):
+    """
+    Construye la representación CSR a partir del MultiDiGraph de osmnx.
+    Los pesos se guardan como float32; si falta travel_time se estima con
+    speed_kph o VELOCIDAD_POR_DEFECTO.
+    """
+    nodos_osm = list(G.nodes)
+    indice = {nodo: i for i, nodo in enumerate(nodos_osm)}
+    n = len(nodos_osm)
+
+    origenes, destinos, claves, longitud, tiempo, highway = [], [], [], [], [], []
+    tipos_via = {}
+    if G.is_multigraph():
+        aristas = G.edges(keys=True, data=True)
+    else:
+        aristas = ((u, v, 0, d) for u, v, d in G.edges(data=True))
+    for u, v, k, datos in aristas:
+        origenes.append(indice[u])
+        destinos.append(indice[v])
+        claves.append(k if isinstance(k, int) else 0)
+        largo = float(datos.get('length', 1))
+        longitud.append(largo)
+        if datos.get('travel_time') is not None:
+            tiempo.append(float(datos['travel_time']))
+        else:
+            velocidad = float(datos.get('speed_kph') or VELOCIDAD_POR_DEFECTO)
+            tiempo.append(largo / (velocidad / 3.6))
+        highway.append(tipos_via.setdefault(tipo_via(datos.get('highway')), len(tipos_via)))
+
+    origenes = np.asarray(origenes, dtype=np.int32)
+    orden = np.argsort(origenes, kind='stable')
+    grados = np.bincount(origenes, minlength=n)
+    desplazamientos = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(grados, out=desplazamientos[1:])
+
+    try:
+        ids = np.asarray(nodos_osm, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        ids = np.asarray(nodos_osm, dtype=object)
+
+    return GrafoCSR(
+        ids,
+        desplazamientos,
+        np.asarray(destinos, dtype=np.int32)[orden],
+        np.asarray(longitud, dtype=np.float32)[orden],
+        np.asarray(tiempo, dtype=np.float32)[orden],
+        np.asarray([G.nodes[nodo].get('y', 0.0) for nodo in nodos_osm], dtype=np.float64),
+        np.asarray([G.nodes[nodo].get('x', 0.0) for nodo in nodos_osm], dtype=np.float64),
+        np.asarray(claves, dtype=np.int32)[orden],
+        np.asarray(highway, dtype=np.int16)[orden],
+        sorted(tipos_via, key=tipos_via.get),
+        velocidades
+    )
+
+def obtener_grafo_csr(G):
+    """
+    Devuelve el GrafoCSR asociado a G, compilándolo una sola vez.
+    Si G ya es un GrafoCSR se devuelve tal cual.
+    """
+    if isinstance(G, GrafoCSR):
+        return G
+    if 'csr' not in G.graph:
+        G.graph['csr'] = compilar_grafo_csr(G)
+    return G.graph['csr']
@@ -0,0 +1,148 @@
+# grafo/geometria.py
+"""
+Geometría compacta de rutas para los mapas: simplificación Douglas-Peucker,
+polilíneas codificadas y tramos compartidos entre rutas (cada tramo común
+se escribe una sola vez).
+"""
+import math
+import numpy as np
+from .indice_espacial import RADIO_TIERRA
+from .utilidades import obtener_ruta_coordenadas
+from . import metricas
+
+def metros_por_pixel(zoom, lat):
+    """
+    Metros que cubre un píxel de Mapbox GL (teselas de 512 px) en un zoom y latitud
+    """
+    return 2 * math.pi * RADIO_TIERRA * math.cos(math.radians(lat)) / (512 * 2 ** zoom)
+
+def douglas_peucker(coordenadas, tolerancia):
+    """
+    Simplifica una lista [[lon, lat], ...] con Douglas-Peucker (tolerancia en metros).
+    Siempre conserva el primer y el último punto.
+    """
+    puntos = np.asarray(coordenadas, dtype=np.float64)
+    n = len(puntos)
+    if n < 3 or tolerancia <= 0:
+        return puntos.tolist()
+
+    # Proyección equirectangular local a metros
+    escala = math.radians(1) * RADIO_TIERRA
+    xy = np.column_stack((puntos[:, 0] * escala * math.cos(math.radians(puntos[:, 1].mean())),
+                          puntos[:, 1] * escala))
+
+    conservar = np.zeros(n, dtype=bool)
+    conservar[0] = conservar[-1] = True
+    pila = [(0, n - 1)]
+    while pila:
+        inicio, fin = pila.pop()
+        if fin - inicio < 2:
+            continue
+        a, b = xy[inicio], xy[fin]
+        tramo = xy[inicio + 1:fin]
+        ab = b - a
+        largo = math.hypot(ab[0], ab[1])
+        if largo == 0:
+            distancias = np.hypot(tramo[:, 0] - a[0], tramo[:, 1] - a[1])
+        else:
+            distancias = np.abs(ab[0] * (tramo[:, 1] - a[1]) - ab[1] * (tramo[:, 0] - a[0])) / largo
+        mayor = int(np.argmax(distancias))
+        if distancias[mayor] > tolerancia:
+            medio = inicio + 1 + mayor
+            conservar[medio] = True
+            pila.append((inicio, medio))
+            pila.append((medio, fin))
+    return puntos[conservar].tolist()
+
+def codificar_polilinea(coordenadas, precision=6):
+    """
+    Codifica [[lon, lat], ...] con el algoritmo de polilíneas de Google
+    (orden lat, lon; precision = número de decimales)
+    """
+    if not len(coordenadas):
+        return ''
+    valores = np.round(np.asarray(coordenadas, dtype=np.float64)[:, ::-1] * 10 ** precision).astype(np.int64)
+    deltas = np.diff(valores, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    partes = []
+    for delta in deltas.tolist():
+        valor = ~(delta << 1) if delta < 0 else delta << 1
+        while valor >= 0x20:
+            partes.append(chr((0x20 | (valor & 0x1f)) + 63))
+            valor >>= 5
+        partes.append(chr(valor + 63))
+    return ''.join(partes)
+
+def decodificar_polilinea(texto, precision=6):
+    """
+    Inversa de codificar_polilinea; devuelve [[lon, lat], ...]
+    """
+    coordenadas = []
+    actual = [0, 0]
+    posicion = 0
+    while posicion < len(texto):
+        for eje in range(2):
+            resultado, desplazamiento = 0, 0
+            while True:
+                byte = ord(texto[posicion]) - 63
+                posicion += 1
+                resultado |= (byte & 0x1f) << desplazamiento
+                desplazamiento += 5
+                if byte < 0x20:
+                    break
+            actual[eje] += ~(resultado >> 1) if resultado & 1 else resultado >> 1
+        coordenadas.append([actual[1] / 10 ** precision, actual[0] / 10 ** precision])
+    return coordenadas
+
+def _prefijo_comun(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+def tramos_compartidos(caminos):
+    """
+    Divide los caminos (listas de nodos) en tramos de modo que el prefijo común
+    de varias rutas sea un único tramo. Devuelve (tramos, rutas): tramos es una
+    lista de (índice de camino, inicio, fin) con los extremos incluidos, y
+    rutas la lista de ids de tramo de cada camino.
+    """
+    cortes = []
+    for r, camino in enumerate(caminos):
+        puntos = {0, len(camino) - 1}
+        for s, otro in enumerate(caminos):
+            if s != r:
+                comun = _prefijo_comun(camino, otro)
+                if 0 < comun < len(camino):
+                    puntos.add(comun - 1)
+        cortes.append(sorted(puntos))
+
+    tramos, ids, rutas = [], {}, []
+    for r, camino in enumerate(caminos):
+        ruta = []
+        for inicio, fin in list(zip(cortes[r], cortes[r][1:])) or [(0, 0)]:
+            clave = tuple(camino[:fin + 1])
+            if clave not in ids:
+                ids[clave] = len(tramos)
+                tramos.append((r, inicio, fin))
+            ruta.append(ids[clave])
+        rutas.append(ruta)
+    return tramos, rutas
+
+def geometria_compacta(G, caminos, tolerancia=0.0, precision=6):
+    """
+    Geometría de varias rutas para enviar al navegador: tramos comunes
+    deduplicados, simplificados (tolerancia en metros) y codificados.
+    Devuelve {'precision', 'tramos': [polilínea, ...], 'rutas': [[id tramo, ...], ...]}.
+    """
+    with metricas.tramo('coordenadas'):
+        coordenadas = [obtener_ruta_coordenadas(G, camino) for camino in caminos]
+    with metricas.tramo('geometria'):
+        tramos, rutas = tramos_compartidos(caminos)
+        codificados = [codificar_polilinea(douglas_peucker(coordenadas[r][inicio:fin + 1], tolerancia), precision)
+                       for r, inicio, fin in tramos]
+    return {
+        'precision': precision,
+        'tramos': codificados,
+        'rutas': rutas
+    }
@@ -1,60 +1,595 @@
 # grafo/grafo.py
+import heapq
 import networkx as nx
-from .utilidades import coordenadas_nodo, formatear_distancia, formatear_tiempo, nodo_mas_cercano
+from config import CACHE_RUTAS, PESO_RUTEO
+from .utilidades import formatear_distancia, formatear_tiempo, version_grafo
+from .cache_rutas import CacheRutas
+from .cercania import obtener_campo_cercania
+from .csr import obtener_grafo_csr
+from .contraccion import obtener_jerarquia
+from .heuristicas import cota_haversine, obtener_landmarks
+from .ajuste_hospitales import ajustar_hospitales
+from . import metricas
+
+# Caché compartida de resultados de rutas
+cache_rutas = CacheRutas(
+    CACHE_RUTAS['capacidad'],
+    CACHE_RUTAS['ttl_segundos'],
+    CACHE_RUTAS['directorio'],
+    CACHE_RUTAS['capacidad_disco']
+)
 
 class GrafoDijkstra:
-    def __init__(self, G):
+    def __init__(self, G, campo_cercania=None, motor='dijkstra', cache=None, peso=PESO_RUTEO,
+                 restricciones=None):
+        """
+        motor: 'dijkstra' (búsqueda multidestino sobre el grafo CSR),
+        'ch' (consultas sobre la jerarquía de contracción precalculada),
+        'astar' (A* con cota haversine) o 'alt' (A* con landmarks).
+        cache: CacheRutas opcional para reutilizar resultados ya calculados.
+        peso: 'travel_time' (ruta más rápida) o 'length' (ruta más corta)
+        restricciones: CapaRestricciones con cierres y penalizaciones; por defecto
+        la registrada en G.graph['restricciones'], si existe
+        """
         self.G = G
+        self.cache = cache
+        self.restricciones = restricciones if restricciones is not None else G.graph.get('restricciones')
+        self.peso = peso
+        self.criterio = 'tiempo' if peso == 'travel_time' else 'longitud'
+        self.csr = obtener_grafo_csr(G)
+        self.campo_cercania = campo_cercania
+        self.motor = motor
+        self.jerarquia = obtener_jerarquia(G, peso) if motor == 'ch' else None
+        self.landmarks = obtener_landmarks(G, peso) if motor == 'alt' else None
+        
+        # Nodos asentados en la última llamada, para comparar motores
+        self.nodos_asentados = 0
     
     def rutas_dijkstra(self, nodo_origen, lista_destinos):
         """
-        Calcula las rutas más cortas desde el origen a múltiples destinos usando Dijkstra
+        Calcula las rutas más cortas desde el origen a múltiples destinos usando Dijkstra.
+        Se realiza una sola búsqueda que se detiene al asentar el último destino
+        y los caminos se reconstruyen desde un mapa de predecesores compartido.
+        """
+        if self.cache is None:
+            return self._calcular_contando(nodo_origen, lista_destinos)
+        
+        clave = self.cache.crear_clave(version_grafo(self.G), nodo_origen, lista_destinos, self.peso)
+        rutas = self._consultar_cache(clave, nodo_origen, lista_destinos)
+        return {destino: rutas[destino] for destino in lista_destinos if destino in rutas}
+    
+    def rutas_mas_cercanas(self, nodo_origen, lista_destinos, k):
+        """
+        Calcula solo las rutas a los k destinos más cercanos según el peso de ruteo.
+        Dijkstra asienta los destinos en orden de costo, así la búsqueda termina
+        al asentar el k-ésimo sin recorrer el grafo hasta los demás.
+        """
+        destinos = [destino for destino in dict.fromkeys(lista_destinos) if destino in self.csr]
+        if k <= 0:
+            return {}
+        if k >= len(destinos):
+            return self.rutas_dijkstra(nodo_origen, lista_destinos)
+        if self.cache is None:
+            return self._calcular_contando(nodo_origen, destinos, k)
+        
+        clave = self.cache.crear_clave(version_grafo(self.G), nodo_origen, destinos, f"{self.peso}_k{k}")
+        return self._consultar_cache(clave, nodo_origen, destinos, k)
+    
+    def _consultar_cache(self, clave, nodo_origen, lista_destinos, k=None):
+        if self.restricciones is not None:
+            # Una restricción vencida descarta antes lo que se calculó con ella
+            self.restricciones.limpiar_expiradas()
+        rutas = self.cache.obtener(clave)
+        metricas.incrementar('cache_rutas_total', resultado='fallo' if rutas is None else 'acierto')
+        if rutas is None:
+            rutas = self._calcular_contando(nodo_origen, lista_destinos, k)
+            if self._restringido():
+                # Válido mientras sigan las restricciones actuales: solo en memoria
+                self.restricciones.registrar_calculo(clave)
+                self.cache.guardar(clave, rutas, persistir=False)
+            else:
+                self.cache.guardar(clave, rutas)
+        else:
+            self.nodos_asentados = 0
+        return rutas
+    
+    def _calcular_contando(self, nodo_origen, lista_destinos, k=None):
+        if k is None:
+            rutas = self._calcular_rutas(nodo_origen, lista_destinos)
+        else:
+            rutas = self._calcular_mas_cercanas(nodo_origen, lista_destinos, k)
+        metricas.incrementar('nodos_asentados_total', self.nodos_asentados, motor=self.motor)
+        return rutas
+    
+    def _calcular_rutas(self, nodo_origen, lista_destinos):
+        """
+        Calcula las rutas con el motor configurado
         """
         rutas = {}
         
+        # La jerarquía se construyó con los pesos originales: con restricciones
+        # activas se usa Dijkstra
+        if self.jerarquia is not None and not self._restringido():
+            return self._rutas_jerarquia(nodo_origen, lista_destinos)
+        if self.motor in ('astar', 'alt'):
+            return self._rutas_a_estrella(nodo_origen, lista_destinos)
+        
+        try:
+            _, predecesores, asentados = self._dijkstra_multidestino(nodo_origen, lista_destinos, self.peso)
+        except Exception as e:
+            print(f"Error calculando rutas desde {nodo_origen}: {e}")
+            return rutas
+        
         for destino in lista_destinos:
-            try:
-                # Calcular ruta más corta
-                camino = nx.shortest_path(self.G, nodo_origen, destino, weight='length')
-                longitud = nx.shortest_path_length(self.G, nodo_origen, destino, weight='length')
-                
-                # Calcular tiempo si está disponible
-                tiempo = 0
-                
-                #try:
-                    #tiempo = nx.shortest_path_length(self.G, nodo_origen, destino, weight='travel_time')
-                #except:
-                # Si no hay datos de tiempo, estimamos basado en velocidad promedio
-                velocidad_promedio = 4.5  # km/h
-                tiempo = ((longitud / 1000) / velocidad_promedio) * 3600  # segundos
-                
-                rutas[destino] = {
-                    'camino': camino,
-                    'longitud': longitud,
-                    'tiempo': tiempo,
-                    'longitud_formateada': formatear_distancia(longitud),
-                    'tiempo_formateado': formatear_tiempo(tiempo)
-                }
-                
-            except nx.NetworkXNoPath:
+            indice = self.csr.indice.get(destino)
+            if indice is None or not asentados[indice]:
+                print(f"No se encontró ruta al destino {destino}")
+                continue
+            
+            rutas[destino] = self._crear_info_ruta(*self._reconstruir_camino(predecesores, indice))
+        
+        return rutas
+    
+    def _restringido(self):
+        return self.restricciones is not None and self.restricciones.activa()
+    
+    def _pesos(self, peso):
+        """
+        Pesos de las aristas con las restricciones activas aplicadas
+        """
+        if self._restringido():
+            return self.restricciones.pesos(peso)
+        return self.csr.lista(peso)
+    
+    def _rutas_jerarquia(self, nodo_origen, lista_destinos):
+        """
+        Calcula las rutas con una consulta de la jerarquía de contracción por destino
+        """
+        rutas = {}
+        self.nodos_asentados = 0
+        for destino in lista_destinos:
+            _, camino = self.jerarquia.consulta(nodo_origen, destino)
+            self.nodos_asentados += self.jerarquia.nodos_asentados
+            if camino is None:
                 print(f"No se encontró ruta al destino {destino}")
                 continue
-            except Exception as e:
-                print(f"Error calculando ruta a {destino}: {e}")
+            rutas[destino] = self._crear_info_ruta(camino, *self._metricas_camino(camino))
+        return rutas
+    
+    def _rutas_a_estrella(self, nodo_origen, lista_destinos):
+        """
+        Calcula las rutas con una búsqueda A* (haversine o ALT) por destino
+        """
+        rutas = {}
+        self.nodos_asentados = 0
+        if nodo_origen not in self.csr:
+            print(f"Error calculando rutas desde {nodo_origen}: el nodo no está en el grafo")
+            return rutas
+        
+        origen = self.csr.indice[nodo_origen]
+        for destino in lista_destinos:
+            indice = self.csr.indice.get(destino)
+            if indice is None:
+                print(f"No se encontró ruta al destino {destino}")
+                continue
+            if self.landmarks is not None:
+                cota = self.landmarks.cota(indice)
+            else:
+                cota = cota_haversine(self.csr, indice, self.peso)
+            
+            _, predecesores = self._a_estrella(origen, indice, cota, self.peso)
+            if predecesores is None:
+                print(f"No se encontró ruta al destino {destino}")
                 continue
+            rutas[destino] = self._crear_info_ruta(*self._reconstruir_camino(predecesores, indice))
+        return rutas
+    
+    def _a_estrella(self, origen, destino, cota, peso='length'):
+        """
+        Búsqueda A* entre dos índices del grafo CSR con la cota inferior dada.
+        Devuelve (distancia, predecesores) o (None, None) si no hay camino.
+        """
+        desplazamientos = self.csr.lista('desplazamientos')
+        destinos = self.csr.lista('destinos')
+        pesos = self._pesos(peso)
         
+        distancias = {origen: 0.0}
+        predecesores = {origen: -1}
+        heap = [(cota(origen), 0.0, origen)]
+        
+        while heap:
+            _, dist, i = heapq.heappop(heap)
+            if dist > distancias[i]:
+                continue
+            self.nodos_asentados += 1
+            if i == destino:
+                return dist, predecesores
+            
+            for arista in range(desplazamientos[i], desplazamientos[i + 1]):
+                j = destinos[arista]
+                nueva = dist + pesos[arista]
+                if nueva < distancias.get(j, float('inf')):
+                    distancias[j] = nueva
+                    predecesores[j] = arista
+                    heapq.heappush(heap, (nueva + cota(j), nueva, j))
+        
+        return None, None
+    
+    def _calcular_mas_cercanas(self, nodo_origen, lista_destinos, k):
+        """
+        Rutas a los k destinos más cercanos con una búsqueda multidestino que
+        se detiene al asentar el k-ésimo
+        """
+        try:
+            distancias, predecesores, asentados = self._dijkstra_multidestino(
+                nodo_origen, lista_destinos, self.peso, k=k)
+        except Exception as e:
+            print(f"Error calculando rutas desde {nodo_origen}: {e}")
+            return {}
+        
+        alcanzados = [self.csr.indice[d] for d in lista_destinos if asentados[self.csr.indice[d]]]
+        rutas = {}
+        for indice in sorted(alcanzados, key=lambda i: distancias[i])[:k]:
+            destino = self.csr.nodos_osm[indice].item()
+            rutas[destino] = self._crear_info_ruta(*self._reconstruir_camino(predecesores, indice))
+        if len(rutas) < k:
+            print(f"Solo {len(rutas)} de {k} destinos alcanzables desde {nodo_origen}")
         return rutas
     
-    def encontrar_destino_mas_cercano(self, rutas):
+    def _crear_info_ruta(self, camino, longitud, tiempo):
+        """
+        Arma el diccionario de información de una ruta
+        """
+        return {
+            'camino': camino,
+            'longitud': longitud,
+            'tiempo': tiempo,
+            'longitud_formateada': formatear_distancia(longitud),
+            'tiempo_formateado': formatear_tiempo(tiempo)
+        }
+    
+    def _dijkstra_multidestino(self, nodo_origen, lista_destinos, peso='length', pesos=None, k=None):
         """
-        Encuentra el destino más cercano basado en la distancia
+        Dijkstra sobre el grafo CSR desde un origen que termina cuando todos los
+        destinos (o k de ellos) están asentados. Devuelve las distancias por índice
+        de nodo, la arista predecesora de cada nodo (-1 si no tiene) y los nodos asentados.
+        pesos permite pasar una lista de pesos propia (en el orden del grafo CSR).
+        """
+        csr = self.csr
+        if nodo_origen not in csr:
+            raise nx.NodeNotFound(f"El nodo origen {nodo_origen} no está en el grafo")
+        
+        origen = csr.indice[nodo_origen]
+        pendientes = {csr.indice[d] for d in lista_destinos if d in csr}
+        # Destinos que pueden quedar sin asentar
+        sobrantes = 0 if k is None else max(len(pendientes) - k, 0)
+        
+        desplazamientos = csr.lista('desplazamientos')
+        destinos = csr.lista('destinos')
+        if pesos is None:
+            pesos = self._pesos(peso)
+        
+        infinito = float('inf')
+        distancias = [infinito] * csr.num_nodos
+        predecesores = [-1] * csr.num_nodos
+        asentados = bytearray(csr.num_nodos)
+        distancias[origen] = 0.0
+        heap = [(0.0, origen)]
+        
+        self.nodos_asentados = 0
+        while heap and len(pendientes) > sobrantes:
+            dist, i = heapq.heappop(heap)
+            if asentados[i]:
+                continue
+            asentados[i] = 1
+            self.nodos_asentados += 1
+            pendientes.discard(i)
+            
+            for arista in range(desplazamientos[i], desplazamientos[i + 1]):
+                j = destinos[arista]
+                if asentados[j]:
+                    continue
+                nueva = dist + pesos[arista]
+                if nueva < distancias[j]:
+                    distancias[j] = nueva
+                    predecesores[j] = arista
+                    heapq.heappush(heap, (nueva, j))
+        
+        return distancias, predecesores, asentados
+    
+    def _reconstruir_camino(self, predecesores, destino):
         """
+        Reconstruye el camino (ids OSM) desde el origen hasta el índice destino
+        siguiendo las aristas predecesoras. En el mismo recorrido acumula la
+        longitud (m) y el tiempo (s) de las aristas usadas (con penalizaciones).
+        Devuelve (camino, longitud, tiempo).
+        """
+        origenes = self.csr.lista('origenes')
+        longitudes = self.csr.lista('length')
+        tiempos = self._pesos('travel_time')
+        longitud = 0.0
+        tiempo = 0.0
+        camino = [destino]
+        arista = predecesores[destino]
+        while arista != -1:
+            longitud += longitudes[arista]
+            tiempo += tiempos[arista]
+            destino = origenes[arista]
+            camino.append(destino)
+            arista = predecesores[destino]
+        camino.reverse()
+        return self.csr.nodos_osm[camino].tolist(), longitud, tiempo
+    
+    def rutas_alternativas(self, nodo_origen, lista_destinos, k=3, metodo='yen', max_solape=0.8):
+        """
+        Hasta k rutas por destino, de mejor a peor.
+        metodo 'yen': k caminos más cortos sin ciclos. Se calcula una vez el árbol
+        inverso de caminos mínimos hacia el destino y cada búsqueda de desvío es
+        un A* guiado por ese árbol (solo explora donde el desvío difiere).
+        metodo 'penalizacion': una búsqueda multidestino por ronda para todos los
+        destinos, encareciendo las aristas ya usadas; se descartan alternativas
+        que comparten más de max_solape de su longitud con una ya elegida.
+        Devuelve {destino: [info_ruta, ...]} con 'alternativa' = 0, 1, ...
+        """
+        if nodo_origen not in self.csr:
+            print(f"Error calculando rutas desde {nodo_origen}: el nodo no está en el grafo")
+            return {}
+        if metodo == 'penalizacion':
+            return self._rutas_penalizacion(nodo_origen, lista_destinos, k, max_solape)
+        
+        alternativas = {}
+        origen = self.csr.indice[nodo_origen]
+        self.nodos_asentados = 0
+        for destino in lista_destinos:
+            indice = self.csr.indice.get(destino)
+            caminos = self._yen(origen, indice, k) if indice is not None else []
+            if not caminos:
+                print(f"No se encontró ruta al destino {destino}")
+                continue
+            alternativas[destino] = [self._info_desde_aristas(origen, aristas, n)
+                                     for n, aristas in enumerate(caminos)]
+        return alternativas
+    
+    def _arbol_hacia(self, destino):
+        """
+        Dijkstra completo sobre el grafo inverso desde el índice destino.
+        Devuelve (distancia restante de cada nodo, arista siguiente hacia el destino).
+        """
+        inverso = self.csr.inverso()
+        desplazamientos = inverso.lista('desplazamientos')
+        destinos = inverso.lista('destinos')
+        originales = inverso.lista('aristas')
+        capa = self.restricciones if self._restringido() else None
+        pesos = capa.pesos_inversos(self.peso) if capa else inverso.lista(self.peso)
+        
+        infinito = float('inf')
+        restante = [infinito] * inverso.num_nodos
+        siguiente = [-1] * inverso.num_nodos
+        restante[destino] = 0.0
+        heap = [(0.0, destino)]
+        while heap:
+            dist, i = heapq.heappop(heap)
+            if dist > restante[i]:
+                continue
+            for posicion in range(desplazamientos[i], desplazamientos[i + 1]):
+                j = destinos[posicion]
+                nueva = dist + pesos[posicion]
+                if nueva < restante[j]:
+                    restante[j] = nueva
+                    siguiente[j] = originales[posicion]
+                    heapq.heappush(heap, (nueva, j))
+        return restante, siguiente
+    
+    def _yen(self, origen, destino, k):
+        """
+        Algoritmo de Yen entre dos índices. Devuelve hasta k caminos como listas de aristas.
+        """
+        destinos = self.csr.lista('destinos')
+        pesos = self._pesos(self.peso)
+        restante, siguiente = self._arbol_hacia(destino)
+        if restante[origen] == float('inf'):
+            return []
+        
+        primero = []
+        i = origen
+        while i != destino:
+            primero.append(siguiente[i])
+            i = destinos[siguiente[i]]
+        
+        encontrados = [primero]
+        candidatos = []
+        vistos = {tuple(destinos[a] for a in primero)}
+        while len(encontrados) < k:
+            ultimo = encontrados[-1]
+            nodos = [origen] + [destinos[a] for a in ultimo]
+            costo_raiz = 0.0
+            for i in range(len(ultimo)):
+                raiz = ultimo[:i]
+                # Cerrar la continuación que ya usan los caminos con la misma raíz
+                siguientes_usados = {destinos[camino[i]] for camino in encontrados
+                                     if len(camino) > i and camino[:i] == raiz}
+                desvio = self._desvio(nodos[i], destino, restante, siguientes_usados, set(nodos[:i]))
+                if desvio is not None:
+                    costo_desvio, aristas_desvio = desvio
+                    camino = raiz + aristas_desvio
+                    secuencia = tuple(nodos[:i + 1]) + tuple(destinos[a] for a in aristas_desvio)
+                    if secuencia not in vistos:
+                        vistos.add(secuencia)
+                        heapq.heappush(candidatos, (costo_raiz + costo_desvio, len(camino), camino))
+                costo_raiz += pesos[ultimo[i]]
+            if not candidatos:
+                break
+            encontrados.append(heapq.heappop(candidatos)[2])
+        return encontrados
+    
+    def _desvio(self, inicio, destino, restante, siguientes_prohibidos, nodos_prohibidos):
+        """
+        A* desde inicio hasta destino con la distancia restante del árbol inverso
+        como cota (exacta mientras el camino del árbol no esté bloqueado).
+        Devuelve (costo, aristas) o None.
+        """
+        desplazamientos = self.csr.lista('desplazamientos')
+        destinos = self.csr.lista('destinos')
+        origenes = self.csr.lista('origenes')
+        pesos = self._pesos(self.peso)
+        infinito = float('inf')
+        
+        distancias = {inicio: 0.0}
+        predecesores = {inicio: -1}
+        heap = [(restante[inicio], 0.0, inicio)]
+        while heap:
+            _, dist, i = heapq.heappop(heap)
+            if dist > distancias[i]:
+                continue
+            self.nodos_asentados += 1
+            if i == destino:
+                aristas = []
+                while predecesores[i] != -1:
+                    aristas.append(predecesores[i])
+                    i = origenes[predecesores[i]]
+                aristas.reverse()
+                return dist, aristas
+            
+            for arista in range(desplazamientos[i], desplazamientos[i + 1]):
+                j = destinos[arista]
+                if j in nodos_prohibidos or (i == inicio and j in siguientes_prohibidos):
+                    continue
+                if restante[j] == infinito:
+                    continue
+                nueva = dist + pesos[arista]
+                if nueva < distancias.get(j, infinito):
+                    distancias[j] = nueva
+                    predecesores[j] = arista
+                    heapq.heappush(heap, (nueva + restante[j], nueva, j))
+        return None
+    
+    def _rutas_penalizacion(self, nodo_origen, lista_destinos, k, max_solape, factor=1.4):
+        """
+        Alternativas por penalización: cada ronda es una sola búsqueda multidestino
+        """
+        destinos = self.csr.lista('destinos')
+        origenes = self.csr.lista('origenes')
+        longitudes = self.csr.lista('length')
+        origen = self.csr.indice[nodo_origen]
+        base = self._pesos(self.peso)
+        pesos = list(base)
+        elegidas = {destino: [] for destino in lista_destinos if destino in self.csr}
+        usados = {destino: [] for destino in elegidas}
+        asentados_total = 0
+        
+        for _ in range(2 * k):
+            pendientes = [d for d in elegidas if len(elegidas[d]) < k]
+            if not pendientes:
+                break
+            _, predecesores, asentados = self._dijkstra_multidestino(nodo_origen, pendientes, self.peso, pesos)
+            asentados_total += self.nodos_asentados
+            penalizar = set()
+            for destino in pendientes:
+                indice = self.csr.indice[destino]
+                if not asentados[indice]:
+                    continue
+                aristas = []
+                while predecesores[indice] != -1:
+                    aristas.append(predecesores[indice])
+                    indice = origenes[predecesores[indice]]
+                aristas.reverse()
+                penalizar.update(aristas)
+                
+                pares = {(origenes[a], destinos[a]) for a in aristas}
+                longitud = sum(longitudes[a] for a in aristas) or 1.0
+                solape = max((sum(longitudes[a] for a in aristas
+                                  if (origenes[a], destinos[a]) in previos) / longitud
+                              for previos in usados[destino]), default=0.0)
+                if usados[destino] and solape > max_solape:
+                    continue
+                usados[destino].append(pares)
+                elegidas[destino].append(aristas)
+            for arista in penalizar:
+                pesos[arista] *= factor
+        self.nodos_asentados = asentados_total
+        
+        alternativas = {}
+        for destino, caminos in elegidas.items():
+            if not caminos:
+                print(f"No se encontró ruta al destino {destino}")
+                continue
+            caminos.sort(key=lambda aristas: sum(base[a] for a in aristas))
+            alternativas[destino] = [self._info_desde_aristas(origen, aristas, n)
+                                     for n, aristas in enumerate(caminos)]
+        return alternativas
+    
+    def _info_desde_aristas(self, origen, aristas, alternativa=0):
+        """
+        Información de ruta a partir de una lista de aristas CSR
+        """
+        destinos = self.csr.lista('destinos')
+        longitudes = self.csr.lista('length')
+        tiempos = self._pesos('travel_time')
+        camino = [origen] + [destinos[a] for a in aristas]
+        info = self._crear_info_ruta(self.csr.nodos_osm[camino].tolist(),
+                                     sum(longitudes[a] for a in aristas),
+                                     sum(tiempos[a] for a in aristas))
+        info['alternativa'] = alternativa
+        return info
+    
+    def _metricas_camino(self, camino):
+        """
+        Calcula (longitud, tiempo) de un camino de ids OSM tomando, entre aristas
+        paralelas, la de menor peso
+        """
+        longitudes, tiempos = self.metricas_acumuladas(camino)
+        return longitudes[-1], tiempos[-1]
+    
+    def metricas_acumuladas(self, camino):
+        """
+        Longitud y tiempo acumulados hasta cada nodo del camino (el primero vale 0)
+        """
+        desplazamientos = self.csr.lista('desplazamientos')
+        destinos = self.csr.lista('destinos')
+        pesos = self._pesos(self.peso)
+        longitudes = self.csr.lista('length')
+        tiempos = self._pesos('travel_time')
+        indice = self.csr.indice
+        longitud_acumulada = [0.0]
+        tiempo_acumulado = [0.0]
+        for a, b in zip(camino, camino[1:]):
+            i, j = indice[a], indice[b]
+            mejor = min((arista for arista in range(desplazamientos[i], desplazamientos[i + 1])
+                         if destinos[arista] == j), key=lambda arista: pesos[arista])
+            longitud_acumulada.append(longitud_acumulada[-1] + longitudes[mejor])
+            tiempo_acumulado.append(tiempo_acumulado[-1] + tiempos[mejor])
+        return longitud_acumulada, tiempo_acumulado
+    
+    def encontrar_destino_mas_cercano(self, rutas=None, nodo_origen=None):
+        """
+        Encuentra el destino más cercano según el peso de ruteo (tiempo o distancia).
+        Si hay tabla de cercanía y se indica el origen, es una consulta directa.
+        """
+        if nodo_origen is not None and self.campo_cercania is not None:
+            destino, _ = self.campo_cercania.hospital_mas_cercano(nodo_origen)
+            return destino
+        
         if not rutas:
             return None
         
-        destino_mas_cercano = min(rutas.keys(), key=lambda x: rutas[x]['longitud'])
+        destino_mas_cercano = min(rutas.keys(), key=lambda x: rutas[x][self.criterio])
         return destino_mas_cercano
     
+    def ruta_hospital_mas_cercano(self, nodo_origen):
+        """
+        Obtiene la ruta al hospital más cercano recorriendo la tabla de cercanía
+        """
+        if self.campo_cercania is None:
+            return {}
+        
+        destino, _ = self.campo_cercania.hospital_mas_cercano(nodo_origen)
+        if destino is None:
+            print(f"No se encontró hospital alcanzable desde {nodo_origen}")
+            return {}
+        
+        camino = self.campo_cercania.camino(nodo_origen)
+        return {destino: self._crear_info_ruta(camino, *self._metricas_camino(camino))}
+    
     def obtener_estadisticas_rutas(self, rutas):
         """
         Obtiene estadísticas generales de las rutas calculadas
@@ -89,31 +624,46 @@ class GrafoDijkstra:
         
         return rutas_ordenadas
 
-def procesar_rutas_hospitales(G, nodo_origen, hospitales):
+def procesar_rutas_hospitales(G, nodo_origen, hospitales, solo_mas_cercano=False, k=None):
     """
-    Función principal para procesar rutas a hospitales
+    Función principal para procesar rutas a hospitales.
+    Con solo_mas_cercano=True devuelve solo la ruta al hospital más cercano
+    usando la tabla de cercanía precalculada del grafo.
+    Con k devuelve solo las rutas a los k hospitales más cercanos.
     """
     
-    # Crear instancia del grafo
-    grafo_dijkstra = GrafoDijkstra(G)
-    
     # Convertir coordenadas de hospitales a nodos
     nodos_hospitales = []
     hospitales_info = []
     
-    for hospital in hospitales:
-        nodo_hospital = nodo_mas_cercano(G, hospital['lat'], hospital['lon'])
-        if nodo_hospital:
-            nodos_hospitales.append(nodo_hospital)
-            hospital_info = hospital.copy()
-            hospital_info['nodo'] = nodo_hospital
-            hospitales_info.append(hospital_info)
-    
-    # Calcular rutas
-    rutas = grafo_dijkstra.rutas_dijkstra(nodo_origen, nodos_hospitales)
+    with metricas.tramo('ajuste'):
+        nodos_ajustados, _ = ajustar_hospitales(G, hospitales)
+    for hospital, nodo_hospital in zip(hospitales, nodos_ajustados):
+        nodos_hospitales.append(nodo_hospital)
+        hospital_info = hospital.copy()
+        hospital_info['nodo'] = nodo_hospital
+        hospitales_info.append(hospital_info)
     
-    # Encontrar hospital más cercano
-    destino_mas_cercano = grafo_dijkstra.encontrar_destino_mas_cercano(rutas)
+    # Crear instancia del grafo
+    if solo_mas_cercano:
+        grafo_dijkstra = GrafoDijkstra(G)
+        with metricas.tramo('campo_cercania'):
+            grafo_dijkstra.campo_cercania = obtener_campo_cercania(G, nodos_hospitales, grafo_dijkstra.peso)
+        with metricas.tramo('busqueda'):
+            rutas = grafo_dijkstra.ruta_hospital_mas_cercano(nodo_origen)
+        destino_mas_cercano = grafo_dijkstra.encontrar_destino_mas_cercano(nodo_origen=nodo_origen)
+    else:
+        grafo_dijkstra = GrafoDijkstra(G, cache=cache_rutas)
+        
+        # Calcular rutas
+        with metricas.tramo('busqueda'):
+            if k is None:
+                rutas = grafo_dijkstra.rutas_dijkstra(nodo_origen, nodos_hospitales)
+            else:
+                rutas = grafo_dijkstra.rutas_mas_cercanas(nodo_origen, nodos_hospitales, k)
+        
+        # Encontrar hospital más cercano
+        destino_mas_cercano = grafo_dijkstra.encontrar_destino_mas_cercano(rutas)
     
     # Combinar información de hospitales con rutas
     resultado = {
@@ -129,4 +679,35 @@ def procesar_rutas_hospitales(G, nodo_origen, hospitales):
             resultado['rutas'][nodo] = rutas[nodo]
             resultado['hospitales_info'][nodo] = hospital_info
     
-    return resultado
\ No newline at end of file
+    return resultado
+
+def procesar_rutas_alternativas(G, nodo_origen, hospitales, k=3, metodo='yen'):
+    """
+    Como procesar_rutas_hospitales, pero con hasta k rutas por hospital.
+    Las claves de 'rutas' y 'hospitales_info' son (nodo_hospital, alternativa),
+    de modo que generar_mapa_html dibuja cada alternativa como una ruta más.
+    """
+    nodos_hospitales, _ = ajustar_hospitales(G, hospitales)
+    grafo_dijkstra = GrafoDijkstra(G)
+    alternativas = grafo_dijkstra.rutas_alternativas(nodo_origen, nodos_hospitales, k, metodo)
+    
+    resultado = {
+        'rutas': {},
+        'hospitales_info': {},
+        'destino_mas_cercano': None,
+        'estadisticas': None
+    }
+    for hospital, nodo in zip(hospitales, nodos_hospitales):
+        for info in alternativas.get(nodo, []):
+            clave = (nodo, info['alternativa'])
+            hospital_info = hospital.copy()
+            hospital_info['nodo'] = nodo
+            if info['alternativa']:
+                hospital_info['nombre'] = f"{hospital['nombre']} (alternativa {info['alternativa']})"
+            resultado['rutas'][clave] = info
+            resultado['hospitales_info'][clave] = hospital_info
+    
+    principales = {clave: info for clave, info in resultado['rutas'].items() if clave[1] == 0}
+    resultado['destino_mas_cercano'] = grafo_dijkstra.encontrar_destino_mas_cercano(principales)
+    resultado['estadisticas'] = grafo_dijkstra.obtener_estadisticas_rutas(principales)
+    return resultado
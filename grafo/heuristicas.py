@@ -0,0 +1,204 @@
+# grafo/heuristicas.py
+"""
+Cotas inferiores para búsquedas dirigidas (A* y ALT).
+- Haversine: distancia en línea recta (o su tiempo a la velocidad máxima del grafo).
+- ALT: distancias precalculadas desde y hacia unos pocos nodos 'landmark'
+  y la desigualdad triangular.
+"""
+import heapq
+import math
+import os
+import numpy as np
+from .csr import obtener_grafo_csr
+from .utilidades import version_grafo, ruta_tabla_grafo
+
+INFINITO = float('inf')
+RADIO_TIERRA = 6371000  # metros
+# Márgenes de las cotas: relativo (pesos float32 de las aristas) y absoluto
+# (errores de suma cuando la cota es cercana a 0)
+MARGEN_RELATIVO = 0.999
+MARGEN_ABSOLUTO = 1e-6
+
+def cota_haversine(csr, destino, peso='length'):
+    """
+    Devuelve una función índice → cota inferior del costo hasta el índice destino.
+    Para 'travel_time' divide la distancia en línea recta por la velocidad máxima del grafo.
+    """
+    lat = csr.lista('lat')
+    lon = csr.lista('lon')
+    lat_t = math.radians(lat[destino])
+    lon_t = math.radians(lon[destino])
+    cos_t = math.cos(lat_t)
+
+    if peso == 'length':
+        factor = MARGEN_RELATIVO
+    else:
+        factor = MARGEN_RELATIVO / velocidad_maxima(csr, peso)
+
+    def cota(i):
+        lat_i = math.radians(lat[i])
+        dlat = lat_t - lat_i
+        dlon = lon_t - math.radians(lon[i])
+        a = math.sin(dlat / 2) ** 2 + math.cos(lat_i) * cos_t * math.sin(dlon / 2) ** 2
+        return max(0.0, factor * 2 * RADIO_TIERRA * math.asin(math.sqrt(min(1.0, a))) - MARGEN_ABSOLUTO)
+
+    return cota
+
+def velocidad_maxima(csr, peso='travel_time'):
+    """
+    Mayor relación longitud/peso de las aristas (m/s para travel_time)
+    """
+    clave = f"velocidad_maxima_{peso}"
+    if clave not in csr._listas:
+        longitud = csr.pesos['length']
+        costo = csr.pesos[peso]
+        validas = costo > 0
+        csr._listas[clave] = float(np.max(longitud[validas] / costo[validas])) if validas.any() else 1.0
+    return csr._listas[clave]
+
+def _distancias_desde(csr, fuentes, peso):
+    """
+    Dijkstra completo con múltiples fuentes sobre un grafo CSR
+    """
+    desplazamientos = csr.lista('desplazamientos')
+    destinos = csr.lista('destinos')
+    pesos = csr.lista(peso)
+    distancias = [INFINITO] * csr.num_nodos
+    heap = []
+    for fuente in fuentes:
+        distancias[fuente] = 0.0
+        heap.append((0.0, fuente))
+    heapq.heapify(heap)
+    while heap:
+        dist, i = heapq.heappop(heap)
+        if dist > distancias[i]:
+            continue
+        for arista in range(desplazamientos[i], desplazamientos[i + 1]):
+            j = destinos[arista]
+            nueva = dist + pesos[arista]
+            if nueva < distancias[j]:
+                distancias[j] = nueva
+                heapq.heappush(heap, (nueva, j))
+    return distancias
+
+class Landmarks:
+    """
+    Distancias desde (adelante[k][v] = d(L_k, v)) y hacia (atras[k][v] = d(v, L_k))
+    cada landmark, guardadas como float64 (inf si no es alcanzable): con float32
+    la diferencia de dos distancias parecidas puede superar a la real
+    """
+    def __init__(self, nodos, adelante, atras, peso='length', version=''):
+        self.nodos = nodos
+        self.adelante = adelante
+        self.atras = atras
+        self.peso = peso
+        self.version = version
+        self._listas_adelante = [fila.tolist() for fila in adelante]
+        self._listas_atras = [fila.tolist() for fila in atras]
+
+    def cota(self, destino):
+        """
+        Devuelve una función índice → cota inferior del costo hasta el índice destino
+        usando la desigualdad triangular con cada landmark
+        """
+        terminos = []
+        for adelante, atras in zip(self._listas_adelante, self._listas_atras):
+            terminos.append((adelante, adelante[destino], atras, atras[destino]))
+
+        def cota(i):
+            mejor = 0.0
+            for adelante, adelante_t, atras, atras_t in terminos:
+                # d(i, t) >= d(L, t) - d(L, i)
+                if adelante_t < INFINITO and adelante[i] < INFINITO:
+                    valor = adelante_t - adelante[i]
+                    if valor > mejor:
+                        mejor = valor
+                # d(i, t) >= d(i, L) - d(t, L)
+                if atras_t < INFINITO and atras[i] < INFINITO:
+                    valor = atras[i] - atras_t
+                    if valor > mejor:
+                        mejor = valor
+            return max(0.0, mejor * MARGEN_RELATIVO - MARGEN_ABSOLUTO)
+
+        return cota
+
+def construir_landmarks(G, peso='length', cantidad=8):
+    """
+    Elige landmarks por el método del más lejano: cada nuevo landmark es el nodo
+    alcanzable más lejano de los ya elegidos. Después calcula las distancias.
+    """
+    csr = obtener_grafo_csr(G)
+    inverso = csr.inverso()
+    cantidad = min(cantidad, csr.num_nodos)
+
+    nodos = []
+    if cantidad:
+        # Empezar por el nodo más lejano a un nodo arbitrario
+        distancias = _distancias_desde(csr, [0], peso)
+        nodos.append(max(range(csr.num_nodos),
+                         key=lambda i: distancias[i] if distancias[i] < INFINITO else -1))
+    while len(nodos) < cantidad:
+        distancias = _distancias_desde(csr, nodos, peso)
+        candidato = max(range(csr.num_nodos),
+                        key=lambda i: distancias[i] if distancias[i] < INFINITO else -1)
+        if candidato in nodos:
+            break
+        nodos.append(candidato)
+
+    adelante = np.array([_distancias_desde(csr, [l], peso) for l in nodos], dtype=np.float64)
+    atras = np.array([_distancias_desde(inverso, [l], peso) for l in nodos], dtype=np.float64)
+    return Landmarks(np.asarray(nodos, dtype=np.int32), adelante, atras, peso, version_grafo(G))
+
+def guardar_landmarks(landmarks, archivo):
+    """
+    Guarda los landmarks en un archivo .npz
+    """
+    try:
+        os.makedirs(os.path.dirname(archivo) or '.', exist_ok=True)
+        np.savez(archivo, version=np.array(landmarks.version), peso=np.array(landmarks.peso),
+                 nodos=landmarks.nodos, adelante=landmarks.adelante, atras=landmarks.atras)
+        print(f"💾 Landmarks guardados en {archivo}")
+        return True
+    except Exception as e:
+        print(f"❌ Error al guardar landmarks: {e}")
+        return False
+
+def cargar_landmarks(archivo, version=None):
+    """
+    Carga los landmarks, o None si no existen o no coinciden con la versión del grafo
+    """
+    try:
+        if not os.path.exists(archivo):
+            return None
+        with np.load(archivo) as datos:
+            if version is not None and str(datos['version']) != version:
+                return None
+            # Archivos anteriores guardaban float32: se recalculan
+            if datos['adelante'].dtype != np.float64:
+                return None
+            return Landmarks(datos['nodos'], datos['adelante'], datos['atras'],
+                             str(datos['peso']), str(datos['version']))
+    except Exception as e:
+        print(f"❌ Error al cargar landmarks: {e}")
+        return None
+
+def obtener_landmarks(G, peso='length'):
+    """
+    Devuelve los landmarks del grafo para el peso indicado, reutilizando los de
+    memoria o disco si el grafo no cambió
+    """
+    clave = f"landmarks_{peso}"
+    version = version_grafo(G)
+    landmarks = G.graph.get(clave)
+    if landmarks is not None and landmarks.version == version:
+        return landmarks
+
+    archivo = ruta_tabla_grafo(G, f"alt_{peso}.npz")
+    landmarks = cargar_landmarks(archivo, version) if archivo else None
+    if landmarks is None:
+        landmarks = construir_landmarks(G, peso)
+        if archivo:
+            guardar_landmarks(landmarks, archivo)
+
+    G.graph[clave] = landmarks
+    return landmarks
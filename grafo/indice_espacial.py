@@ -0,0 +1,71 @@
+# grafo/indice_espacial.py
+import numpy as np
+from .csr import obtener_grafo_csr
+
+RADIO_TIERRA = 6371000  # metros
+
+def _a_cartesianas(lats, lons):
+    """
+    Convierte lat/lon (grados) a puntos sobre la esfera unitaria
+    """
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+class IndiceEspacial:
+    """
+    KD-tree sobre los nodos del grafo para encontrar el nodo más cercano a
+    muchos puntos a la vez. Se construye una sola vez por grafo cargado.
+    """
+    def __init__(self, nodos_osm, lats, lons):
+        # scipy se importa al construir el primer índice, no al arrancar la aplicación
+        from scipy.spatial import cKDTree
+
+        self.nodos_osm = np.asarray(nodos_osm)
+        self.arbol = cKDTree(_a_cartesianas(lats, lons))
+
+    def consultar(self, lats, lons):
+        """
+        Recibe arreglos de latitudes y longitudes y devuelve (nodos, distancias en metros)
+        """
+        puntos = _a_cartesianas(np.atleast_1d(lats), np.atleast_1d(lons))
+        cuerdas, indices = self.arbol.query(puntos)
+        distancias = 2 * RADIO_TIERRA * np.arcsin(np.minimum(cuerdas / 2, 1.0))
+        return self.nodos_osm[indices], distancias
+
+    def nodo_mas_cercano(self, lat, lon):
+        """
+        Devuelve (nodo, distancia en metros) para un único punto
+        """
+        nodos, distancias = self.consultar([lat], [lon])
+        return nodos[0].item(), float(distancias[0])
+
+    def nodos_en_radio(self, lat, lon, radio):
+        """
+        Devuelve los nodos a menos de radio metros (distancia en línea recta) del punto
+        """
+        cuerda = 2 * np.sin(min(radio / (2 * RADIO_TIERRA), np.pi / 2))
+        indices = self.arbol.query_ball_point(_a_cartesianas([lat], [lon])[0], cuerda)
+        return self.nodos_osm[indices].tolist()
+
+def obtener_indice_espacial(G):
+    """
+    Devuelve el índice espacial del grafo (G de networkx o GrafoCSR),
+    construyéndolo la primera vez
+    """
+    csr = obtener_grafo_csr(G)
+    if getattr(csr, 'indice_espacial', None) is None:
+        csr.indice_espacial = IndiceEspacial(csr.nodos_osm, csr.lat, csr.lon)
+    return csr.indice_espacial
+
+def ajustar_puntos(G, puntos):
+    """
+    Ajusta una lista de diccionarios con 'lat' y 'lon' a nodos del grafo.
+    Devuelve (nodos, distancias en metros) como listas.
+    """
+    if not puntos:
+        return [], []
+    indice = obtener_indice_espacial(G)
+    nodos, distancias = indice.consultar([p['lat'] for p in puntos], [p['lon'] for p in puntos])
+    return nodos.tolist(), distancias.tolist()
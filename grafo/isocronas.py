@@ -0,0 +1,160 @@
+# grafo/isocronas.py
+"""
+Isócronas: zonas alcanzables en 5/10/15 minutos de cada hospital.
+Se obtienen con un Dijkstra acotado al mayor umbral (multifuente o uno por
+hospital) y se convierten en polígonos GeoJSON que mapa.py puede dibujar.
+"""
+import heapq
+import math
+import numpy as np
+import shapely
+from config import ISOCRONAS
+from .csr import obtener_grafo_csr
+from .restricciones import capa_activa
+
+def _dijkstra_acotado(desplazamientos, destinos, pesos, fuentes, limite):
+    """
+    Dijkstra desde los índices fuente que no expande más allá de limite.
+    Devuelve {índice: (distancia, fuente)} de los nodos alcanzados.
+    """
+    alcanzados = {}
+    mejor = {}
+    heap = []
+    for fuente in fuentes:
+        mejor[fuente] = 0.0
+        heap.append((0.0, fuente, fuente))
+    heapq.heapify(heap)
+
+    while heap:
+        dist, i, fuente = heapq.heappop(heap)
+        if i in alcanzados:
+            continue
+        alcanzados[i] = (dist, fuente)
+        for arista in range(desplazamientos[i], desplazamientos[i + 1]):
+            j = destinos[arista]
+            nueva = dist + pesos[arista]
+            if nueva <= limite and nueva < mejor.get(j, math.inf):
+                mejor[j] = nueva
+                heapq.heappush(heap, (nueva, j, fuente))
+    return alcanzados
+
+def calcular_isocronas(G, nodos_hospitales, minutos=None, peso='travel_time',
+                       hacia_hospital=True, por_hospital=False):
+    """
+    Calcula los nodos alcanzables dentro de cada umbral (en minutos; con
+    peso='length' los umbrales se interpretan en metros).
+
+    hacia_hospital: tiempo desde el nodo hasta el hospital (área de captación);
+    False mide desde el hospital hacia fuera.
+    por_hospital: False asigna cada nodo solo a su hospital más cercano (una
+    búsqueda multifuente); True hace una búsqueda por hospital y las zonas
+    pueden solaparse.
+
+    Devuelve {'umbrales': [...], 'nodos': {hospital: {umbral: [nodos]}},
+    'tiempos': {nodo: valor}, 'peso'} con los umbrales en segundos (o metros).
+    """
+    minutos = sorted(minutos or ISOCRONAS['minutos'])
+    umbrales = [m * 60 if peso == 'travel_time' else m for m in minutos]
+    limite = umbrales[-1]
+
+    csr = obtener_grafo_csr(G)
+    grafo = csr.inverso() if hacia_hospital else csr
+    capa = capa_activa(G)
+    if capa is None:
+        pesos = grafo.lista(peso)
+    else:
+        pesos = capa.pesos_inversos(peso) if hacia_hospital else capa.pesos(peso)
+    desplazamientos = grafo.lista('desplazamientos')
+    destinos = grafo.lista('destinos')
+    nodos_osm = csr.lista('nodos_osm')
+
+    fuentes = list(dict.fromkeys(csr.indice[n] for n in nodos_hospitales if n in csr))
+    if por_hospital:
+        corridas = [_dijkstra_acotado(desplazamientos, destinos, pesos, [f], limite) for f in fuentes]
+    else:
+        corridas = [_dijkstra_acotado(desplazamientos, destinos, pesos, fuentes, limite)]
+
+    nodos = {nodos_osm[f]: {umbral: [] for umbral in umbrales} for f in fuentes}
+    tiempos = {}
+    for alcanzados in corridas:
+        for i, (dist, fuente) in alcanzados.items():
+            nodo = nodos_osm[i]
+            tiempos[nodo] = min(dist, tiempos.get(nodo, math.inf))
+            por_umbral = nodos[nodos_osm[fuente]]
+            for umbral in umbrales:
+                if dist <= umbral:
+                    por_umbral[umbral].append(nodo)
+
+    return {'umbrales': umbrales, 'peso': peso, 'nodos': nodos, 'tiempos': tiempos}
+
+def _poligono_rejilla(lats, lons, tamano_celda):
+    """
+    Unión de las celdas de una rejilla (de tamano_celda metros) que contienen algún nodo
+    """
+    paso_lat = tamano_celda / 111320.0
+    paso_lon = paso_lat / max(math.cos(math.radians(float(np.mean(lats)))), 1e-6)
+    celdas = np.unique(np.column_stack((np.floor(lats / paso_lat), np.floor(lons / paso_lon))), axis=0)
+    cajas = shapely.box(celdas[:, 1] * paso_lon, celdas[:, 0] * paso_lat,
+                        (celdas[:, 1] + 1) * paso_lon, (celdas[:, 0] + 1) * paso_lat)
+    # Las celdas no se superponen: la unión de cobertura es mucho más rápida que union_all
+    return shapely.coverage_union_all(cajas)
+
+def _poligono_concavo(lats, lons, proporcion):
+    puntos = shapely.multipoints(np.column_stack((lons, lats)))
+    return shapely.concave_hull(puntos, ratio=proporcion)
+
+def poligonos_isocronas(G, isocronas, metodo='rejilla', tamano_celda=None, proporcion=0.3,
+                        nombres=None, decimales=6):
+    """
+    Convierte el resultado de calcular_isocronas en un FeatureCollection GeoJSON.
+    metodo: 'rejilla' (celdas de tamano_celda metros) o 'concavo' (envolvente cóncava).
+    Las bandas más amplias van primero para que las menores se dibujen encima.
+    """
+    csr = obtener_grafo_csr(G)
+    tamano_celda = tamano_celda or ISOCRONAS['tamano_celda']
+    colores = ISOCRONAS['colores']
+    umbrales = isocronas['umbrales']
+    nombres = nombres or {}
+
+    features = []
+    for posicion in reversed(range(len(umbrales))):
+        umbral = umbrales[posicion]
+        for hospital, por_umbral in isocronas['nodos'].items():
+            nodos = por_umbral[umbral]
+            if len(nodos) < 3:
+                continue
+            indices = np.fromiter((csr.indice[n] for n in nodos), dtype=np.int64, count=len(nodos))
+            lats, lons = csr.lat[indices], csr.lon[indices]
+            if metodo == 'concavo':
+                poligono = _poligono_concavo(lats, lons, proporcion)
+            else:
+                poligono = _poligono_rejilla(lats, lons, tamano_celda)
+            if poligono.is_empty or poligono.geom_type not in ('Polygon', 'MultiPolygon'):
+                continue
+
+            geometria = shapely.geometry.mapping(shapely.set_precision(poligono, 10 ** -decimales))
+            features.append({
+                'type': 'Feature',
+                'properties': {
+                    'hospital': nombres.get(hospital, hospital),
+                    'nodo': hospital,
+                    'umbral': umbral,
+                    'minutos': round(umbral / 60, 1) if isocronas.get('peso') == 'travel_time' else None,
+                    'nodos': len(nodos),
+                    'color': colores[min(posicion, len(colores) - 1)]
+                },
+                'geometry': geometria
+            })
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+def isocronas_hospitales(G, hospitales, minutos=None, peso='travel_time', metodo='rejilla', **opciones):
+    """
+    Isócronas de una lista de hospitales ({'nombre', 'lat', 'lon'}) como GeoJSON
+    """
+    from .ajuste_hospitales import ajustar_hospitales
+
+    nodos, _ = ajustar_hospitales(G, hospitales)
+    nombres = {nodo: h['nombre'] for nodo, h in zip(nodos, hospitales)}
+    isocronas = calcular_isocronas(G, nodos, minutos, peso, **opciones)
+    return poligonos_isocronas(G, isocronas, metodo, nombres=nombres)
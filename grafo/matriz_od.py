@@ -0,0 +1,150 @@
+# grafo/matriz_od.py
+"""
+Matriz origen–destino (tiempos y distancias) para muchos orígenes a la vez.
+Los orígenes se reparten en bloques entre un pool de procesos. Cada proceso
+recibe el grafo CSR de solo lectura una sola vez, al iniciarse, y arma su
+propio motor. El pool usa 'forkserver' (o 'spawn'): nunca se hace fork del
+proceso principal, que tiene hilos de Flask o de Qt en marcha.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from config import PESO_RUTEO
+from .csr import obtener_grafo_csr
+from .grafo import GrafoDijkstra
+from .restricciones import capa_activa
+
+# Motor de cada proceso trabajador (solo se asigna dentro de los trabajadores)
+_grafo_trabajador = None
+
+class _RestriccionesFijas:
+    """
+    Factores de la capa de restricciones vigentes al pedir la matriz, para
+    que los trabajadores busquen con los mismos pesos que el resto de la aplicación
+    """
+    def __init__(self, csr, factores):
+        self.csr = csr
+        self.factores = factores
+        self._pesos = {}
+
+    def activa(self):
+        return bool(self.factores)
+
+    def pesos(self, peso):
+        if peso not in self._pesos:
+            pesos = list(self.csr.lista(peso))
+            for arista, factor in self.factores.items():
+                pesos[arista] *= factor
+            self._pesos[peso] = pesos
+        return self._pesos[peso]
+
+def _crear_motor(csr, peso, factores):
+    restricciones = _RestriccionesFijas(csr, factores) if factores else None
+    return GrafoDijkstra(csr, peso=peso, restricciones=restricciones)
+
+def _iniciar_trabajador(csr, peso, factores):
+    global _grafo_trabajador
+    _grafo_trabajador = _crear_motor(csr, peso, factores)
+
+def _calcular_bloque_trabajador(posiciones, origenes, destinos, incluir_caminos):
+    return _calcular_bloque(_grafo_trabajador, posiciones, origenes, destinos, incluir_caminos)
+
+def _crear_pool(procesos, csr, peso, factores):
+    """
+    Pool de procesos que arman su motor al iniciarse
+    """
+    metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context(metodo),
+                               initializer=_iniciar_trabajador, initargs=(csr, peso, factores))
+
+def _calcular_bloque(grafo, posiciones, origenes, destinos, incluir_caminos):
+    """
+    Calcula las filas de la matriz para un bloque de orígenes con el motor dado
+    """
+    indice = grafo.csr.indice
+    tiempos = np.full((len(origenes), len(destinos)), np.inf)
+    longitudes = np.full((len(origenes), len(destinos)), np.inf)
+    caminos = [] if incluir_caminos else None
+
+    for fila, origen in enumerate(origenes):
+        caminos_fila = {}
+        if origen in indice:
+            _, predecesores, asentados = grafo._dijkstra_multidestino(origen, destinos, grafo.peso)
+            for columna, destino in enumerate(destinos):
+                i = indice.get(destino)
+                if i is None or not asentados[i]:
+                    continue
+                camino, longitud, tiempo = grafo._reconstruir_camino(predecesores, i)
+                tiempos[fila, columna] = tiempo
+                longitudes[fila, columna] = longitud
+                if incluir_caminos:
+                    caminos_fila[destino] = camino
+        if incluir_caminos:
+            caminos.append(caminos_fila)
+
+    return posiciones, tiempos, longitudes, caminos
+
+def matriz_od(G, origenes, destinos, peso=PESO_RUTEO, procesos=None, progreso=None,
+              incluir_caminos=False, tamano_bloque=16):
+    """
+    Calcula la matriz origen–destino entre listas de nodos.
+    Devuelve un diccionario con:
+      'tiempo' y 'longitud': arreglos numpy (orígenes × destinos), inf si no hay ruta
+      'caminos': lista (por origen) de {destino: camino} si incluir_caminos, si no None
+    progreso(completados, total) se llama cada vez que termina un bloque.
+    Con procesos=1 se calcula en el proceso actual.
+    """
+    csr = obtener_grafo_csr(G)
+    # Cierres y penalizaciones vigentes (la capa vive en G.graph, no en el CSR)
+    capa = capa_activa(G)
+    factores = capa.factores() if capa is not None else {}
+    origenes = list(origenes)
+    destinos = list(destinos)
+    total = len(origenes)
+
+    tiempos = np.full((total, len(destinos)), np.inf)
+    longitudes = np.full((total, len(destinos)), np.inf)
+    caminos = [None] * total if incluir_caminos else None
+
+    bloques = [list(range(inicio, min(inicio + tamano_bloque, total)))
+               for inicio in range(0, total, tamano_bloque)]
+    procesos = procesos or os.cpu_count() or 1
+    procesos = min(procesos, len(bloques)) if bloques else 1
+
+    def guardar(resultado):
+        posiciones, bloque_tiempos, bloque_longitudes, bloque_caminos = resultado
+        tiempos[posiciones] = bloque_tiempos
+        longitudes[posiciones] = bloque_longitudes
+        if incluir_caminos:
+            for posicion, caminos_fila in zip(posiciones, bloque_caminos):
+                caminos[posicion] = caminos_fila
+
+    completados = 0
+    if procesos <= 1:
+        motor = _crear_motor(csr, peso, factores)
+        for posiciones in bloques:
+            guardar(_calcular_bloque(motor, posiciones, [origenes[p] for p in posiciones],
+                                     destinos, incluir_caminos))
+            completados += len(posiciones)
+            if progreso:
+                progreso(completados, total)
+    else:
+        with _crear_pool(procesos, csr, peso, factores) as pool:
+            futuros = [pool.submit(_calcular_bloque_trabajador, posiciones, [origenes[p] for p in posiciones],
+                                   destinos, incluir_caminos)
+                       for posiciones in bloques]
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                guardar(resultado)
+                completados += len(resultado[0])
+                if progreso:
+                    progreso(completados, total)
+
+    return {
+        'origenes': origenes,
+        'destinos': destinos,
+        'tiempo': tiempos,
+        'longitud': longitudes,
+        'caminos': caminos
+    }
@@ -0,0 +1,197 @@
+# grafo/metricas.py
+"""
+Métricas de rendimiento: tramos de tiempo por etapa, contadores y valores
+actuales, exportables en formato de texto de Prometheus (/metrics del
+servicio web) y opcionalmente registrados como JSON por líneas.
+
+Con las métricas deshabilitadas, tramo() devuelve un contexto vacío
+compartido y los contadores retornan de inmediato.
+"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from config import METRICAS
+
+PREFIJO = 'rutas_'
+
+# Límites (segundos) de los histogramas de duración
+LIMITES_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+AYUDA = {
+    'etapa_segundos': "Duración de cada etapa del cálculo de rutas y del mapa",
+    'carga_grafo_segundos': "Tiempo de carga del grafo según su origen",
+    'trabajo_segundos': "Duración de los trabajos en segundo plano de la interfaz",
+    'nodos_asentados_total': "Nodos asentados por las búsquedas de rutas",
+    'cache_rutas_total': "Consultas a la caché de rutas por resultado",
+    'trabajos_total': "Trabajos en segundo plano por tipo y estado",
+    'peticiones_total': "Peticiones al servicio web por ruta",
+    'grafo_nodos': "Nodos del último grafo cargado",
+    'registro_ciudades_total': "Consultas al registro de ciudades: aciertos, cargas y desalojos",
+    'registro_ciudades_bytes': "Memoria estimada de las ciudades residentes"
+}
+
+class _Estado:
+    def __init__(self):
+        self.habilitadas = METRICAS['habilitadas']
+        self.log = None
+        self.lock = threading.Lock()
+        self.contadores = {}
+        self.valores = {}
+        self.histogramas = {}
+
+_estado = _Estado()
+
+class _TramoNulo:
+    """
+    Contexto vacío que se usa cuando las métricas están deshabilitadas
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULO = _TramoNulo()
+
+class Tramo:
+    """
+    Mide la duración de un bloque y la agrega al histograma indicado
+    """
+    __slots__ = ('metrica', 'etiquetas', 'inicio', 'segundos')
+
+    def __init__(self, metrica, etiquetas):
+        self.metrica = metrica
+        self.etiquetas = etiquetas
+        self.segundos = None
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self.segundos = time.perf_counter() - self.inicio
+        observar(self.metrica, self.segundos, error=tipo is not None, **self.etiquetas)
+        return False
+
+def habilitar(activas=True, log=None):
+    """
+    Activa o desactiva las métricas. log: archivo donde registrar cada
+    observación como una línea JSON (None para no registrar)
+    """
+    with _estado.lock:
+        _estado.habilitadas = activas
+        if _estado.log is not None:
+            _estado.log.close()
+        _estado.log = open(log, 'a', encoding='utf-8') if activas and log else None
+
+def habilitadas():
+    return _estado.habilitadas
+
+def tramo(etapa, metrica='etapa_segundos', **etiquetas):
+    """
+    with tramo('busqueda'): ... mide el bloque como etapa_segundos{etapa="busqueda"}
+    """
+    if not _estado.habilitadas:
+        return _NULO
+    etiquetas['etapa'] = etapa
+    return Tramo(metrica, etiquetas)
+
+def incrementar(nombre, valor=1, **etiquetas):
+    """
+    Suma valor al contador nombre con esas etiquetas
+    """
+    if not _estado.habilitadas:
+        return
+    clave = (nombre, tuple(sorted(etiquetas.items())))
+    with _estado.lock:
+        _estado.contadores[clave] = _estado.contadores.get(clave, 0) + valor
+
+def fijar(nombre, valor, **etiquetas):
+    """
+    Guarda el valor actual de una métrica (gauge)
+    """
+    if not _estado.habilitadas:
+        return
+    with _estado.lock:
+        _estado.valores[(nombre, tuple(sorted(etiquetas.items())))] = valor
+
+def observar(nombre, segundos, error=False, **etiquetas):
+    """
+    Agrega una duración al histograma nombre y al registro JSON si está activo
+    """
+    if not _estado.habilitadas:
+        return
+    clave = (nombre, tuple(sorted(etiquetas.items())))
+    with _estado.lock:
+        histograma = _estado.histogramas.get(clave)
+        if histograma is None:
+            # Una cubeta por límite más la de +Inf; se acumulan al exportar
+            histograma = _estado.histogramas[clave] = [[0] * (len(LIMITES_SEGUNDOS) + 1), 0, 0.0]
+        histograma[0][bisect_left(LIMITES_SEGUNDOS, segundos)] += 1
+        histograma[1] += 1
+        histograma[2] += segundos
+
+        if _estado.log is not None:
+            registro = {'ts': round(time.time(), 3), 'metrica': nombre,
+                        'segundos': round(segundos, 6), **etiquetas}
+            if error:
+                registro['error'] = True
+            _estado.log.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            _estado.log.flush()
+
+def reiniciar():
+    """
+    Borra todo lo acumulado
+    """
+    with _estado.lock:
+        _estado.contadores.clear()
+        _estado.valores.clear()
+        _estado.histogramas.clear()
+
+def _etiquetas(pares, extra=()):
+    pares = tuple(pares) + tuple(extra)
+    if not pares:
+        return ''
+    texto = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                     for k, v in pares)
+    return '{' + texto + '}'
+
+def exportar_prometheus():
+    """
+    Devuelve todas las métricas en el formato de texto de Prometheus (0.0.4)
+    """
+    with _estado.lock:
+        contadores = dict(_estado.contadores)
+        valores = dict(_estado.valores)
+        histogramas = {clave: ([*h[0]], h[1], h[2]) for clave, h in _estado.histogramas.items()}
+
+    lineas = []
+    def encabezado(nombre, tipo):
+        lineas.append(f"# HELP {PREFIJO}{nombre} {AYUDA.get(nombre, nombre)}")
+        lineas.append(f"# TYPE {PREFIJO}{nombre} {tipo}")
+
+    for tipo, datos in (('counter', contadores), ('gauge', valores)):
+        for nombre in sorted({n for n, _ in datos}):
+            encabezado(nombre, tipo)
+            for (n, pares), valor in sorted(datos.items(), key=lambda x: str(x[0])):
+                if n == nombre:
+                    lineas.append(f"{PREFIJO}{nombre}{_etiquetas(pares)} {valor}")
+
+    for nombre in sorted({n for n, _ in histogramas}):
+        encabezado(nombre, 'histogram')
+        for (n, pares), (cubetas, cuenta, suma) in sorted(histogramas.items(), key=lambda x: str(x[0])):
+            if n != nombre:
+                continue
+            acumulado = 0
+            for limite, cantidad in zip(LIMITES_SEGUNDOS, cubetas):
+                acumulado += cantidad
+                lineas.append(f"{PREFIJO}{nombre}_bucket{_etiquetas(pares, [('le', limite)])} {acumulado}")
+            lineas.append(f"{PREFIJO}{nombre}_bucket{_etiquetas(pares, [('le', '+Inf')])} {cuenta}")
+            lineas.append(f"{PREFIJO}{nombre}_sum{_etiquetas(pares)} {suma:.6f}")
+            lineas.append(f"{PREFIJO}{nombre}_count{_etiquetas(pares)} {cuenta}")
+
+    return '\n'.join(lineas) + '\n'
+
+if METRICAS.get('log'):
+    habilitar(_estado.habilitadas, METRICAS['log'])
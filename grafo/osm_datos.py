@@ -1,45 +1,115 @@
 # grafo/osm_datos.py
-import osmnx as ox
 import json
 import os
-from shapely.geometry import Point
-from osmnx.distance import nearest_nodes
+import time
+import networkx as nx
 import requests
-from shapely.geometry import Polygon, Point
-from osmnx import distance
+from .ajuste_hospitales import ajustar_hospitales
+from .indice_espacial import ajustar_puntos, obtener_indice_espacial
+from .utilidades import coordenadas_nodo
+from .csr import obtener_grafo_csr
+from .snapshot import cargar_snapshot, guardar_snapshot
+from . import metricas
 
+# osmnx y shapely se importan solo cuando hacen falta (descarga, .graphml sin
+# snapshot, consulta de hospitales): importarlos cuesta más de medio segundo
 
+def _osmnx():
+    import osmnx as ox
+    ox.settings.use_cache = True
+    ox.settings.log_console = False
+    return ox
+
+# Atributos de arista que usa el ruteo (highway y speed_kph para VELOCIDADES_VIA
+# y el snapshot); nombres, refs, carriles, geometría, etc. se descartan
+ATRIBUTOS_RUTEO = ('length', 'travel_time', 'highway', 'speed_kph')
+
+def preparar_grafo_ruteo(G):
+    """
+    Reduce un grafo de osmnx al grafo de ruteo: solo la componente fuertemente
+    conexa más grande (desde cualquier nodo se llega a cualquier otro, así
+    una búsqueda nunca recorre un fragmento aislado para fallar) y solo
+    coordenadas y ATRIBUTOS_RUTEO.
+    """
+    componente = max(nx.strongly_connected_components(G), key=len)
+
+    ligero = nx.MultiDiGraph(crs=G.graph.get('crs', 'epsg:4326'))
+    ligero.add_nodes_from((nodo, {'y': datos['y'], 'x': datos['x']})
+                          for nodo, datos in G.nodes(data=True) if nodo in componente)
+    for u, v, k, datos in G.edges(keys=True, data=True):
+        if u in componente and v in componente:
+            ligero.add_edge(u, v, k, **{a: datos[a] for a in ATRIBUTOS_RUTEO if a in datos})
+
+    descartados = G.number_of_nodes() - len(componente)
+    if descartados:
+        print(f"✂️ {descartados} nodos fuera de la componente conexa principal descartados")
+    return ligero
+
+def archivo_grafo_ciudad(ciudad):
+    """
+    Ruta del .graphml de una ciudad (ej. "Puno, Peru" → 'datos/puno.graphml')
+    """
+    nombre_base = ciudad.lower().split(",")[0].strip()
+    return os.path.join("datos", f"{nombre_base}.graphml")
+
+def ruta_snapshot_ciudad(ciudad):
+    """
+    Directorio del snapshot de una ciudad (ej. "Puno, Peru" → 'datos/puno.snapshot')
+    """
+    base, _ = os.path.splitext(archivo_grafo_ciudad(ciudad))
+    return f"{base}.snapshot"
 
 def obtener_grafo_ciudad(ciudad):
     """
     Carga el grafo desde archivo si existe, si no lo descarga y lo guarda.
     Usa nombres como 'puno.graphml', 'cusco.graphml', etc.
+    Junto al .graphml se guarda un snapshot binario ('puno.snapshot/') que se
+    usa en los siguientes arranques mientras el .graphml no cambie.
+    Devuelve el grafo de ruteo (ver preparar_grafo_ruteo) como GrafoCSR.
     """
     try:
-        ox.settings.use_cache = True
-        ox.settings.log_console = False
-
+        inicio = time.perf_counter()
+        
         # Obtener nombre base (ej. "Puno, Peru" → "puno")
-        nombre_base = ciudad.lower().split(",")[0].strip()
-        nombre_archivo = f"{nombre_base}.graphml"
-        ruta_archivo = os.path.join("datos", nombre_archivo)
-
-        # Si ya existe, cargar desde archivo
-        if os.path.exists(ruta_archivo):
-            print(f"Cargando grafo desde archivo: {ruta_archivo}")
-            G = ox.load_graphml(ruta_archivo)
+        ruta_archivo = archivo_grafo_ciudad(ciudad)
+        nombre_base = os.path.splitext(os.path.basename(ruta_archivo))[0]
+        ruta_snapshot = ruta_snapshot_ciudad(ciudad)
+
+        # Si ya existe, cargar desde el snapshot o desde el archivo
+        G = cargar_snapshot(ruta_snapshot, ruta_archivo) if os.path.exists(ruta_archivo) else None
+        if G is not None:
+            print(f"Cargando grafo desde snapshot: {ruta_snapshot}")
+            origen = 'snapshot'
         else:
-            print(f"Descargando grafo de {ciudad}...")
-            G = ox.graph_from_place(ciudad, network_type='drive')
-            G = ox.add_edge_speeds(G)
-            G = ox.add_edge_travel_times(G)
+            if os.path.exists(ruta_archivo):
+                print(f"Cargando grafo desde archivo: {ruta_archivo}")
+                G = preparar_grafo_ruteo(_osmnx().load_graphml(ruta_archivo))
+                origen = 'graphml'
+            else:
+                print(f"Descargando grafo de {ciudad}...")
+                ox = _osmnx()
+                G = ox.graph_from_place(ciudad, network_type='drive')
+                G = ox.add_edge_speeds(G)
+                G = ox.add_edge_travel_times(G)
 
-            # Guardar para futuras cargas
-            os.makedirs("datos", exist_ok=True)
-            ox.save_graphml(G, filepath=ruta_archivo)
-            print(f"Grafo guardado en {ruta_archivo}")
+                # Guardar para futuras cargas
+                os.makedirs("datos", exist_ok=True)
+                ox.save_graphml(G, filepath=ruta_archivo)
+                print(f"Grafo guardado en {ruta_archivo}")
+                G = preparar_grafo_ruteo(G)
+                origen = 'descarga'
+            guardar_snapshot(G, ruta_snapshot, ruta_archivo)
+            # Se rutea siempre sobre el CSR; el grafo de networkx no se conserva
+            csr = obtener_grafo_csr(G)
+            csr.graph.update((clave, valor) for clave, valor in G.graph.items() if clave != 'csr')
+            G = csr
 
-        print(f"Grafo cargado: {len(G.nodes)} nodos, {len(G.edges)} aristas")
+        # Recordar el archivo de origen para guardar tablas precalculadas a su lado
+        G.graph['ruta_archivo'] = ruta_archivo
+
+        metricas.observar('carga_grafo_segundos', time.perf_counter() - inicio, origen=origen, ciudad=nombre_base)
+        metricas.fijar('grafo_nodos', G.num_nodos, ciudad=nombre_base)
+        print(f"Grafo cargado: {G.num_nodos} nodos, {G.num_aristas} aristas")
         return G
 
     except Exception as e:
@@ -51,6 +121,8 @@ def obtener_hospitales():
     """
     Extrae hospitales y clínicas dentro del área urbana de Puno, usando Overpass y un polígono definido manualmente.
     """
+    from shapely.geometry import Polygon, Point
+
     try:
         print("📡 Buscando hospitales en Puno...")
 
@@ -136,13 +208,11 @@ def cargar_hospitales(archivo='datos/hospitales.json'):
     except Exception as e:
         print(f"❌ Error al cargar hospitales: {e}")
         return []
-    
 
-import requests
 
 def obtener_ubicacion_actual():
     try:
-        r = requests.get("http://localhost:5000/ubicacion")
+        r = requests.get("http://localhost:5000/ubicacion", timeout=0.5)
         if r.status_code == 200:
             return r.json()
     except:
@@ -174,14 +244,15 @@ def obtener_nodos_principales(G, incluir_ubicacion_actual=True):
 
         nodos_principales = []
 
-        for lugar in lugares:
-            nodo = distance.nearest_nodes(G, X=lugar["lon"], Y=lugar["lat"])
-            nodo_data = G.nodes[nodo]
+        # Ajustar todos los lugares al grafo en una sola consulta
+        nodos, _ = ajustar_puntos(G, lugares)
+        for lugar, nodo in zip(lugares, nodos):
+            lat, lon = coordenadas_nodo(G, nodo)
             nodos_principales.append({
                 "id": nodo,
                 "nombre": lugar["nombre"],
-                "lat": nodo_data["y"],
-                "lon": nodo_data["x"]
+                "lat": lat,
+                "lon": lon
             })
 
         return nodos_principales
@@ -189,4 +260,48 @@ def obtener_nodos_principales(G, incluir_ubicacion_actual=True):
     except Exception as e:
         print(f"Error al obtener nodos principales: {e}")
         return []
-    
\ No newline at end of file
+
+def precargar_ciudad(ciudad, archivo_hospitales='datos/hospitales.json', progreso=None):
+    """
+    Deja lista una ciudad para el primer cálculo: grafo, índice espacial,
+    hospitales ajustados al grafo y listas CSR de ruteo.
+    progreso(mensaje) se llama al comenzar cada etapa.
+    Devuelve {'G', 'hospitales', 'nodos_hospitales', 'nodos_principales', 'tiempos'}
+    o None si no se pudo cargar el grafo; 'tiempos' tiene los segundos de cada etapa.
+    """
+    from config import PESO_RUTEO
+
+    tiempos = {}
+    avisar = progreso or (lambda mensaje: None)
+
+    def etapa(nombre, mensaje, funcion):
+        avisar(mensaje)
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos[nombre] = time.perf_counter() - inicio
+        return resultado
+
+    G = etapa('grafo', f"Cargando grafo de {ciudad}...", lambda: obtener_grafo_ciudad(ciudad))
+    if G is None:
+        return None
+
+    def listas_ruteo():
+        csr = obtener_grafo_csr(G)
+        for nombre in ('desplazamientos', 'destinos', 'origenes', 'length', 'travel_time', PESO_RUTEO):
+            csr.lista(nombre)
+
+    etapa('listas_ruteo', "Preparando estructuras de ruteo...", listas_ruteo)
+    etapa('indice_espacial', "Construyendo índice espacial...", lambda: obtener_indice_espacial(G))
+    hospitales = etapa('hospitales', "Cargando hospitales...", lambda: cargar_hospitales(archivo_hospitales))
+    nodos_hospitales, _ = etapa('ajuste_hospitales', "Ajustando hospitales al grafo...",
+                                lambda: ajustar_hospitales(G, hospitales, archivo_hospitales))
+    nodos_principales = etapa('nodos_principales', "Ubicando puntos de origen...",
+                              lambda: obtener_nodos_principales(G))
+
+    return {
+        'G': G,
+        'hospitales': hospitales,
+        'nodos_hospitales': nodos_hospitales,
+        'nodos_principales': nodos_principales,
+        'tiempos': tiempos
+    }
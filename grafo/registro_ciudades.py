@@ -0,0 +1,261 @@
+# grafo/registro_ciudades.py
+"""
+Registro de ciudades residentes en memoria: grafo, listas CSR, índice
+espacial y hospitales ajustados de varias ciudades a la vez, dentro de un
+presupuesto de memoria. Al pasarse del presupuesto se descarta la ciudad
+usada hace más tiempo (LRU). Cambiar a una ciudad residente es inmediato.
+"""
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import CIUDAD_DEFAULT, REGISTRO_CIUDADES
+from .csr import GrafoCSR, obtener_grafo_csr
+from .osm_datos import archivo_grafo_ciudad, precargar_ciudad, ruta_snapshot_ciudad
+from .snapshot import leer_meta_snapshot
+from . import metricas
+
+# Memoria aproximada de networkx por nodo y por arista (con sus atributos),
+# medida con tracemalloc sobre grafos cargados desde snapshot
+BYTES_NODO_NX = 500
+BYTES_ARISTA_NX = 480
+# Lista de Python de floats: puntero más el objeto float
+BYTES_ELEMENTO_LISTA = 32
+# Entrada de diccionario de Python con su clave y su valor
+BYTES_ENTRADA_DICT = 100
+# Arista de la jerarquía de contracción: tupla (destino, peso) dentro de una lista
+BYTES_ARISTA_CH = 100
+
+def archivo_hospitales_ciudad(ciudad):
+    """
+    Hospitales de la ciudad: 'datos/hospitales_<ciudad>.json' si existe;
+    si no, el archivo general 'datos/hospitales.json'
+    """
+    nombre_base = os.path.splitext(os.path.basename(archivo_grafo_ciudad(ciudad)))[0]
+    archivo = os.path.join("datos", f"hospitales_{nombre_base}.json")
+    return archivo if os.path.exists(archivo) else os.path.join("datos", "hospitales.json")
+
+def _bytes_csr(csr):
+    total = sum(valor.nbytes for valor in vars(csr).values() if isinstance(valor, np.ndarray))
+    total += sum(arreglo.nbytes for arreglo in csr.pesos.values())
+    total += sum(len(lista) * BYTES_ELEMENTO_LISTA for lista in csr._listas.values())
+    return total
+
+def _bytes_tablas(G):
+    """
+    Tablas precalculadas guardadas en G.graph: tablas de cercanía, jerarquías
+    de contracción, landmarks y ajuste de hospitales
+    """
+    total = 0
+    for clave, tabla in list(G.graph.items()):
+        if clave.startswith('campo_cercania_'):
+            # hospital, distancia y siguiente: un diccionario por nodo cada uno
+            total += 3 * len(tabla.hospital) * BYTES_ENTRADA_DICT
+        elif clave.startswith('jerarquia_'):
+            aristas = sum(map(len, tabla.arriba)) + sum(map(len, tabla.abajo))
+            total += aristas * BYTES_ARISTA_CH + len(tabla.medios) * BYTES_ENTRADA_DICT
+            total += len(tabla.indice) * BYTES_ENTRADA_DICT + len(tabla.rango) * BYTES_ELEMENTO_LISTA
+        elif clave.startswith('landmarks_'):
+            total += tabla.adelante.nbytes + tabla.atras.nbytes
+            total += (tabla.adelante.size + tabla.atras.size) * BYTES_ELEMENTO_LISTA
+        elif clave == 'ajuste_hospitales':
+            total += len(tabla) * BYTES_ENTRADA_DICT
+    return total
+
+def estimar_memoria(G):
+    """
+    Estimación (bytes) de lo que ocupa una ciudad cargada: grafo de networkx
+    (si G no es directamente el GrafoCSR), arreglos y listas CSR (y su inverso,
+    si se construyó), índice espacial y tablas precalculadas
+    """
+    csr = obtener_grafo_csr(G)
+    total = 0
+    if not isinstance(G, GrafoCSR):
+        total += G.number_of_nodes() * BYTES_NODO_NX + G.number_of_edges() * BYTES_ARISTA_NX
+    total += _bytes_csr(csr)
+    if csr._inverso is not None:
+        total += _bytes_csr(csr._inverso)
+    # Diccionario nodo OSM → índice
+    total += len(csr.indice) * BYTES_ENTRADA_DICT
+    indice = getattr(csr, 'indice_espacial', None)
+    if indice is not None:
+        total += indice.nodos_osm.nbytes + csr.num_nodos * 3 * 8 * 2
+    total += _bytes_tablas(G)
+    return total
+
+def estimar_memoria_ciudad(ciudad):
+    """
+    Estimación (bytes) de una ciudad antes de cargarla, con los conteos de
+    nodos y aristas de su snapshot: arreglos CSR, listas de ruteo, índice
+    nodo → posición e índice espacial. None si la ciudad aún no tiene snapshot.
+    """
+    try:
+        meta = leer_meta_snapshot(ruta_snapshot_ciudad(ciudad))
+    except (OSError, ValueError):
+        return None
+    if meta is None:
+        return None
+    nodos, aristas = meta['num_nodos'], meta['num_aristas']
+    # Arreglos: ids, desplazamientos, lat y lon por nodo; destino, clave,
+    # longitud, tiempo (OSM y con VELOCIDADES_VIA), tipo de vía y origen por arista
+    total = nodos * 32 + aristas * 26
+    # Listas de ruteo (desplazamientos; destinos, orígenes y dos pesos)
+    total += (nodos + 4 * aristas) * BYTES_ELEMENTO_LISTA
+    total += nodos * BYTES_ENTRADA_DICT
+    total += nodos * (8 + 3 * 8 * 2)
+    return total
+
+class RegistroCiudades:
+    """
+    Ciudades cargadas (resultado de precargar_ciudad) ordenadas de la menos a
+    la más recientemente usada, con un presupuesto de memoria en MB
+    """
+    def __init__(self, presupuesto_mb=1024, cargar=None):
+        self.presupuesto = presupuesto_mb * 1024 * 1024
+        self._cargar = cargar or (lambda ciudad, progreso: precargar_ciudad(
+            ciudad, archivo_hospitales_ciudad(ciudad), progreso=progreso))
+        self._ciudades = OrderedDict()
+        self._bytes = {}
+        self._lock = threading.Lock()
+        self._locks_carga = {}
+        self.aciertos = 0
+        self.cargas = 0
+        self.desalojos = 0
+
+    def _lock_carga(self, ciudad):
+        with self._lock:
+            return self._locks_carga.setdefault(ciudad, threading.Lock())
+
+    def residente(self, ciudad):
+        with self._lock:
+            return ciudad in self._ciudades
+
+    def ciudades(self):
+        """
+        Ciudades residentes, de la menos a la más recientemente usada
+        """
+        with self._lock:
+            return list(self._ciudades)
+
+    def memoria(self):
+        """
+        Bytes estimados de las ciudades residentes
+        """
+        with self._lock:
+            return sum(self._bytes.values())
+
+    def obtener(self, ciudad, progreso=None):
+        """
+        Devuelve los datos de la ciudad ({'G', 'hospitales', 'nodos_hospitales',
+        'nodos_principales', 'tiempos'}), cargándolos si no están residentes.
+        None si no se pudo cargar el grafo.
+        """
+        with self._lock:
+            datos = self._ciudades.get(ciudad)
+            if datos is not None:
+                self._ciudades.move_to_end(ciudad)
+                self.aciertos += 1
+        if datos is not None:
+            metricas.incrementar('registro_ciudades_total', resultado='acierto')
+            return datos
+        return self._cargar_ciudad(ciudad, progreso, reciente=True)
+
+    def precalentar(self, ciudades, cancelado=None, solo_locales=True):
+        """
+        Carga por adelantado las ciudades indicadas que no estén residentes.
+        Entran como las menos recientes y solo si caben en el presupuesto sin
+        desplazar a otra ciudad. Con solo_locales=True no descarga ciudades
+        que aún no tienen .graphml.
+        """
+        cargadas = []
+        for ciudad in ciudades:
+            if cancelado is not None and cancelado():
+                break
+            if self.residente(ciudad):
+                continue
+            if solo_locales and not os.path.exists(archivo_grafo_ciudad(ciudad)):
+                continue
+            if not self._cabe(estimar_memoria_ciudad(ciudad)):
+                print(f"🏙️ {ciudad} no cabe en el presupuesto de ciudades, no se precalienta")
+                continue
+            if self._cargar_ciudad(ciudad, None, reciente=False) is not None and self.residente(ciudad):
+                cargadas.append(ciudad)
+        return cargadas
+
+    def _cabe(self, tamano):
+        """
+        True si una ciudad de tamano bytes (None = desconocido) entra en el
+        presupuesto sin descartar a las residentes
+        """
+        if tamano is None:
+            return True
+        with self._lock:
+            return sum(self._bytes.values()) + tamano <= self.presupuesto
+
+    def descartar(self, ciudad):
+        with self._lock:
+            self._ciudades.pop(ciudad, None)
+            self._bytes.pop(ciudad, None)
+
+    def _cargar_ciudad(self, ciudad, progreso, reciente):
+        # Un lock por ciudad: si el precalentamiento ya la está cargando, se espera a ese resultado
+        with self._lock_carga(ciudad):
+            with self._lock:
+                datos = self._ciudades.get(ciudad)
+                if datos is not None:
+                    if reciente:
+                        self._ciudades.move_to_end(ciudad)
+                    return datos
+
+            datos = self._cargar(ciudad, progreso)
+            if datos is None:
+                return None
+            tamano = estimar_memoria(datos['G'])
+
+            with self._lock:
+                self.cargas += 1
+                # Las residentes pudieron sumar tablas (cercanía, jerarquía...) desde que se cargaron
+                for residente, datos_residente in self._ciudades.items():
+                    self._bytes[residente] = estimar_memoria(datos_residente['G'])
+                if not reciente and sum(self._bytes.values()) + tamano > self.presupuesto:
+                    # Precalentamiento que no cabe: se descarta sin tocar las residentes
+                    print(f"🏙️ {ciudad} no cabe en el presupuesto de ciudades, no se precalienta")
+                    return datos
+                self._ciudades[ciudad] = datos
+                self._bytes[ciudad] = tamano
+                self._ciudades.move_to_end(ciudad, last=reciente)
+                self._ajustar_presupuesto(protegida=ciudad)
+                total = sum(self._bytes.values())
+
+            metricas.incrementar('registro_ciudades_total', resultado='carga')
+            metricas.fijar('registro_ciudades_bytes', total)
+            print(f"🏙️ {ciudad} residente (~{tamano / 2**20:.1f} MB; total ~{total / 2**20:.1f} MB "
+                  f"de {self.presupuesto / 2**20:.0f} MB)")
+            return datos
+
+    def _ajustar_presupuesto(self, protegida=None):
+        """
+        Descarta ciudades desde la menos reciente hasta entrar en el presupuesto.
+        La ciudad protegida (la que se acaba de pedir) nunca se descarta.
+        """
+        while sum(self._bytes.values()) > self.presupuesto:
+            candidata = next((c for c in self._ciudades if c != protegida), None)
+            if candidata is None:
+                print(f"⚠️ {protegida} sola excede el presupuesto de memoria de ciudades")
+                return
+            del self._ciudades[candidata]
+            del self._bytes[candidata]
+            self.desalojos += 1
+            metricas.incrementar('registro_ciudades_total', resultado='desalojo')
+            print(f"🏙️ {candidata} descartada de memoria (presupuesto de ciudades)")
+
+# Registro compartido de la aplicación
+registro_ciudades = RegistroCiudades(REGISTRO_CIUDADES['presupuesto_mb'])
+
+def ciudades_probables(actual=None):
+    """
+    Ciudades a precalentar después de cargar la actual: las configuradas,
+    más la ciudad por defecto
+    """
+    candidatas = list(REGISTRO_CIUDADES['precalentar']) + [CIUDAD_DEFAULT]
+    return [c for c in dict.fromkeys(candidatas) if c != actual]
@@ -0,0 +1,287 @@
+# grafo/restricciones.py
+"""
+Cierres y penalizaciones de calles en tiempo de ejecución.
+La capa no modifica G: guarda un factor por arista CSR (infinito = cerrada)
+y GrafoDijkstra multiplica los pesos por esos factores al buscar rutas.
+"""
+import math
+import threading
+import time
+from .csr import obtener_grafo_csr
+from .indice_espacial import obtener_indice_espacial
+from .utilidades import version_grafo
+
+class Restriccion:
+    """
+    Cierre o penalización de un conjunto de aristas
+    """
+    def __init__(self, id_restriccion, aristas, pares, factor, expira=None, motivo=''):
+        self.id = id_restriccion
+        self.aristas = aristas
+        self.pares = pares
+        self.factor = factor
+        self.expira = expira
+        self.motivo = motivo
+
+    @property
+    def cierre(self):
+        return math.isinf(self.factor)
+
+    def a_dict(self):
+        return {
+            'id': self.id,
+            'tipo': 'cierre' if self.cierre else 'penalizacion',
+            'factor': None if self.cierre else self.factor,
+            'aristas': len(self.aristas),
+            'expira': self.expira,
+            'motivo': self.motivo
+        }
+
+class CapaRestricciones:
+    """
+    Restricciones activas sobre un grafo. Se registra en G.graph['restricciones']
+    para que todas las búsquedas sobre G la respeten.
+
+    Los factores son siempre >= 1: los pesos solo pueden aumentar, así las
+    cotas de A*/ALT siguen siendo válidas y una ruta (o tabla de cercanía)
+    que no usa aristas afectadas sigue siendo óptima. Al agregar una
+    restricción solo se invalidan los resultados que pasan por sus aristas;
+    al quitarla, los que se calcularon mientras estaba activa.
+    """
+    def __init__(self, G, cache=None):
+        if cache is None:
+            from .grafo import cache_rutas
+            cache = cache_rutas
+        self.G = G
+        self.csr = obtener_grafo_csr(G)
+        self.cache = cache
+        self.version = 0
+        self._restricciones = {}
+        self._siguiente_id = 1
+        self._proxima_expiracion = math.inf
+        self._pesos = {}
+        # Clave de caché -> restricciones activas cuando se calculó el resultado
+        self._calculos = {}
+        self._lock = threading.RLock()
+        G.graph['restricciones'] = self
+
+    def cerrar(self, aristas, duracion=None, motivo='', ambos_sentidos=True):
+        """
+        Cierra las aristas indicadas. aristas: pares (u, v) o ternas (u, v, clave)
+        de ids OSM. duracion en segundos (None = hasta quitarla). Devuelve el id.
+        """
+        return self.agregar(aristas, math.inf, duracion, motivo, ambos_sentidos)
+
+    def penalizar(self, aristas, factor, duracion=None, motivo='', ambos_sentidos=True):
+        """
+        Multiplica el peso de las aristas por factor (>= 1). Devuelve el id.
+        """
+        return self.agregar(aristas, factor, duracion, motivo, ambos_sentidos)
+
+    def agregar(self, aristas, factor, duracion=None, motivo='', ambos_sentidos=True):
+        if not factor >= 1:
+            raise ValueError("El factor de una restricción debe ser mayor o igual a 1")
+        indices, pares = self._indices_aristas(aristas, ambos_sentidos)
+        if not indices:
+            raise ValueError("Ninguna de las aristas indicadas está en el grafo")
+
+        with self._lock:
+            self.limpiar_expiradas()
+            id_restriccion = self._siguiente_id
+            self._siguiente_id += 1
+            expira = time.time() + duracion if duracion is not None else None
+            self._restricciones[id_restriccion] = Restriccion(id_restriccion, indices, pares,
+                                                              float(factor), expira, motivo)
+            if expira is not None:
+                self._proxima_expiracion = min(self._proxima_expiracion, expira)
+            self._cambio()
+
+        # Los pesos solo aumentan: basta con descartar lo que pasa por estas aristas
+        self._invalidar(lambda camino: _usa_pares(camino, pares),
+                        lambda campo: _campo_usa_pares(campo, pares))
+        return id_restriccion
+
+    def quitar(self, id_restriccion):
+        """
+        Quita una restricción. Devuelve False si no existía.
+        """
+        with self._lock:
+            if self._restricciones.pop(id_restriccion, None) is None:
+                return False
+            self._proxima_expiracion = min((r.expira for r in self._restricciones.values()
+                                            if r.expira is not None), default=math.inf)
+            calculos = self._calculos
+            self._calculos = {clave: ids for clave, ids in calculos.items() if id_restriccion not in ids}
+            self._cambio()
+
+        # Los pesos vuelven a bajar: descartar lo calculado con esta restricción activa
+        self._invalidar(None, lambda campo: id_restriccion in campo.restricciones,
+                        lambda clave: id_restriccion in calculos.get(clave, ()))
+        return True
+
+    def limpiar_expiradas(self):
+        """
+        Quita las restricciones vencidas. Devuelve cuántas se quitaron.
+        """
+        if time.time() < self._proxima_expiracion:
+            return 0
+        ahora = time.time()
+        vencidas = [r.id for r in list(self._restricciones.values())
+                    if r.expira is not None and r.expira <= ahora]
+        for id_restriccion in vencidas:
+            self.quitar(id_restriccion)
+        return len(vencidas)
+
+    def activa(self):
+        """
+        True si hay alguna restricción vigente
+        """
+        self.limpiar_expiradas()
+        return bool(self._restricciones)
+
+    def ids_activos(self):
+        return frozenset(self._restricciones)
+
+    def listar(self):
+        self.limpiar_expiradas()
+        return [r.a_dict() for r in self._restricciones.values()]
+
+    def factores(self):
+        """
+        Factor de cada arista afectada (índice CSR -> factor acumulado)
+        """
+        factores = {}
+        for restriccion in self._restricciones.values():
+            for arista in restriccion.aristas:
+                factores[arista] = factores.get(arista, 1.0) * restriccion.factor
+        return factores
+
+    def pesos(self, peso):
+        """
+        Lista de pesos con las restricciones aplicadas (en el orden del grafo CSR).
+        Se calcula una vez por cambio de la capa.
+        """
+        with self._lock:
+            guardado = self._pesos.get(peso)
+            if guardado is not None and guardado[0] == self.version:
+                return guardado[1]
+            pesos = list(self.csr.lista(peso))
+            for arista, factor in self.factores().items():
+                pesos[arista] *= factor
+            self._pesos[peso] = (self.version, pesos)
+            return pesos
+
+    def pesos_inversos(self, peso):
+        """
+        Pesos restringidos en el orden del grafo inverso
+        """
+        clave = f"inverso_{peso}"
+        with self._lock:
+            guardado = self._pesos.get(clave)
+            if guardado is not None and guardado[0] == self.version:
+                return guardado[1]
+            pesos = self.pesos(peso)
+            inversos = [pesos[arista] for arista in self.csr.inverso().lista('aristas')]
+            self._pesos[clave] = (self.version, inversos)
+            return inversos
+
+    def registrar_calculo(self, clave):
+        """
+        Anota que el resultado guardado en caché con esta clave depende de las restricciones activas
+        """
+        with self._lock:
+            if self._restricciones:
+                self._calculos[clave] = self.ids_activos()
+
+    def aristas_en_zona(self, lat, lon, radio):
+        """
+        Aristas (u, v, clave) con ambos extremos a menos de radio metros del punto,
+        por ejemplo para cerrar una zona inundada
+        """
+        nodos = set(obtener_indice_espacial(self.csr).nodos_en_radio(lat, lon, radio))
+        csr = self.csr
+        desplazamientos = csr.lista('desplazamientos')
+        destinos = csr.lista('destinos')
+        claves = csr.lista('claves')
+        nodos_osm = csr.lista('nodos_osm')
+        aristas = []
+        for nodo in nodos:
+            i = csr.indice[nodo]
+            for arista in range(desplazamientos[i], desplazamientos[i + 1]):
+                if nodos_osm[destinos[arista]] in nodos:
+                    aristas.append((nodo, nodos_osm[destinos[arista]], claves[arista]))
+        return aristas
+
+    def _cambio(self):
+        self.version += 1
+        self._pesos = {}
+        if not self._restricciones:
+            self._calculos = {}
+
+    def _indices_aristas(self, aristas, ambos_sentidos):
+        """
+        Traduce (u, v) / (u, v, clave) a índices de aristas CSR.
+        Devuelve (índices, pares (u, v) afectados).
+        """
+        csr = self.csr
+        desplazamientos = csr.lista('desplazamientos')
+        destinos = csr.lista('destinos')
+        claves = csr.lista('claves')
+        indices, pares = set(), set()
+        for arista in aristas:
+            u, v = arista[0], arista[1]
+            clave = arista[2] if len(arista) > 2 else None
+            sentidos = [(u, v), (v, u)] if ambos_sentidos else [(u, v)]
+            for a, b in sentidos:
+                if a not in csr or b not in csr:
+                    continue
+                i, j = csr.indice[a], csr.indice[b]
+                for posicion in range(desplazamientos[i], desplazamientos[i + 1]):
+                    if destinos[posicion] == j and (clave is None or (a, b) != (u, v) or claves[posicion] == clave):
+                        indices.add(posicion)
+                        pares.add((a, b))
+        return sorted(indices), pares
+
+    def _invalidar(self, usa_camino, invalida_campo, calculada_con=None):
+        """
+        Descarta rutas en caché y tablas de cercanía afectadas por un cambio
+        """
+        version = version_grafo(self.G)
+        if self.cache is not None:
+            if calculada_con is not None:
+                # Lo calculado con restricciones solo se guarda en memoria
+                self.cache.invalidar(version, lambda clave, _: calculada_con(clave), disco=False)
+            else:
+                # En disco se descarta la versión completa por nombre de archivo, sin leerlos
+                self.cache.invalidar(version, lambda _, rutas: any(
+                    usa_camino(info['camino']) for info in rutas.values()))
+
+        for campo in list(self.G.graph.get('campos_cercania', ())):
+            if campo.vigente and invalida_campo(campo):
+                campo.vigente = False
+        for clave in [c for c, campo in self.G.graph.items()
+                      if c.startswith('campo_cercania_') and not campo.vigente]:
+            del self.G.graph[clave]
+
+def _usa_pares(camino, pares):
+    return any(par in pares for par in zip(camino, camino[1:]))
+
+def _campo_usa_pares(campo, pares):
+    siguiente = campo.siguiente
+    return any(siguiente.get(u) == v for u, v in pares)
+
+def capa_activa(G):
+    """
+    Capa de restricciones de G si tiene alguna restricción vigente, o None
+    """
+    capa = getattr(G, 'graph', {}).get('restricciones')
+    return capa if capa is not None and capa.activa() else None
+
+def obtener_restricciones(G, cache=None):
+    """
+    Devuelve la capa de restricciones de G, creándola si no existe
+    """
+    capa = G.graph.get('restricciones')
+    if capa is None:
+        capa = CapaRestricciones(G, cache)
+    return capa
@@ -0,0 +1,160 @@
+# grafo/seguimiento.py
+"""
+Seguimiento de vehículos en movimiento con re-ruteo incremental.
+El árbol de caminos mínimos hacia los hospitales (tabla de cercanía) se calcula
+una vez y se reutiliza en cada posición: mientras el vehículo siga sobre su ruta
+solo se recorta el tramo ya recorrido, y si se sale de ella la nueva ruta se
+obtiene recorriendo el mismo árbol, sin una nueva búsqueda.
+"""
+import queue
+import threading
+import time
+from .cercania import obtener_campo_cercania, calcular_campo_cercania
+from .grafo import GrafoDijkstra
+from .ajuste_hospitales import ajustar_hospitales
+from .indice_espacial import obtener_indice_espacial
+from .utilidades import obtener_ruta_coordenadas, version_grafo
+
+class EstadoVehiculo:
+    """
+    Ruta actual de un vehículo y métricas acumuladas a lo largo de ella.
+    Se lee y modifica solo con lock tomado: las posiciones de un mismo
+    vehículo se procesan una a la vez.
+    """
+    def __init__(self, vehiculo, destino=None):
+        self.lock = threading.Lock()
+        self.vehiculo = vehiculo
+        self.destino = destino
+        self.camino = []
+        self.posiciones = {}
+        self.longitudes = []
+        self.tiempos = []
+        self.indice = 0
+        self.hospital = None
+        # Tabla de la que salió la ruta; si deja de estar vigente se recalcula
+        self.campo = None
+
+class GestorSeguimiento:
+    """
+    Mantiene el estado de muchos vehículos y publica cada actualización
+    a los suscriptores (por ejemplo, flujos server-sent events)
+    """
+    def __init__(self, G, hospitales, peso=None):
+        self.G = G
+        self.grafo = GrafoDijkstra(G) if peso is None else GrafoDijkstra(G, peso=peso)
+        self.hospitales = hospitales
+        self.nodos_hospitales, _ = ajustar_hospitales(G, hospitales)
+        self.nombres = {nodo: h['nombre'] for nodo, h in zip(self.nodos_hospitales, hospitales)}
+        self.campo = obtener_campo_cercania(G, self.nodos_hospitales, self.grafo.peso)
+        self.indice_espacial = obtener_indice_espacial(G)
+        self.version = version_grafo(G)
+        self._campos_destino = {}
+        self._vehiculos = {}
+        self._suscriptores = []
+        self._lock = threading.Lock()
+
+    def _campo_para(self, destino):
+        """
+        Árbol hacia un hospital concreto (o hacia el más cercano si destino es None)
+        """
+        if destino is None:
+            if not self.campo.vigente:
+                # Una restricción afectó a la tabla compartida
+                self.campo = obtener_campo_cercania(self.G, self.nodos_hospitales, self.grafo.peso)
+            return self.campo
+        with self._lock:
+            campo = self._campos_destino.get(destino)
+        if campo is None or not campo.vigente:
+            campo = calcular_campo_cercania(self.G, [destino], self.grafo.peso)
+            with self._lock:
+                self._campos_destino[destino] = campo
+        return campo
+
+    def asignar_destino(self, vehiculo, destino):
+        """
+        Fija el hospital (nodo) al que se dirige un vehículo; None vuelve al más cercano
+        """
+        with self._lock:
+            estado = self._vehiculos.setdefault(vehiculo, EstadoVehiculo(vehiculo))
+        with estado.lock:
+            estado.destino = destino
+            # La próxima posición arma la ruta hacia el nuevo destino
+            estado.campo = None
+
+    def actualizar(self, vehiculo, lat, lon):
+        """
+        Procesa una nueva posición y publica la actualización. Devuelve el mensaje enviado.
+        """
+        inicio = time.perf_counter()
+        nodo, distancia_ajuste = self.indice_espacial.nodo_mas_cercano(lat, lon)
+
+        with self._lock:
+            estado = self._vehiculos.setdefault(vehiculo, EstadoVehiculo(vehiculo))
+        with estado.lock:
+            campo = self._campo_para(estado.destino)
+
+            mensaje = {
+                'vehiculo': vehiculo,
+                'lat': lat,
+                'lon': lon,
+                'nodo': nodo,
+                'distancia_ajuste': round(distancia_ajuste, 1)
+            }
+
+            if estado.campo is campo and nodo in estado.posiciones and estado.posiciones[nodo] >= estado.indice:
+                # Sigue sobre la ruta: solo avanzar el índice
+                estado.indice = estado.posiciones[nodo]
+                mensaje['recalculado'] = False
+            else:
+                camino = campo.camino(nodo)
+                estado.camino = camino
+                estado.posiciones = {n: i for i, n in enumerate(camino)}
+                estado.indice = 0
+                estado.hospital = camino[-1] if camino else None
+                estado.campo = campo
+                if camino:
+                    estado.longitudes, estado.tiempos = self.grafo.metricas_acumuladas(camino)
+                mensaje['recalculado'] = True
+                mensaje['ruta'] = [[round(x, 6), round(y, 6)]
+                                   for x, y in obtener_ruta_coordenadas(self.G, camino)]
+
+            if estado.camino:
+                mensaje['hospital'] = self.nombres.get(estado.hospital)
+                mensaje['indice'] = estado.indice
+                mensaje['longitud_restante'] = round(estado.longitudes[-1] - estado.longitudes[estado.indice], 1)
+                mensaje['tiempo_restante'] = round(estado.tiempos[-1] - estado.tiempos[estado.indice], 1)
+            else:
+                mensaje['hospital'] = None
+
+            mensaje['ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+            self.publicar(mensaje)
+        return mensaje
+
+    def suscribir(self, vehiculo=None):
+        """
+        Devuelve una cola que recibe las actualizaciones (de un vehículo o de todos)
+        """
+        cola = queue.Queue(maxsize=100)
+        with self._lock:
+            self._suscriptores.append((vehiculo, cola))
+        return cola
+
+    def desuscribir(self, cola):
+        with self._lock:
+            self._suscriptores = [(v, c) for v, c in self._suscriptores if c is not cola]
+
+    def publicar(self, mensaje):
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for vehiculo, cola in suscriptores:
+            if vehiculo is not None and vehiculo != mensaje['vehiculo']:
+                continue
+            try:
+                cola.put_nowait(mensaje)
+            except queue.Full:
+                # Cliente lento: descartar la actualización más antigua
+                try:
+                    cola.get_nowait()
+                    cola.put_nowait(mensaje)
+                except (queue.Empty, queue.Full):
+                    pass
@@ -0,0 +1,162 @@
+# grafo/snapshot.py
+import hashlib
+import json
+import os
+import numpy as np
+from .csr import GrafoCSR, obtener_grafo_csr
+from .utilidades import version_grafo
+
+# Incrementar si cambia el contenido o la disposición de los arreglos
+# (3: grafo de ruteo reducido a la componente fuertemente conexa más grande;
+#  4: sin velocidades de OSM, con tamaño y fecha del .graphml en meta.json)
+FORMATO_SNAPSHOT = 4
+
+ARREGLOS = ['nodos_osm', 'desplazamientos', 'destinos', 'claves', 'longitud',
+            'tiempo', 'lat', 'lon', 'highway']
+
+def hash_archivo(ruta, bloque=1 << 20):
+    """
+    Calcula el SHA1 del contenido de un archivo
+    """
+    h = hashlib.sha1()
+    with open(ruta, 'rb') as f:
+        for parte in iter(lambda: f.read(bloque), b''):
+            h.update(parte)
+    return h.hexdigest()
+
+def firma_archivo(ruta):
+    """
+    Tamaño y fecha de modificación de un archivo: si no cambiaron, no hace
+    falta recalcular su hash
+    """
+    estado = os.stat(ruta)
+    return {'tamano': estado.st_size, 'modificado': estado.st_mtime_ns}
+
+def guardar_snapshot(G, directorio, archivo_origen):
+    """
+    Guarda el grafo como arreglos numpy (.npy) más un archivo meta.json con
+    el hash, el tamaño y la fecha del .graphml de origen. Devuelve True si se
+    guardó correctamente.
+    """
+    try:
+        csr = obtener_grafo_csr(G)
+        if csr.nodos_osm.dtype == object:
+            print("⚠️ Ids de nodo no numéricos, no se genera snapshot")
+            return False
+
+        arreglos = {
+            'nodos_osm': csr.nodos_osm,
+            'desplazamientos': csr.desplazamientos,
+            'destinos': csr.destinos,
+            'claves': csr.claves,
+            'longitud': csr.pesos['length'],
+            'tiempo': csr.tiempo_osm,
+            'lat': csr.lat,
+            'lon': csr.lon,
+            'highway': csr.highway
+        }
+
+        os.makedirs(directorio, exist_ok=True)
+        ruta_meta = os.path.join(directorio, 'meta.json')
+
+        # Quitar la cabecera primero: un snapshot a medio escribir queda inválido
+        if os.path.exists(ruta_meta):
+            os.remove(ruta_meta)
+        for nombre, arreglo in arreglos.items():
+            np.save(os.path.join(directorio, f"{nombre}.npy"), np.ascontiguousarray(arreglo))
+
+        meta = {
+            'formato': FORMATO_SNAPSHOT,
+            'hash_origen': hash_archivo(archivo_origen),
+            'origen': firma_archivo(archivo_origen),
+            'version_grafo': version_grafo(G),
+            'crs': str(G.graph.get('crs', 'epsg:4326')),
+            'num_nodos': csr.num_nodos,
+            'num_aristas': csr.num_aristas,
+            'tipos_via': csr.tipos_via
+        }
+        _escribir_meta(directorio, meta)
+
+        print(f"💾 Snapshot del grafo guardado en {directorio}")
+        return True
+    except Exception as e:
+        print(f"❌ Error al guardar snapshot: {e}")
+        return False
+
+def leer_meta_snapshot(directorio):
+    """
+    Lee la cabecera del snapshot, o None si no existe
+    """
+    ruta_meta = os.path.join(directorio, 'meta.json')
+    if not os.path.exists(ruta_meta):
+        return None
+    with open(ruta_meta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _escribir_meta(directorio, meta):
+    with open(os.path.join(directorio, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+def _origen_vigente(directorio, meta, archivo_origen):
+    """
+    True si el .graphml es el mismo del que se generó el snapshot. Con el mismo
+    tamaño y fecha no se lee; si cambiaron se compara el hash del contenido.
+    """
+    firma = firma_archivo(archivo_origen)
+    if meta.get('origen') == firma:
+        return True
+    if hash_archivo(archivo_origen) != meta.get('hash_origen'):
+        return False
+    # Mismo contenido con otra fecha (copiado, restaurado...): actualizar la firma
+    meta['origen'] = firma
+    try:
+        _escribir_meta(directorio, meta)
+    except OSError:
+        pass
+    return True
+
+def cargar_snapshot(directorio, archivo_origen=None):
+    """
+    Carga los arreglos del snapshot en modo memory-map (las páginas se leen
+    bajo demanda) y devuelve el GrafoCSR listo para rutear, o None si falta,
+    tiene otro formato, no corresponde al .graphml de origen o su versión de
+    grafo no coincide con la guardada.
+    """
+    try:
+        meta = leer_meta_snapshot(directorio)
+        if meta is None:
+            return None
+        if meta.get('formato') != FORMATO_SNAPSHOT:
+            print("⚠️ Snapshot con formato antiguo, se ignora")
+            return None
+        if archivo_origen is not None and not _origen_vigente(directorio, meta, archivo_origen):
+            print("⚠️ Snapshot desactualizado, se ignora")
+            return None
+
+        arreglos = {nombre: np.load(os.path.join(directorio, f"{nombre}.npy"), mmap_mode='r')
+                    for nombre in ARREGLOS}
+        if len(arreglos['nodos_osm']) != meta['num_nodos'] or len(arreglos['destinos']) != meta['num_aristas']:
+            print("⚠️ Snapshot incompleto, se ignora")
+            return None
+
+        csr = GrafoCSR(
+            arreglos['nodos_osm'],
+            arreglos['desplazamientos'],
+            arreglos['destinos'],
+            arreglos['longitud'],
+            arreglos['tiempo'],
+            arreglos['lat'],
+            arreglos['lon'],
+            arreglos['claves'],
+            arreglos['highway'],
+            meta['tipos_via']
+        )
+        # Incluye VELOCIDADES_VIA: si cambió la configuración se regenera desde el .graphml
+        if version_grafo(csr) != meta.get('version_grafo'):
+            print("⚠️ Snapshot con otra versión del grafo, se ignora")
+            return None
+        csr.graph['crs'] = meta['crs']
+        return csr
+    except Exception as e:
+        print(f"❌ Error al cargar snapshot: {e}")
+        return None
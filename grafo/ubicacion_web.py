@@ -1,8 +1,31 @@
 # grafo/ubicacion_web.py
-from flask import Flask, request, render_template, jsonify
+"""
+Servidor Flask que recibe la ubicación del navegador.
+También puede funcionar como servicio de ruteo sin interfaz gráfica:
+
+    python -m grafo.ubicacion_web --ciudad "Puno, Peru" --host 0.0.0.0 --puerto 5000
+
+El seguimiento de vehículos (re-ruteo de cada posición, /ubicacion/stream y
+/seguimiento/destino) solo existe en el modo servicio. Junto a la interfaz
+gráfica el servidor solo guarda la última posición, que la ventana usa como
+"Ubicación actual".
+"""
+import argparse
+import json
+import math
+import os
+import queue
 import threading
+from flask import Flask, Response, request, render_template, jsonify
+from config import SERVICIO
+from . import metricas
+
+# Última ubicación recibida (protegida por un lock: Flask atiende en varios hilos)
+_ubicacion = {}
+_lock_ubicacion = threading.Lock()
 
-ubicacion = {}
+# Grafo y hospitales del modo servicio; se cargan una sola vez al iniciar
+servicio = {}
 
 app = Flask(__name__, template_folder='../templates')
 
@@ -12,14 +35,349 @@ def index():
 
 @app.route('/ubicacion', methods=['POST'])
 def recibir_ubicacion():
-    global ubicacion
-    ubicacion = request.json
-    print(f"📍 Ubicación actualizada: {ubicacion}")
+    """
+    Recibe una posición. En el modo servicio la posición se re-rutea y se
+    publica en /ubicacion/stream ('vehiculo' identifica al emisor); junto a la
+    interfaz gráfica solo se guarda.
+    """
+    global _ubicacion
+    datos = request.get_json(silent=True) or {}
+    with _lock_ubicacion:
+        _ubicacion = datos
+
+    seguimiento = servicio.get('seguimiento')
+    if seguimiento is not None:
+        try:
+            lat, lon = _punto_peticion(datos)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        mensaje = seguimiento.actualizar(str(datos.get('vehiculo', 'navegador')), lat, lon)
+        return jsonify(mensaje)
     return "OK"
 
 @app.route('/ubicacion', methods=['GET'])
 def obtener_ubicacion():
-    return jsonify(ubicacion)
+    with _lock_ubicacion:
+        return jsonify(_ubicacion)
+
+@app.route('/ubicacion/stream', methods=['GET'])
+def stream_ubicacion():
+    """
+    Flujo server-sent events con las actualizaciones de ruta de un vehículo
+    (?vehiculo=) o de todos
+    """
+    seguimiento = servicio.get('seguimiento')
+    if seguimiento is None:
+        return jsonify({'error': 'Seguimiento disponible solo en el modo servicio'}), 503
+
+    cola = seguimiento.suscribir(request.args.get('vehiculo'))
+
+    def eventos():
+        try:
+            while True:
+                try:
+                    mensaje = cola.get(timeout=15)
+                    yield f"data: {json.dumps(mensaje, separators=(',', ':'))}\n\n"
+                except queue.Empty:
+                    # Comentario para mantener viva la conexión
+                    yield ": ping\n\n"
+        finally:
+            seguimiento.desuscribir(cola)
+
+    return Response(eventos(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/seguimiento/destino', methods=['POST'])
+def asignar_destino():
+    """
+    Asigna a {'vehiculo'} el hospital {'hospital'} (nombre); sin hospital vuelve al más cercano
+    """
+    seguimiento = servicio.get('seguimiento')
+    if seguimiento is None:
+        return jsonify({'error': 'Seguimiento disponible solo en el modo servicio'}), 503
+    datos = request.get_json(silent=True) or {}
+    destino = None
+    if datos.get('hospital'):
+        nodos = [nodo for nodo, nombre in seguimiento.nombres.items() if nombre == datos['hospital']]
+        if not nodos:
+            return jsonify({'error': f"Hospital desconocido: {datos['hospital']}"}), 404
+        destino = nodos[0]
+    seguimiento.asignar_destino(str(datos.get('vehiculo', 'navegador')), destino)
+    return jsonify({'vehiculo': datos.get('vehiculo', 'navegador'), 'destino': destino})
+
+def cargar_servicio(ciudad, archivo_hospitales='datos/hospitales.json'):
+    """
+    Carga el grafo y los hospitales para el modo servicio y precalcula las
+    estructuras compartidas (índice espacial, tabla de cercanía)
+    """
+    from .osm_datos import obtener_grafo_ciudad, cargar_hospitales
+    from .grafo import GrafoDijkstra
+    from .ajuste_hospitales import ajustar_hospitales
+    from .cercania import obtener_campo_cercania
+    from .seguimiento import GestorSeguimiento
+
+    G = obtener_grafo_ciudad(ciudad)
+    if G is None:
+        raise RuntimeError(f"No se pudo cargar el grafo de {ciudad}")
+    hospitales = cargar_hospitales(archivo_hospitales)
+
+    grafo = GrafoDijkstra(G)
+    nodos_hospitales, _ = ajustar_hospitales(G, hospitales, archivo_hospitales)
+    obtener_campo_cercania(G, nodos_hospitales, grafo.peso)
+
+    # Una consulta de prueba deja listas las cachés del grafo antes de atender peticiones
+    if nodos_hospitales:
+        grafo.rutas_dijkstra(nodos_hospitales[0], nodos_hospitales[:1])
+
+    servicio.update({'ciudad': ciudad, 'G': G, 'hospitales': hospitales, 'peso': grafo.peso,
+                     'seguimiento': GestorSeguimiento(G, hospitales, grafo.peso)})
+    print(f"✅ Servicio de ruteo listo: {ciudad}, {len(hospitales)} hospitales")
+
+def _punto_peticion(datos):
+    """
+    Lee y valida 'lat' y 'lon' de un diccionario
+    """
+    from .utilidades import validar_coordenadas
+
+    lat, lon = datos.get('lat'), datos.get('lon')
+    if lat is None or lon is None or not validar_coordenadas(lat, lon):
+        raise ValueError("Coordenadas inválidas: se esperan 'lat' y 'lon'")
+    return float(lat), float(lon)
+
+def _numero_json(valor, decimales=1):
+    return round(float(valor), decimales) if math.isfinite(valor) else None
+
+def _feature_ruta(G, nodo, ruta_info, hospital_info, incluir_geometria=True):
+    """
+    Convierte una ruta en un Feature GeoJSON compacto
+    """
+    from .utilidades import obtener_ruta_coordenadas
+
+    feature = {
+        'type': 'Feature',
+        'properties': {
+            'hospital': hospital_info['nombre'],
+            'nodo': nodo,
+            'longitud': _numero_json(ruta_info['longitud']),
+            'tiempo': _numero_json(ruta_info['tiempo'])
+        },
+        'geometry': None
+    }
+    if incluir_geometria:
+        coordenadas = obtener_ruta_coordenadas(G, ruta_info['camino'])
+        feature['geometry'] = {
+            'type': 'LineString',
+            'coordinates': [[round(lon, 6), round(lat, 6)] for lon, lat in coordenadas]
+        }
+    return feature
+
+def _respuesta_rutas(resultado, limite=None, incluir_geometria=True):
+    G = servicio['G']
+    criterio = 'tiempo' if servicio['peso'] == 'travel_time' else 'longitud'
+    ordenadas = sorted(resultado['rutas'].items(), key=lambda x: x[1][criterio])
+    if limite is not None:
+        ordenadas = ordenadas[:limite]
+    return {
+        'type': 'FeatureCollection',
+        'features': [_feature_ruta(G, nodo, info, resultado['hospitales_info'][nodo], incluir_geometria)
+                     for nodo, info in ordenadas]
+    }
+
+def _servicio_listo():
+    if 'G' not in servicio:
+        return jsonify({'error': 'Servicio de ruteo no iniciado'}), 503
+    return None
+
+@app.route('/hospital_cercano', methods=['GET'])
+def hospital_cercano():
+    """
+    Hospital más cercano a ?lat=&lon= (consulta directa en la tabla de cercanía)
+    """
+    from .grafo import procesar_rutas_hospitales
+    from .utilidades import nodo_mas_cercano
+
+    error = _servicio_listo()
+    if error:
+        return error
+    try:
+        lat, lon = _punto_peticion(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    G = servicio['G']
+    nodo_origen = nodo_mas_cercano(G, lat, lon)
+    resultado = procesar_rutas_hospitales(G, nodo_origen, servicio['hospitales'], solo_mas_cercano=True)
+    return jsonify(_respuesta_rutas(resultado, 1, request.args.get('geometria', '1') != '0'))
+
+@app.route('/rutas', methods=['POST'])
+def rutas():
+    """
+    Rutas desde {'lat', 'lon'} a los 'n' hospitales más cercanos (todos si no se indica).
+    'hospitales' puede limitar la búsqueda a una lista de nombres y
+    'alternativas' pide hasta ese número de rutas por hospital.
+    """
+    from .grafo import procesar_rutas_hospitales, procesar_rutas_alternativas
+    from .utilidades import nodo_mas_cercano
+
+    error = _servicio_listo()
+    if error:
+        return error
+    datos = request.get_json(silent=True) or {}
+    try:
+        lat, lon = _punto_peticion(datos)
+        limite = int(datos['n']) if datos.get('n') is not None else None
+        alternativas = int(datos['alternativas']) if datos.get('alternativas') is not None else 1
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if alternativas < 1:
+        return jsonify({'error': "alternativas debe ser un entero positivo"}), 400
+    # Cada alternativa es una búsqueda de desvíos más por hospital
+    alternativas = min(alternativas, SERVICIO['max_alternativas'])
+
+    hospitales = servicio['hospitales']
+    if datos.get('hospitales') is not None:
+        nombres = datos['hospitales']
+        if not isinstance(nombres, list) or not all(isinstance(n, str) for n in nombres):
+            return jsonify({'error': "hospitales debe ser una lista de nombres"}), 400
+        if nombres:
+            nombres = set(nombres)
+            hospitales = [h for h in hospitales if h['nombre'] in nombres]
+
+    G = servicio['G']
+    nodo_origen = nodo_mas_cercano(G, lat, lon)
+    if alternativas > 1:
+        resultado = procesar_rutas_alternativas(G, nodo_origen, hospitales, alternativas)
+    else:
+        # Con 'n' solo se rutea a los n más cercanos
+        resultado = procesar_rutas_hospitales(G, nodo_origen, hospitales, k=limite)
+    return jsonify(_respuesta_rutas(resultado, limite, datos.get('geometria', True)))
+
+@app.route('/matriz', methods=['POST'])
+def matriz():
+    """
+    Matriz de tiempos y distancias desde {'origenes': [{'lat', 'lon'}, ...]}
+    a todos los hospitales
+    """
+    from .indice_espacial import ajustar_puntos
+    from .ajuste_hospitales import ajustar_hospitales
+    from .matriz_od import matriz_od
+
+    error = _servicio_listo()
+    if error:
+        return error
+    datos = request.get_json(silent=True) or {}
+    try:
+        puntos = [dict(zip(('lat', 'lon'), _punto_peticion(p))) for p in datos.get('origenes', [])]
+        procesos = int(datos.get('procesos', 1))
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if not puntos:
+        return jsonify({'error': "Se espera una lista 'origenes'"}), 400
+    if procesos < 1:
+        return jsonify({'error': "procesos debe ser un entero positivo"}), 400
+
+    G = servicio['G']
+    hospitales = servicio['hospitales']
+    origenes, _ = ajustar_puntos(G, puntos)
+    destinos, _ = ajustar_hospitales(G, hospitales)
+    resultado = matriz_od(G, origenes, destinos, servicio['peso'],
+                           procesos=min(procesos, os.cpu_count() or 1))
+    return jsonify({
+        'hospitales': [h['nombre'] for h in hospitales],
+        'tiempo': [[_numero_json(v) for v in fila] for fila in resultado['tiempo'].tolist()],
+        'longitud': [[_numero_json(v) for v in fila] for fila in resultado['longitud'].tolist()]
+    })
+
+@app.route('/isocronas', methods=['GET'])
+def isocronas():
+    """
+    Áreas alcanzables de los hospitales: ?minutos=5,10,15&metodo=rejilla|concavo&por_hospital=1
+    """
+    from .isocronas import isocronas_hospitales
+
+    error = _servicio_listo()
+    if error:
+        return error
+    try:
+        minutos = [float(m) for m in request.args['minutos'].split(',')] if request.args.get('minutos') else None
+    except ValueError:
+        return jsonify({'error': "minutos debe ser una lista separada por comas"}), 400
+    return jsonify(isocronas_hospitales(
+        servicio['G'], servicio['hospitales'], minutos, servicio['peso'],
+        request.args.get('metodo', 'rejilla'), por_hospital=request.args.get('por_hospital') == '1'
+    ))
+
+@app.route('/restricciones', methods=['GET'])
+def listar_restricciones():
+    from .restricciones import obtener_restricciones
+
+    error = _servicio_listo()
+    if error:
+        return error
+    return jsonify(obtener_restricciones(servicio['G']).listar())
+
+@app.route('/restricciones', methods=['POST'])
+def agregar_restriccion():
+    """
+    Cierra o penaliza calles: {'aristas': [[u, v], ...]} o una zona {'lat', 'lon', 'radio'}.
+    'factor' (>= 1) penaliza en lugar de cerrar; 'duracion' en segundos; 'motivo' opcional.
+    """
+    from .restricciones import obtener_restricciones
+
+    error = _servicio_listo()
+    if error:
+        return error
+    datos = request.get_json(silent=True) or {}
+    capa = obtener_restricciones(servicio['G'])
+    try:
+        if datos.get('aristas'):
+            aristas = [tuple(arista) for arista in datos['aristas']]
+        else:
+            lat, lon = _punto_peticion(datos)
+            aristas = capa.aristas_en_zona(lat, lon, float(datos.get('radio', 50)))
+        factor = float(datos['factor']) if datos.get('factor') is not None else math.inf
+        duracion = float(datos['duracion']) if datos.get('duracion') is not None else None
+        id_restriccion = capa.agregar(aristas, factor, duracion, datos.get('motivo', ''))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'id': id_restriccion}), 201
+
+@app.route('/restricciones/<int:id_restriccion>', methods=['DELETE'])
+def quitar_restriccion(id_restriccion):
+    from .restricciones import obtener_restricciones
+
+    error = _servicio_listo()
+    if error:
+        return error
+    if not obtener_restricciones(servicio['G']).quitar(id_restriccion):
+        return jsonify({'error': f"Restricción desconocida: {id_restriccion}"}), 404
+    return jsonify({'id': id_restriccion})
+
+@app.after_request
+def contar_peticion(respuesta):
+    # Se cuenta por regla (p. ej. /restricciones/<int:id_restriccion>), no por URL
+    regla = request.url_rule.rule if request.url_rule is not None else 'desconocida'
+    metricas.incrementar('peticiones_total', ruta=regla, metodo=request.method, estado=respuesta.status_code)
+    return respuesta
+
+@app.route('/metrics', methods=['GET'])
+def exportar_metricas():
+    """
+    Métricas en formato de texto de Prometheus
+    """
+    return Response(metricas.exportar_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 def iniciar_servidor():
     threading.Thread(target=lambda: app.run(port=5000, debug=False), daemon=True).start()
+
+if __name__ == '__main__':
+    from config import CIUDAD_DEFAULT
+
+    parser = argparse.ArgumentParser(description="Servicio de ruteo a hospitales sin interfaz gráfica")
+    parser.add_argument('--ciudad', default=CIUDAD_DEFAULT)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=5000)
+    argumentos = parser.parse_args()
+
+    cargar_servicio(argumentos.ciudad)
+    app.run(host=argumentos.host, port=argumentos.puerto, debug=False, threaded=True)
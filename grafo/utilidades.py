@@ -1,13 +1,20 @@
 # grafo/utilidades.py
-import osmnx as ox
+import hashlib
 import math
+import os
+import numpy as np
+from .csr import obtener_grafo_csr
+from .indice_espacial import obtener_indice_espacial
+from . import metricas
 
 def nodo_mas_cercano(G, lat, lon):
     """
     Encuentra el nodo más cercano a una coordenada dada
     """
     try:
-        return ox.distance.nearest_nodes(G, lon, lat)
+        with metricas.tramo('nodo_mas_cercano'):
+            nodo, _ = obtener_indice_espacial(G).nodo_mas_cercano(lat, lon)
+        return nodo
     except Exception as e:
         print(f"Error al encontrar nodo más cercano: {e}")
         return None
@@ -17,6 +24,8 @@ def coordenadas_nodo(G, nodo):
     Obtiene las coordenadas de un nodo
     """
     try:
+        if hasattr(G, 'coordenadas'):
+            return G.coordenadas(nodo)
         return G.nodes[nodo]['y'], G.nodes[nodo]['x']
     except Exception as e:
         print(f"Error al obtener coordenadas del nodo: {e}")
@@ -71,6 +80,8 @@ def obtener_ruta_coordenadas(G, ruta_nodos):
     Convierte una ruta de nodos a una lista de coordenadas
     """
     try:
+        if hasattr(G, 'coordenadas_camino'):
+            return G.coordenadas_camino(ruta_nodos)
         coordenadas = []
         for nodo in ruta_nodos:
             lat, lon = coordenadas_nodo(G, nodo)
@@ -107,4 +118,34 @@ def obtener_bounds_ruta(coordenadas):
         'max_lat': max(lats),
         'min_lon': min(lons),
         'max_lon': max(lons)
-    }
\ No newline at end of file
+    }
+
+def version_grafo(G):
+    """
+    Calcula un hash del contenido del grafo de ruteo (nodos, aristas y pesos,
+    incluidas las velocidades de VELOCIDADES_VIA). Se guarda en G.graph.
+    """
+    if 'version' in G.graph:
+        return G.graph['version']
+    
+    csr = obtener_grafo_csr(G)
+    if 'version' not in csr.graph:
+        h = hashlib.sha1()
+        for arreglo in (csr.nodos_osm, csr.desplazamientos, csr.destinos,
+                        csr.pesos['length'], csr.pesos['travel_time']):
+            h.update(np.ascontiguousarray(arreglo).tobytes())
+        csr.graph['version'] = h.hexdigest()
+    
+    G.graph['version'] = csr.graph['version']
+    return G.graph['version']
+
+def ruta_tabla_grafo(G, sufijo):
+    """
+    Devuelve la ruta de un archivo auxiliar guardado junto al .graphml del grafo,
+    p. ej. 'datos/puno.graphml' → 'datos/puno_<sufijo>'. None si el grafo no tiene archivo.
+    """
+    ruta_archivo = G.graph.get('ruta_archivo')
+    if not ruta_archivo:
+        return None
+    base, _ = os.path.splitext(ruta_archivo)
+    return f"{base}_{sufijo}"
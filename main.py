@@ -5,12 +5,17 @@ Autor: Sistema de Navegación Médica
 Descripción: Encuentra las rutas más cortas a hospitales usando datos de OpenStreetMap
 """
 
+import time
+
+# Referencia para los tiempos de arranque en frío
+INICIO = time.perf_counter()
+
 import sys
 import os
+from importlib.util import find_spec
 from PyQt5.QtWidgets import QApplication, QMessageBox, QSplashScreen
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QPixmap, QFont
-from grafo import ubicacion_web
 
 
 # Agregar el directorio actual al path para imports
@@ -45,7 +50,8 @@ class SplashScreen(QSplashScreen):
 
 def verificar_dependencias():
     """
-    Verifica que todas las dependencias estén instaladas
+    Verifica que todas las dependencias estén instaladas sin importarlas
+    (osmnx y shapely se importan recién cuando se usan)
     """
     dependencias_requeridas = [
         'osmnx',
@@ -58,9 +64,7 @@ def verificar_dependencias():
     dependencias_faltantes = []
     
     for dep in dependencias_requeridas:
-        try:
-            __import__(dep)
-        except ImportError:
+        if find_spec(dep) is None:
             dependencias_faltantes.append(dep)
     
     if dependencias_faltantes:
@@ -88,6 +92,10 @@ def verificar_configuracion():
     
     return True, "Configuración válida"
 
+def iniciar_servicio_ubicacion():
+    from grafo import ubicacion_web
+    ubicacion_web.iniciar_servidor()
+
 def main():
     """
     Función principal de la aplicación
@@ -135,15 +143,17 @@ def main():
                           Qt.AlignCenter | Qt.AlignBottom, 
                           Qt.black)
         app.processEvents()
-        # Iniciar el servidor Flask que recibirá la ubicación desde navegador
-        splash.showMessage("Iniciando servicio de ubicación...", Qt.AlignCenter | Qt.AlignBottom, Qt.black)
-        ubicacion_web.iniciar_servidor()
         
-        ventana = VentanaPrincipal()
+        # La ventana se muestra de inmediato; el grafo de la ciudad por defecto
+        # se precarga en segundo plano (ver VentanaPrincipal.precargar_ciudad_default)
+        ventana = VentanaPrincipal(INICIO)
+        ventana.show()
+        splash.finish(ventana)
+        print(f"⏱️ Ventana visible en {time.perf_counter() - INICIO:.2f} s")
         
-        # Cerrar pantalla de carga después de un breve delay
-        QTimer.singleShot(2000, splash.close)
-        QTimer.singleShot(2000, ventana.show)
+        # Iniciar el servidor Flask que recibirá la ubicación desde navegador,
+        # después de mostrar la ventana para no retrasarla
+        QTimer.singleShot(0, iniciar_servicio_ubicacion)
         
         # Ejecutar aplicación
         return app.exec_()
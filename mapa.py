@@ -3,103 +3,143 @@ import json
 import os
 from config import MAPBOX_API_KEY, COLORES, MAPA_CONFIG
 from grafo.utilidades import obtener_ruta_coordenadas, coordenadas_nodo, obtener_bounds_ruta
+from grafo.geometria import geometria_compacta, metros_por_pixel
+from grafo import metricas
 
-def generar_mapa_html(G, nodo_origen, resultado_rutas, nombre_archivo='templates/mapa.html'):
+def datos_mapa(G, nodo_origen, resultado_rutas, isocronas=None):
     """
-    Genera un archivo HTML con el mapa de rutas usando Mapbox GL JS
+    Prepara los datos que dibuja la página del mapa: rutas (con geometría
+    compacta), marcadores, isócronas, estadísticas, centro y límites.
+    Es lo que recibe la función actualizarMapa() de la página.
     """
-    try:
-        # Obtener coordenadas del origen
-        lat_origen, lon_origen = coordenadas_nodo(G, nodo_origen)
-        
-        # Preparar datos para el mapa
-        rutas_geojson = []
-        marcadores = []
-        
-        # Agregar marcador de origen
-        marcadores.append({
-            'coordinates': [lon_origen, lat_origen],
-            'title': 'Punto de Origen',
-            'color': COLORES['marcador_origen']
-        })
+    # Obtener coordenadas del origen
+    lat_origen, lon_origen = coordenadas_nodo(G, nodo_origen)
+    
+    # Preparar datos para el mapa
+    rutas_geojson = []
+    marcadores = []
+    
+    # Agregar marcador de origen
+    marcadores.append({
+        'coordinates': [lon_origen, lat_origen],
+        'title': 'Punto de Origen',
+        'color': COLORES['marcador_origen']
+    })
+    
+    # Procesar rutas
+    destino_mas_cercano = resultado_rutas.get('destino_mas_cercano')
+    caminos = []
+    
+    for nodo_destino, ruta_info in resultado_rutas['rutas'].items():
+        hospital_info = resultado_rutas['hospitales_info'][nodo_destino]
+        caminos.append(ruta_info['camino'])
         
-        # Procesar rutas
-        destino_mas_cercano = resultado_rutas.get('destino_mas_cercano')
+        # Determinar color de la ruta
+        color = COLORES['ruta_mas_corta'] if nodo_destino == destino_mas_cercano else COLORES['ruta_normal']
         
-        for nodo_destino, ruta_info in resultado_rutas['rutas'].items():
-            hospital_info = resultado_rutas['hospitales_info'][nodo_destino]
-            
-            # Obtener coordenadas de la ruta
-            coordenadas_ruta = obtener_ruta_coordenadas(G, ruta_info['camino'])
-            
-            # Determinar color de la ruta
-            color = COLORES['ruta_mas_corta'] if nodo_destino == destino_mas_cercano else COLORES['ruta_normal']
-            
-            # Crear GeoJSON para la ruta
-            ruta_geojson = {
-                'type': 'Feature',
-                'properties': {
-                    'title': hospital_info['nombre'],
-                    'distance': ruta_info['longitud_formateada'],
-                    'time': ruta_info['tiempo_formateado'],
-                    'color': color,
-                    'is_shortest': nodo_destino == destino_mas_cercano
-                },
-                'geometry': {
-                    'type': 'LineString',
-                    'coordinates': coordenadas_ruta
-                }
-            }
-            rutas_geojson.append(ruta_geojson)
-            
-            # Agregar marcador del hospital
-            marcadores.append({
-                'coordinates': [hospital_info['lon'], hospital_info['lat']],
+        # Crear GeoJSON para la ruta
+        ruta_geojson = {
+            'type': 'Feature',
+            'properties': {
                 'title': hospital_info['nombre'],
-                'description': f"Distancia: {ruta_info['longitud_formateada']}<br>Tiempo: {ruta_info['tiempo_formateado']}",
-                'color': COLORES['marcador_destino'],
-                'is_closest': nodo_destino == destino_mas_cercano
-            })
+                'distance': ruta_info['longitud_formateada'],
+                'time': ruta_info['tiempo_formateado'],
+                'color': color,
+                'is_shortest': nodo_destino == destino_mas_cercano
+            },
+            # La geometría se reconstruye en la página a partir de los tramos codificados
+            'geometry': None
+        }
+        rutas_geojson.append(ruta_geojson)
         
-        # Calcular centro del mapa
-        todas_coordenadas = []
-        for ruta in rutas_geojson:
-            todas_coordenadas.extend(ruta['geometry']['coordinates'])
+        # Agregar marcador del hospital
+        marcadores.append({
+            'coordinates': [hospital_info['lon'], hospital_info['lat']],
+            'title': hospital_info['nombre'],
+            'description': f"Distancia: {ruta_info['longitud_formateada']}<br>Tiempo: {ruta_info['tiempo_formateado']}",
+            'color': COLORES['marcador_destino'],
+            'is_closest': nodo_destino == destino_mas_cercano
+        })
+    
+    # Calcular centro del mapa
+    todas_coordenadas = obtener_ruta_coordenadas(G, [nodo for camino in caminos for nodo in camino])
+    
+    limites = None
+    if todas_coordenadas:
+        bounds = obtener_bounds_ruta(todas_coordenadas)
+        centro_lat = (bounds['min_lat'] + bounds['max_lat']) / 2
+        centro_lon = (bounds['min_lon'] + bounds['max_lon']) / 2
+        limites = [[bounds['min_lon'], bounds['min_lat']], [bounds['max_lon'], bounds['max_lat']]]
+    else:
+        centro_lat = lat_origen
+        centro_lon = lon_origen
+    
+    # Tramos comunes una sola vez, simplificados a medio píxel del zoom de detalle
+    tolerancia = metros_por_pixel(MAPA_CONFIG['zoom_detalle'], centro_lat) / 2
+    geometria = geometria_compacta(G, caminos, tolerancia, MAPA_CONFIG['precision_polilinea'])
+    
+    return {
+        'rutas': rutas_geojson,
+        'geometria': geometria,
+        'marcadores': marcadores,
+        'isocronas': isocronas or {'type': 'FeatureCollection', 'features': []},
+        'estadisticas': resultado_rutas.get('estadisticas') or {},
+        'centro': [centro_lon, centro_lat],
+        'limites': limites
+    }
+
+def generar_mapa_html(G, nodo_origen, resultado_rutas, nombre_archivo='templates/mapa.html', isocronas=None):
+    """
+    Genera un archivo HTML con el mapa de rutas usando Mapbox GL JS.
+    isocronas: FeatureCollection de grafo.isocronas que se dibuja bajo las rutas
+    """
+    try:
+        datos = datos_mapa(G, nodo_origen, resultado_rutas, isocronas)
         
-        if todas_coordenadas:
-            bounds = obtener_bounds_ruta(todas_coordenadas)
-            centro_lat = (bounds['min_lat'] + bounds['max_lat']) / 2
-            centro_lon = (bounds['min_lon'] + bounds['max_lon']) / 2
-        else:
-            centro_lat = lat_origen
-            centro_lon = lon_origen
+        # Generar HTML y guardar archivo
+        with metricas.tramo('html'):
+            html_content = generar_html_template(datos)
+            os.makedirs(os.path.dirname(nombre_archivo), exist_ok=True)
+            with open(nombre_archivo, 'w', encoding='utf-8') as f:
+                f.write(html_content)
         
-        # Generar HTML
-        html_content = generar_html_template(
-            rutas_geojson, 
-            marcadores, 
-            centro_lat, 
-            centro_lon,
-            resultado_rutas.get('estadisticas', {})
-        )
+        print(f"Mapa generado: {nombre_archivo}")
+        return nombre_archivo
         
-        # Guardar archivo
+    except Exception as e:
+        print(f"Error generando mapa: {e}")
+        return None
+
+def generar_mapa_base(nombre_archivo='templates/mapa_app.html'):
+    """
+    Genera la página de mapa persistente de la ventana: se carga una sola vez
+    y luego recibe las rutas con actualizarMapa(datos) (ver datos_mapa)
+    """
+    try:
+        html_content = generar_html_template({
+            'rutas': [],
+            'geometria': None,
+            'marcadores': [],
+            'isocronas': {'type': 'FeatureCollection', 'features': []},
+            'estadisticas': {},
+            'centro': [MAPA_CONFIG['centro_lon'], MAPA_CONFIG['centro_lat']],
+            'limites': None
+        })
         os.makedirs(os.path.dirname(nombre_archivo), exist_ok=True)
         with open(nombre_archivo, 'w', encoding='utf-8') as f:
             f.write(html_content)
-        
-        print(f"Mapa generado: {nombre_archivo}")
         return nombre_archivo
-        
     except Exception as e:
-        print(f"Error generando mapa: {e}")
+        print(f"Error generando mapa base: {e}")
         return None
 
-def generar_html_template(rutas_geojson, marcadores, centro_lat, centro_lon, estadisticas):
+def generar_html_template(datos):
     """
-    Genera el contenido HTML del mapa
+    Genera el contenido HTML del mapa con los datos iniciales de datos_mapa.
+    La página expone actualizarMapa(datos, ajustarVista) para reemplazar rutas,
+    marcadores e isócronas sin recargarla.
     """
-    
+    centro_lon, centro_lat = datos['centro']
     
     html_template = f"""
 <!DOCTYPE html>
@@ -166,11 +206,7 @@ def generar_html_template(rutas_geojson, marcadores, centro_lat, centro_lon, est
         <div id='route-list'></div>
         <div style='margin-top: 10px; padding-top: 10px; border-top: 1px solid #ccc;'>
             <strong>Estadísticas:</strong><br>
-            <small>
-                Rutas calculadas: {estadisticas.get('total_rutas', 0)}<br>
-                Distancia mínima: {estadisticas.get('distancia_minima', 0):.0f}m<br>
-                Distancia máxima: {estadisticas.get('distancia_maxima', 0):.0f}m
-            </small>
+            <small id='estadisticas'></small>
         </div>
     </div>
     
@@ -203,23 +239,131 @@ def generar_html_template(rutas_geojson, marcadores, centro_lat, centro_lon, est
             zoom: {MAPA_CONFIG['zoom_inicial']}
         }});
 
+        // Decodifica una polilínea (algoritmo de Google) a [[lon, lat], ...]
+        function decodificarPolilinea(texto, precision) {{
+            const factor = Math.pow(10, precision);
+            const coordenadas = [];
+            let posicion = 0, lat = 0, lon = 0;
+            while (posicion < texto.length) {{
+                const valores = [0, 0];
+                for (let eje = 0; eje < 2; eje++) {{
+                    let resultado = 0, desplazamiento = 0, byte;
+                    do {{
+                        byte = texto.charCodeAt(posicion++) - 63;
+                        resultado += (byte & 0x1f) * Math.pow(2, desplazamiento);
+                        desplazamiento += 5;
+                    }} while (byte >= 0x20);
+                    valores[eje] = (resultado % 2) ? -(resultado + 1) / 2 : resultado / 2;
+                }}
+                lat += valores[0];
+                lon += valores[1];
+                coordenadas.push([lon / factor, lat / factor]);
+            }}
+            return coordenadas;
+        }}
         
-
+        // Arma la geometría de cada ruta uniendo sus tramos (los compartidos se decodifican una vez)
+        function armarGeometrias(rutas, geometria) {{
+            if (!geometria) return;
+            const tramos = geometria.tramos.map(t => decodificarPolilinea(t, geometria.precision));
+            rutas.forEach(function(ruta, i) {{
+                const coordenadas = [];
+                geometria.rutas[i].forEach(function(id, n) {{
+                    const tramo = tramos[id];
+                    for (let j = n ? 1 : 0; j < tramo.length; j++) coordenadas.push(tramo[j]);
+                }});
+                ruta.geometry = {{ 'type': 'LineString', 'coordinates': coordenadas }};
+            }});
+        }}
+        
+        function crearMarcador(marcador) {{
+            const el = document.createElement('div');
+            el.className = 'marker';
+            el.style.backgroundColor = marcador.color;
+            el.style.width = marcador.is_closest ? '15px' : '10px';
+            el.style.height = marcador.is_closest ? '15px' : '10px';
+            el.style.borderRadius = '50%';
+            el.style.border = '2px solid white';
+            el.style.boxShadow = '0 0 5px rgba(0,0,0,0.3)';
+            
+            const popup = new mapboxgl.Popup({{ offset: 25 }})
+                .setHTML(`<h3>${{marcador.title}}</h3>${{marcador.description || ''}}`);
+            
+            return new mapboxgl.Marker(el)
+                .setLngLat(marcador.coordinates)
+                .setPopup(popup)
+                .addTo(map);
+        }}
+        
+        function actualizarPanel(rutas, estadisticas) {{
+            const routeList = document.getElementById('route-list');
+            routeList.innerHTML = '';
+            rutas.forEach(function(ruta) {{
+                const routeDiv = document.createElement('div');
+                routeDiv.className = `route-info ${{ruta.properties.is_shortest ? 'shortest-route' : 'normal-route'}}`;
+                routeDiv.innerHTML = `
+                    <strong>${{ruta.properties.title}}</strong><br>
+                    <small>Distancia: ${{ruta.properties.distance}}</small><br>
+                    <small>Tiempo: ${{ruta.properties.time}}</small>
+                    ${{ruta.properties.is_shortest ? '<br><small><strong>★ MÁS CERCANO</strong></small>' : ''}}
+                `;
+                routeList.appendChild(routeDiv);
+            }});
+            
+            document.getElementById('estadisticas').innerHTML = `
+                Rutas calculadas: ${{estadisticas.total_rutas || 0}}<br>
+                Distancia mínima: ${{(estadisticas.distancia_minima || 0).toFixed(0)}}m<br>
+                Distancia máxima: ${{(estadisticas.distancia_maxima || 0).toFixed(0)}}m
+            `;
+        }}
+        
+        let mapaCargado = false;
+        let datosPendientes = null;
+        let marcadoresActivos = [];
+        
+        // Reemplaza rutas, marcadores, isócronas y panel sin recargar la página
+        function actualizarMapa(datos, ajustarVista) {{
+            if (!mapaCargado) {{
+                datosPendientes = [datos, ajustarVista];
+                return;
+            }}
+            armarGeometrias(datos.rutas, datos.geometria);
+            map.getSource('rutas').setData({{ 'type': 'FeatureCollection', 'features': datos.rutas }});
+            map.getSource('isocronas').setData(datos.isocronas);
+            
+            marcadoresActivos.forEach(m => m.remove());
+            marcadoresActivos = datos.marcadores.map(crearMarcador);
+            
+            actualizarPanel(datos.rutas, datos.estadisticas);
+            
+            if (ajustarVista && datos.limites) {{
+                map.fitBounds(datos.limites, {{ padding: 60, duration: 300 }});
+            }}
+        }}
         
         map.on('load', function() {{
-            // Agregar rutas
-            const rutasData = {json.dumps(rutas_geojson)};
-            const marcadoresData = {json.dumps(marcadores)};
+            // Isócronas de los hospitales (debajo de las rutas)
+            map.addSource('isocronas', {{
+                'type': 'geojson',
+                'data': {{ 'type': 'FeatureCollection', 'features': [] }}
+            }});
+            map.addLayer({{
+                'id': 'isocronas',
+                'type': 'fill',
+                'source': 'isocronas',
+                'paint': {{
+                    'fill-color': ['get', 'color'],
+                    'fill-opacity': 0.25,
+                    'fill-outline-color': ['get', 'color']
+                }}
+            }});
             
             // Agregar fuente de datos para rutas
             map.addSource('rutas', {{
                 'type': 'geojson',
-                'data': {{
-                    'type': 'FeatureCollection',
-                    'features': rutasData
-                }}
+                'tolerance': {MAPA_CONFIG['tolerancia_mapbox']},
+                'data': {{ 'type': 'FeatureCollection', 'features': [] }}
             }});
-        
             
             // Agregar capa de rutas
             map.addLayer({{
@@ -242,42 +386,6 @@ def generar_html_template(rutas_geojson, marcadores, centro_lat, centro_lon, est
                 }}
             }});
             
-            // Agregar marcadores
-            marcadoresData.forEach(function(marcador) {{
-                const el = document.createElement('div');
-                el.className = 'marker';
-                el.style.backgroundColor = marcador.color;
-                el.style.width = marcador.is_closest ? '15px' : '10px';
-                el.style.height = marcador.is_closest ? '15px' : '10px';
-                el.style.borderRadius = '50%';
-                el.style.border = '2px solid white';
-                el.style.boxShadow = '0 0 5px rgba(0,0,0,0.3)';
-                
-                const popup = new mapboxgl.Popup({{ offset: 25 }})
-                    .setHTML(`<h3>${{marcador.title}}</h3>${{marcador.description || ''}}`);
-                
-                new mapboxgl.Marker(el)
-                    .setLngLat(marcador.coordinates)
-                    .setPopup(popup)
-                    .addTo(map);
-            }});
-
-            
-            
-            // Agregar información de rutas al panel
-            const routeList = document.getElementById('route-list');
-            rutasData.forEach(function(ruta) {{
-                const routeDiv = document.createElement('div');
-                routeDiv.className = `route-info ${{ruta.properties.is_shortest ? 'shortest-route' : 'normal-route'}}`;
-                routeDiv.innerHTML = `
-                    <strong>${{ruta.properties.title}}</strong><br>
-                    <small>Distancia: ${{ruta.properties.distance}}</small><br>
-                    <small>Tiempo: ${{ruta.properties.time}}</small>
-                    ${{ruta.properties.is_shortest ? '<br><small><strong>★ MÁS CERCANO</strong></small>' : ''}}
-                `;
-                routeList.appendChild(routeDiv);
-            }});
-            
             // Popup para rutas
             map.on('click', 'rutas', function(e) {{
                 const properties = e.features[0].properties;
@@ -300,6 +408,13 @@ def generar_html_template(rutas_geojson, marcadores, centro_lat, centro_lon, est
             map.on('mouseleave', 'rutas', function() {{
                 map.getCanvas().style.cursor = '';
             }});
+            
+            mapaCargado = true;
+            if (datosPendientes) {{
+                actualizarMapa(...datosPendientes);
+            }} else {{
+                actualizarMapa({json.dumps(datos, separators=(',', ':'))}, false);
+            }}
         }});
     </script>
 </body>
@@ -0,0 +1,37 @@
+# tests/conftest.py
+import random
+import networkx as nx
+import pytest
+from grafo.utilidades import distancia_haversine
+
+def _rejilla(n=12, semilla=0, sentido_unico=0.0, aislados=0):
+    """
+    Rejilla n×n alrededor de Puno con longitudes algo mayores que la línea recta
+    y velocidades distintas por arista. sentido_unico: fracción de calles de un
+    solo sentido; aislados: nodos sueltos (sin aristas) al final
+    """
+    rng = random.Random(semilla)
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    for i in range(n):
+        for j in range(n):
+            G.add_node(i * n + j, y=-15.8 + i * 0.001 + rng.uniform(-2e-4, 2e-4),
+                       x=-70.0 + j * 0.001 + rng.uniform(-2e-4, 2e-4))
+    for i in range(n):
+        for j in range(n):
+            for vi, vj in ((i, j + 1), (i + 1, j)):
+                if vi >= n or vj >= n:
+                    continue
+                a, b = i * n + j, vi * n + vj
+                longitud = distancia_haversine(G.nodes[a]['y'], G.nodes[a]['x'],
+                                               G.nodes[b]['y'], G.nodes[b]['x']) * rng.uniform(1.0, 1.4)
+                velocidad = rng.choice([8.3, 13.9, 22.2])
+                sentidos = [(a, b)] if rng.random() < sentido_unico else [(a, b), (b, a)]
+                for u, v in sentidos:
+                    G.add_edge(u, v, length=longitud, travel_time=longitud / velocidad)
+    for k in range(aislados):
+        G.add_node(n * n + k, y=-15.9, x=-70.1 - k * 0.001)
+    return G
+
+@pytest.fixture
+def rejilla():
+    return _rejilla
@@ -0,0 +1,47 @@
+# tests/test_alternativas.py
+from itertools import islice
+import networkx as nx
+import pytest
+from grafo.grafo import GrafoDijkstra
+
+def _costo(G, camino, peso):
+    return sum(G[u][v][0][peso] for u, v in zip(camino, camino[1:]))
+
+@pytest.mark.parametrize('peso', ['length', 'travel_time'])
+def test_yen_coincide_con_networkx(rejilla, peso):
+    G = rejilla(7, semilla=5, sentido_unico=0.2)
+    motor = GrafoDijkstra(G, peso=peso)
+    simple = nx.DiGraph(G)
+    k = 6
+    for origen, destino in ((0, 48), (24, 6), (45, 3)):
+        esperados = [nx.path_weight(simple, camino, peso)
+                     for camino in islice(nx.shortest_simple_paths(simple, origen, destino, weight=peso), k)]
+        rutas = motor.rutas_alternativas(origen, [destino], k=k, metodo='yen')[destino]
+        caminos = [ruta['camino'] for ruta in rutas]
+        costos = [_costo(G, camino, peso) for camino in caminos]
+
+        assert [ruta['alternativa'] for ruta in rutas] == list(range(len(rutas)))
+        assert len({tuple(camino) for camino in caminos}) == len(caminos)
+        assert all(len(set(camino)) == len(camino) for camino in caminos)
+        assert all(camino[0] == origen and camino[-1] == destino for camino in caminos)
+        # Mismos costos en el mismo orden (con empates el camino puede ser otro)
+        assert costos == pytest.approx(esperados, rel=1e-5)
+
+def test_penalizacion_da_rutas_distintas_y_ordenadas(rejilla):
+    G = rejilla(8, semilla=2)
+    motor = GrafoDijkstra(G, peso='travel_time')
+    destinos = [63, 7, 56]
+    optimos = nx.single_source_dijkstra_path_length(G, 0, weight='travel_time')
+    alternativas = motor.rutas_alternativas(0, destinos, k=3, metodo='penalizacion', max_solape=0.8)
+    assert set(alternativas) == set(destinos)
+    for destino, rutas in alternativas.items():
+        caminos = [ruta['camino'] for ruta in rutas]
+        costos = [_costo(G, camino, 'travel_time') for camino in caminos]
+
+        assert 1 <= len(rutas) <= 3
+        assert [ruta['alternativa'] for ruta in rutas] == list(range(len(rutas)))
+        assert len({tuple(camino) for camino in caminos}) == len(caminos)
+        assert all(G.has_edge(u, v) for camino in caminos for u, v in zip(camino, camino[1:]))
+        assert costos == sorted(costos)
+        # La primera es la ruta óptima
+        assert costos[0] == pytest.approx(optimos[destino], rel=1e-5)
@@ -0,0 +1,81 @@
+# tests/test_cache_rutas.py
+import os
+import time
+from grafo.cache_rutas import CacheRutas
+
+VERSION = 'abcdef0123456789'
+
+def _rutas(destino=2, camino=(1, 5, 2)):
+    return {destino: {'camino': list(camino), 'longitud': 120.0, 'tiempo': 14.0}}
+
+def test_entradas_vencidas_no_se_devuelven(tmp_path):
+    cache = CacheRutas(4, ttl_segundos=0.1, directorio=str(tmp_path))
+    clave = CacheRutas.crear_clave(VERSION, 1, [2])
+    cache.guardar(clave, _rutas())
+    assert cache.obtener(clave) == _rutas()
+
+    time.sleep(0.15)
+    assert cache.obtener(clave) is None
+    # El archivo vencido se borra al encontrarlo
+    assert not list(tmp_path.glob('*.json'))
+
+def test_lectura_de_disco_conserva_la_fecha_original(tmp_path):
+    clave = CacheRutas.crear_clave(VERSION, 1, [2])
+    CacheRutas(4, ttl_segundos=0.3, directorio=str(tmp_path)).guardar(clave, _rutas())
+    time.sleep(0.2)
+
+    # Otra instancia (como tras un reinicio) la lee de disco
+    cache = CacheRutas(4, ttl_segundos=0.3, directorio=str(tmp_path))
+    assert cache.obtener(clave) == _rutas()
+    assert cache.aciertos_disco == 1
+    time.sleep(0.15)
+    # Leerla no extendió su TTL: venció a los 0.3 s de guardarse
+    assert cache.obtener(clave) is None
+
+def test_obtener_devuelve_copias():
+    cache = CacheRutas(4)
+    clave = CacheRutas.crear_clave(VERSION, 1, [2])
+    original = _rutas()
+    cache.guardar(clave, original)
+    original[2]['camino'].append(99)
+
+    rutas = cache.obtener(clave)
+    assert rutas == _rutas()
+    rutas[2]['camino'].append(99)
+    rutas[2]['tiempo'] = 0.0
+    rutas[3] = {}
+    assert cache.obtener(clave) == _rutas()
+
+def test_podar_disco_respeta_la_capacidad(tmp_path):
+    cache = CacheRutas(4, directorio=str(tmp_path), capacidad_disco=5)
+    claves = [CacheRutas.crear_clave(VERSION, origen, [2]) for origen in range(12)]
+    for segundos, clave in enumerate(claves):
+        cache.guardar(clave, _rutas())
+        os.utime(cache._archivo(clave), (1000 + segundos, 1000 + segundos))
+
+    assert cache._podar_disco() == 7
+    restantes = sorted(os.listdir(tmp_path))
+    assert restantes == sorted(os.path.basename(cache._archivo(clave)) for clave in claves[-5:])
+
+def test_invalidar_con_condicion(tmp_path):
+    cache = CacheRutas(8, directorio=str(tmp_path))
+    otra = 'fedcba9876543210'
+    por_arista = CacheRutas.crear_clave(VERSION, 1, [2])
+    sin_arista = CacheRutas.crear_clave(VERSION, 3, [2])
+    otra_version = CacheRutas.crear_clave(otra, 1, [2])
+    cache.guardar(por_arista, _rutas(camino=(1, 5, 2)))
+    cache.guardar(sin_arista, _rutas(camino=(3, 4, 2)))
+    cache.guardar(otra_version, _rutas(camino=(1, 5, 2)))
+
+    usa_arista = lambda _, rutas: any(5 in info['camino'] for info in rutas.values())
+    assert cache.invalidar(VERSION, usa_arista, disco=False) == 1
+    assert cache.obtener(sin_arista) is not None
+    assert cache.obtener(otra_version) is not None
+    # Sin disco la entrada se recupera del archivo
+    assert cache.obtener(por_arista) is not None
+
+    assert cache.invalidar(VERSION, usa_arista) == 1
+    assert cache.obtener(por_arista) is None
+    assert cache.obtener(sin_arista) is not None
+    # En disco se descarta la versión completa, no las demás
+    assert [p.name[:12] for p in tmp_path.glob('*.json')] == [otra[:12]]
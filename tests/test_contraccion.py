@@ -0,0 +1,26 @@
+# tests/test_contraccion.py
+import networkx as nx
+import pytest
+from grafo.grafo import GrafoDijkstra
+
+@pytest.mark.parametrize('peso', ['length', 'travel_time'])
+def test_rutas_ch_coinciden_con_networkx(rejilla, peso):
+    G = rejilla(9, semilla=3, sentido_unico=0.35, aislados=2)
+    motor = GrafoDijkstra(G, motor='ch', peso=peso)
+    criterio = 'longitud' if peso == 'length' else 'tiempo'
+    destinos = list(G.nodes)
+    inalcanzables = 0
+    for origen in (0, 40, 80):
+        reales = nx.single_source_dijkstra_path_length(G, origen, weight=peso)
+        rutas = motor.rutas_dijkstra(origen, destinos)
+        for destino in destinos:
+            if destino not in reales:
+                assert destino not in rutas
+                inalcanzables += 1
+                continue
+            ruta = rutas[destino]
+            assert ruta[criterio] == pytest.approx(reales[destino], rel=1e-5)
+            assert ruta['camino'][0] == origen and ruta['camino'][-1] == destino
+            assert all(G.has_edge(u, v) for u, v in zip(ruta['camino'], ruta['camino'][1:]))
+    # Los nodos aislados (y lo que el sentido único deje fuera) no tienen ruta
+    assert inalcanzables >= 6
@@ -0,0 +1,22 @@
+# tests/test_heuristicas.py
+import networkx as nx
+import pytest
+from grafo.csr import obtener_grafo_csr
+from grafo.heuristicas import construir_landmarks, cota_haversine
+
+@pytest.mark.parametrize('peso', ['length', 'travel_time'])
+def test_cotas_no_superan_la_distancia_real(rejilla, peso):
+    G = rejilla(10, sentido_unico=0.2)
+    csr = obtener_grafo_csr(G)
+    landmarks = construir_landmarks(G, peso, cantidad=4)
+    for destino in (0, 55, 99):
+        t = csr.indice[destino]
+        cota_alt = landmarks.cota(t)
+        cota_recta = cota_haversine(csr, t, peso)
+        reales = nx.single_source_dijkstra_path_length(G.reverse(copy=False), destino, weight=peso)
+        for nodo, real in reales.items():
+            i = csr.indice[nodo]
+            assert cota_alt(i) <= real
+            assert cota_recta(i) <= real
+        # En el propio destino la cota es exactamente 0
+        assert cota_alt(t) == 0.0
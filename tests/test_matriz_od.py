@@ -0,0 +1,48 @@
+# tests/test_matriz_od.py
+import math
+from concurrent.futures import ThreadPoolExecutor
+import networkx as nx
+from grafo.cache_rutas import CacheRutas
+from grafo.grafo import GrafoDijkstra
+from grafo.matriz_od import matriz_od
+from grafo.restricciones import CapaRestricciones
+
+def _rejilla(n=30):
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    for i in range(n):
+        for j in range(n):
+            G.add_node(i * n + j, y=-15.8 + i * 0.001, x=-70.0 + j * 0.001)
+    for i in range(n):
+        for j in range(n):
+            for vecino in ((i, j + 1), (i + 1, j)):
+                if vecino[0] < n and vecino[1] < n:
+                    a, b = i * n + j, vecino[0] * n + vecino[1]
+                    for u, v in ((a, b), (b, a)):
+                        G.add_edge(u, v, length=100.0, travel_time=10.0)
+    return G
+
+def test_cierre_cambia_la_matriz():
+    G = _rejilla()
+    origen, destino = 0, 29
+    antes = matriz_od(G, [origen], [destino], 'travel_time', procesos=1)['tiempo'][0, 0]
+
+    camino = GrafoDijkstra(G, peso='travel_time').rutas_dijkstra(origen, [destino])[destino]['camino']
+    capa = CapaRestricciones(G, CacheRutas(16))
+    capa.cerrar([(camino[0], camino[1])])
+
+    esperado = GrafoDijkstra(G, peso='travel_time').rutas_dijkstra(origen, [destino])[destino]['tiempo']
+    for procesos in (1, 2):
+        despues = matriz_od(G, [origen], [destino], 'travel_time', procesos=procesos)['tiempo'][0, 0]
+        assert despues > antes
+        assert math.isclose(despues, esperado)
+
+def test_matrices_concurrentes_no_se_mezclan(rejilla):
+    G = rejilla(12)
+    origenes, destinos = list(range(0, 144, 7)), [11, 132, 143]
+    esperadas = {peso: matriz_od(G, origenes, destinos, peso, procesos=1)['tiempo']
+                 for peso in ('length', 'travel_time')}
+    with ThreadPoolExecutor(4) as hilos:
+        futuros = [(peso, hilos.submit(matriz_od, G, origenes, destinos, peso, procesos=1, tamano_bloque=2))
+                   for peso in ('length', 'travel_time') * 4]
+        for peso, futuro in futuros:
+            assert (futuro.result()['tiempo'] == esperadas[peso]).all()
@@ -0,0 +1,54 @@
+# tests/test_planificador.py
+import threading
+import time
+import pytest
+
+QtCore = pytest.importorskip('PyQt5.QtCore')
+from ui.planificador import PlanificadorTrabajos, CALCULAR_RUTAS, PRECALENTAR
+
+@pytest.fixture
+def aplicacion():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+def _esperar(aplicacion, condicion, limite=5.0):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "el planificador no terminó a tiempo"
+        aplicacion.processEvents()
+        time.sleep(0.01)
+
+def _bloquear(liberar):
+    def trabajo(contexto):
+        while not liberar.wait(0.01):
+            contexto.verificar()
+        return 'bloqueo'
+    return trabajo
+
+def test_misma_clave_solo_entrega_el_ultimo(aplicacion):
+    planificador = PlanificadorTrabajos(trabajadores=1)
+    liberar = threading.Event()
+    entregados = []
+    planificador.enviar(PRECALENTAR, _bloquear(liberar), clave='bloqueo')
+    for valor in range(3):
+        planificador.enviar(CALCULAR_RUTAS, lambda contexto, v: v, valor,
+                            al_terminar=entregados.append, clave='rutas')
+    liberar.set()
+    _esperar(aplicacion, lambda: not planificador.ocupado())
+
+    assert entregados == [2]
+    estados = [estado for tipo, _, _, estado in planificador.historial if tipo == CALCULAR_RUTAS]
+    assert sorted(estados) == ['cancelado', 'cancelado', 'terminado']
+    planificador.cerrar()
+
+def test_rutas_no_esperan_a_trabajos_de_fondo(aplicacion):
+    planificador = PlanificadorTrabajos(trabajadores=2)
+    liberar = threading.Event()
+    entregados = []
+    # Dos trabajos largos de fondo: con un hilo reservado, ninguno bloquea las rutas
+    planificador.enviar(PRECALENTAR, _bloquear(liberar), clave='fondo-1')
+    planificador.enviar(PRECALENTAR, _bloquear(liberar), clave='fondo-2')
+    planificador.enviar(CALCULAR_RUTAS, lambda contexto: 'rutas', al_terminar=entregados.append, clave='rutas')
+    _esperar(aplicacion, lambda: entregados == ['rutas'])
+    liberar.set()
+    _esperar(aplicacion, lambda: not planificador.ocupado())
+    planificador.cerrar()
@@ -0,0 +1,36 @@
+# tests/test_registro_ciudades.py
+from grafo.contraccion import obtener_jerarquia
+from grafo.heuristicas import obtener_landmarks
+from grafo.osm_datos import archivo_grafo_ciudad, ruta_snapshot_ciudad
+from grafo.registro_ciudades import RegistroCiudades, estimar_memoria, estimar_memoria_ciudad
+from grafo.snapshot import guardar_snapshot
+
+def test_estimacion_incluye_tablas_precalculadas(rejilla):
+    G = rejilla(10)
+    base = estimar_memoria(G)
+    obtener_jerarquia(G, 'travel_time')
+    con_jerarquia = estimar_memoria(G)
+    obtener_landmarks(G, 'travel_time')
+    assert base < con_jerarquia < estimar_memoria(G)
+
+def test_precalentar_descarta_por_snapshot_antes_de_cargar(rejilla, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ciudad = 'Grande, Peru'
+    (tmp_path / 'datos').mkdir()
+    origen = archivo_grafo_ciudad(ciudad)
+    with open(origen, 'w') as f:
+        f.write('<graphml/>')
+    assert guardar_snapshot(rejilla(20), ruta_snapshot_ciudad(ciudad), origen)
+    tamano = estimar_memoria_ciudad(ciudad)
+    assert tamano > 0
+
+    cargadas = []
+    registro = RegistroCiudades(presupuesto_mb=tamano / 2 / 2**20,
+                                cargar=lambda c, progreso: cargadas.append(c))
+    assert registro.precalentar([ciudad]) == []
+    assert cargadas == []
+
+    registro = RegistroCiudades(presupuesto_mb=tamano * 2 / 2**20,
+                                cargar=lambda c, progreso: cargadas.append(c))
+    registro.precalentar([ciudad])
+    assert cargadas == [ciudad]
@@ -0,0 +1,27 @@
+# tests/test_restricciones.py
+import time
+from grafo.cache_rutas import CacheRutas
+from grafo.grafo import GrafoDijkstra
+from grafo.restricciones import CapaRestricciones
+
+def test_cierre_cambia_la_ruta_y_al_vencer_se_restablece(rejilla, tmp_path):
+    G = rejilla(10)
+    cache = CacheRutas(64, directorio=str(tmp_path))
+    capa = CapaRestricciones(G, cache)
+    origen, destino = 0, 99
+
+    antes = GrafoDijkstra(G, cache=cache).rutas_dijkstra(origen, [destino])[destino]
+    assert list(tmp_path.iterdir())
+    u, v = antes['camino'][3], antes['camino'][4]
+    capa.cerrar([(u, v)], duracion=0.3)
+    # La versión afectada se descarta del disco sin abrir los archivos
+    assert not list(tmp_path.glob('*.json'))
+
+    cerrada = GrafoDijkstra(G, cache=cache).rutas_dijkstra(origen, [destino])[destino]
+    assert (u, v) not in zip(cerrada['camino'], cerrada['camino'][1:])
+    assert cerrada['tiempo'] > antes['tiempo']
+
+    time.sleep(0.35)
+    despues = GrafoDijkstra(G, cache=cache).rutas_dijkstra(origen, [destino])[destino]
+    assert despues['camino'] == antes['camino']
+    assert despues['tiempo'] == antes['tiempo']
@@ -0,0 +1,37 @@
+# tests/test_servicio.py
+import pytest
+from config import SERVICIO
+from grafo import ubicacion_web
+
+@pytest.fixture
+def cliente(rejilla, monkeypatch):
+    G = rejilla(8)
+    hospitales = [{'nombre': f"H{n}", 'lat': G.nodes[n]['y'], 'lon': G.nodes[n]['x']} for n in (7, 56, 63)]
+    monkeypatch.setattr(ubicacion_web, 'servicio', {'G': G, 'hospitales': hospitales, 'peso': 'travel_time'})
+    return ubicacion_web.app.test_client()
+
+def _rutas(cliente, **datos):
+    return cliente.post('/rutas', json={'lat': -15.8, 'lon': -70.0, 'geometria': False, **datos})
+
+@pytest.mark.parametrize('datos', [
+    {'alternativas': 'x'},
+    {'alternativas': 0},
+    {'hospitales': 'H7'},
+    {'hospitales': [['H7']]},
+])
+def test_rutas_rechaza_parametros_invalidos(cliente, datos):
+    assert _rutas(cliente, **datos).status_code == 400
+
+def test_rutas_limita_alternativas(cliente):
+    respuesta = _rutas(cliente, alternativas=1000, hospitales=['H63'])
+    assert respuesta.status_code == 200
+    assert 1 < len(respuesta.get_json()['features']) <= SERVICIO['max_alternativas']
+
+def test_sin_modo_servicio_solo_se_guarda_la_ubicacion(monkeypatch, capsys):
+    monkeypatch.setattr(ubicacion_web, 'servicio', {})
+    monkeypatch.setattr(ubicacion_web, '_ubicacion', {})
+    cliente = ubicacion_web.app.test_client()
+    assert cliente.post('/ubicacion', json={'lat': -15.84, 'lon': -70.02}).status_code == 200
+    assert cliente.get('/ubicacion').get_json() == {'lat': -15.84, 'lon': -70.02}
+    assert cliente.get('/ubicacion/stream').status_code == 503
+    assert 'Ubicación' not in capsys.readouterr().out
@@ -0,0 +1,54 @@
+# tests/test_snapshot.py
+import json
+import os
+import pytest
+from grafo import snapshot
+from grafo.csr import GrafoCSR
+from grafo.grafo import GrafoDijkstra
+from grafo.snapshot import cargar_snapshot, guardar_snapshot
+
+@pytest.fixture
+def guardado(rejilla, tmp_path):
+    G = rejilla(8, sentido_unico=0.2)
+    origen = tmp_path / 'ciudad.graphml'
+    origen.write_text('<graphml/>')
+    directorio = str(tmp_path / 'ciudad.snapshot')
+    assert guardar_snapshot(G, directorio, str(origen))
+    return G, directorio, origen
+
+def _meta(directorio):
+    with open(os.path.join(directorio, 'meta.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+def test_snapshot_se_rutea_sin_networkx(guardado):
+    G, directorio, origen = guardado
+    csr = cargar_snapshot(directorio, str(origen))
+    assert isinstance(csr, GrafoCSR)
+    assert csr.graph['crs'] == 'epsg:4326'
+    esperadas = GrafoDijkstra(G).rutas_dijkstra(0, [63, 7])
+    assert GrafoDijkstra(csr).rutas_dijkstra(0, [63, 7]) == esperadas
+
+def test_origen_sin_cambios_no_se_lee(guardado, monkeypatch):
+    _, directorio, origen = guardado
+    monkeypatch.setattr(snapshot, 'hash_archivo', lambda ruta: pytest.fail("no debe leer el .graphml"))
+    assert cargar_snapshot(directorio, str(origen)) is not None
+
+def test_mismo_contenido_con_otra_fecha_actualiza_la_firma(guardado):
+    _, directorio, origen = guardado
+    os.utime(origen, (1000, 1000))
+    assert cargar_snapshot(directorio, str(origen)) is not None
+    assert _meta(directorio)['origen']['modificado'] == os.stat(origen).st_mtime_ns
+
+def test_origen_modificado_invalida(guardado):
+    _, directorio, origen = guardado
+    origen.write_text('<graphml>otro</graphml>')
+    assert cargar_snapshot(directorio, str(origen)) is None
+
+@pytest.mark.parametrize('campo, valor', [('version_grafo', 'otra'), ('formato', 1)])
+def test_version_o_formato_distintos_se_rechazan(guardado, campo, valor):
+    _, directorio, origen = guardado
+    meta = _meta(directorio)
+    meta[campo] = valor
+    with open(os.path.join(directorio, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    assert cargar_snapshot(directorio, str(origen)) is None
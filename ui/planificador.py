@@ -0,0 +1,275 @@
+# ui/planificador.py
+"""
+Planificador de trabajos en segundo plano para la interfaz.
+Un grupo fijo de hilos atiende una cola de trabajos tipados, por prioridad;
+cada trabajo puede cancelarse de forma cooperativa y un trabajo nuevo con la
+misma clave reemplaza al anterior (solo interesa el último cálculo de rutas,
+por ejemplo). Con más de un hilo, uno queda reservado para los trabajos
+interactivos: cargar una ciudad o precalentar otras nunca deja esperando al
+cálculo de rutas. Los resultados se entregan en el hilo de la interfaz
+mediante señales.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from PyQt5.QtCore import QObject, pyqtSignal
+from grafo import metricas
+
+# Tipos de trabajo
+CARGAR_GRAFO = 'cargar_grafo'
+CARGAR_HOSPITALES = 'cargar_hospitales'
+CALCULAR_RUTAS = 'calcular_rutas'
+RENDERIZAR = 'renderizar'
+PRECARGAR = 'precargar'
+PRECALENTAR = 'precalentar'
+
+# Menor número = antes. Los de prioridad 0 son interactivos y pueden usar el hilo reservado
+PRIORIDADES = {
+    CALCULAR_RUTAS: 0,
+    RENDERIZAR: 0,
+    CARGAR_GRAFO: 1,
+    CARGAR_HOSPITALES: 1,
+    PRECARGAR: 1,
+    PRECALENTAR: 2
+}
+PRIORIDAD_INTERACTIVA = 0
+
+class TrabajoCancelado(Exception):
+    """
+    Se lanza dentro de un trabajo que fue cancelado o reemplazado por otro más nuevo
+    """
+
+class Trabajo:
+    """
+    Unidad de trabajo: función a ejecutar, callbacks y tiempos
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, tipo, funcion, args, al_terminar=None, al_fallar=None, clave=None, visible=True):
+        self.id = next(Trabajo._ids)
+        self.tipo = tipo
+        self.clave = clave or tipo
+        self.funcion = funcion
+        self.args = args
+        self.al_terminar = al_terminar
+        self.al_fallar = al_fallar
+        self.visible = visible
+        self.prioridad = PRIORIDADES.get(tipo, PRIORIDAD_INTERACTIVA + 1)
+        self.creado = time.perf_counter()
+        self.inicio = None
+        self.fin = None
+        self._cancelado = threading.Event()
+
+    def cancelar(self):
+        self._cancelado.set()
+
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    @property
+    def espera(self):
+        """
+        Segundos en la cola antes de empezar
+        """
+        return (self.inicio or time.perf_counter()) - self.creado
+
+    @property
+    def duracion(self):
+        """
+        Segundos de ejecución (0 si no llegó a empezar)
+        """
+        if self.inicio is None:
+            return 0.0
+        return (self.fin or time.perf_counter()) - self.inicio
+
+class ContextoTrabajo:
+    """
+    Lo que recibe la función de un trabajo para informar progreso y
+    comprobar si debe abandonar
+    """
+    def __init__(self, planificador, trabajo):
+        self._planificador = planificador
+        self.trabajo = trabajo
+
+    @property
+    def cancelado(self):
+        return self.trabajo.cancelado
+
+    def verificar(self):
+        """
+        Lanza TrabajoCancelado si el trabajo ya no interesa
+        """
+        if self.trabajo.cancelado:
+            raise TrabajoCancelado()
+
+    def progreso(self, mensaje, fraccion=None):
+        """
+        Informa el avance (fraccion entre 0 y 1, o None si es indeterminado).
+        Es también un punto de cancelación.
+        """
+        self.verificar()
+        self._planificador.progreso.emit(self.trabajo, mensaje, fraccion)
+
+class PlanificadorTrabajos(QObject):
+    """
+    Cola de trabajos con un número acotado de hilos.
+    enviar() devuelve el Trabajo; al_terminar/al_fallar se llaman en el hilo de la interfaz.
+    Si hay más de un trabajador, el primero solo toma trabajos interactivos.
+    """
+    progreso = pyqtSignal(object, str, object)
+    actividad = pyqtSignal(int)
+    _terminado = pyqtSignal(object, object)
+    _fallido = pyqtSignal(object, str)
+
+    def __init__(self, trabajadores=2, parent=None):
+        super().__init__(parent)
+        # Heap de (prioridad, id, trabajo): a igual prioridad, en orden de llegada
+        self._pendientes = []
+        self._cerrado = False
+        self._lock = threading.Lock()
+        self._hay_trabajo = threading.Condition(self._lock)
+        self._vigentes = {}
+        self._activos = set()
+        self.historial = deque(maxlen=200)
+        self._terminado.connect(self._entregar)
+        self._fallido.connect(self._entregar_error)
+
+        # Hilos daemon: un trabajo que no puede interrumpirse (p. ej. una descarga)
+        # no impide cerrar la aplicación
+        self._hilos = [threading.Thread(target=self._trabajar, args=(i == 0 and trabajadores > 1,),
+                                        name=f"trabajador-{i}", daemon=True)
+                       for i in range(trabajadores)]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def enviar(self, tipo, funcion, *args, al_terminar=None, al_fallar=None, clave=None, reemplazar=True,
+               visible=True):
+        """
+        Encola funcion(contexto, *args). Con reemplazar=True se cancela el
+        trabajo anterior con la misma clave (por defecto, el tipo).
+        visible=False no cuenta el trabajo en la señal actividad (tareas de fondo).
+        """
+        trabajo = Trabajo(tipo, funcion, args, al_terminar, al_fallar, clave, visible)
+        with self._lock:
+            anterior = self._vigentes.get(trabajo.clave)
+            if reemplazar and anterior is not None:
+                anterior.cancelar()
+            self._vigentes[trabajo.clave] = trabajo
+            self._activos.add(trabajo)
+            activos = self._visibles()
+            heapq.heappush(self._pendientes, (trabajo.prioridad, trabajo.id, trabajo))
+            self._hay_trabajo.notify_all()
+        self.actividad.emit(activos)
+        return trabajo
+
+    def cancelar(self, clave=None):
+        """
+        Cancela los trabajos con esa clave (todos si es None)
+        """
+        with self._lock:
+            for trabajo in self._activos:
+                if clave is None or trabajo.clave == clave:
+                    trabajo.cancelar()
+
+    def cerrar(self):
+        """
+        Cancela todo y detiene los hilos en cuanto terminen lo que están haciendo
+        """
+        self.cancelar()
+        with self._lock:
+            self._cerrado = True
+            self._hay_trabajo.notify_all()
+
+    def _visibles(self):
+        return sum(1 for trabajo in self._activos if trabajo.visible)
+
+    def ocupado(self):
+        with self._lock:
+            return bool(self._activos)
+
+    def estadisticas(self):
+        """
+        Tiempo medio de espera y de ejecución por tipo de trabajo
+        """
+        resumen = {}
+        for tipo, espera, duracion, estado in self.historial:
+            datos = resumen.setdefault(tipo, {'total': 0, 'cancelados': 0, 'espera': 0.0, 'duracion': 0.0})
+            datos['total'] += 1
+            datos['cancelados'] += estado == 'cancelado'
+            datos['espera'] += espera
+            datos['duracion'] += duracion
+        for datos in resumen.values():
+            datos['espera'] /= datos['total']
+            datos['duracion'] /= datos['total']
+        return resumen
+
+    def _siguiente(self, reservado):
+        """
+        Espera y saca el próximo trabajo; el hilo reservado solo toma interactivos.
+        None al cerrar el planificador.
+        """
+        with self._lock:
+            while True:
+                if self._cerrado:
+                    return None
+                if self._pendientes and (not reservado or
+                                         self._pendientes[0][0] <= PRIORIDAD_INTERACTIVA):
+                    return heapq.heappop(self._pendientes)[2]
+                self._hay_trabajo.wait()
+
+    def _trabajar(self, reservado=False):
+        while True:
+            trabajo = self._siguiente(reservado)
+            if trabajo is None:
+                return
+            if trabajo.cancelado:
+                self._finalizar(trabajo, 'cancelado')
+                continue
+
+            trabajo.inicio = time.perf_counter()
+            try:
+                resultado = trabajo.funcion(ContextoTrabajo(self, trabajo), *trabajo.args)
+            except TrabajoCancelado:
+                trabajo.fin = time.perf_counter()
+                self._finalizar(trabajo, 'cancelado')
+                continue
+            except Exception as e:
+                trabajo.fin = time.perf_counter()
+                self._fallido.emit(trabajo, str(e))
+                continue
+            trabajo.fin = time.perf_counter()
+            self._terminado.emit(trabajo, resultado)
+
+    def _finalizar(self, trabajo, estado):
+        with self._lock:
+            self._activos.discard(trabajo)
+            if self._vigentes.get(trabajo.clave) is trabajo:
+                del self._vigentes[trabajo.clave]
+            activos = self._visibles()
+        self.historial.append((trabajo.tipo, trabajo.espera, trabajo.duracion, estado))
+        metricas.incrementar('trabajos_total', tipo=trabajo.tipo, estado=estado)
+        if trabajo.inicio is not None:
+            metricas.observar('trabajo_segundos', trabajo.duracion, tipo=trabajo.tipo, estado=estado)
+        print(f"⏱️ {trabajo.tipo} #{trabajo.id} {estado}: {trabajo.duracion:.3f} s "
+              f"(espera {trabajo.espera:.3f} s)")
+        self.actividad.emit(activos)
+
+    def _entregar(self, trabajo, resultado):
+        # Un resultado reemplazado mientras se calculaba ya no se muestra
+        if trabajo.cancelado:
+            self._finalizar(trabajo, 'cancelado')
+            return
+        self._finalizar(trabajo, 'terminado')
+        if trabajo.al_terminar is not None:
+            trabajo.al_terminar(resultado)
+
+    def _entregar_error(self, trabajo, mensaje):
+        if trabajo.cancelado:
+            self._finalizar(trabajo, 'cancelado')
+            return
+        self._finalizar(trabajo, 'fallido')
+        if trabajo.al_fallar is not None:
+            trabajo.al_fallar(mensaje)
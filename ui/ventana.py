@@ -1,70 +1,76 @@
 # ui/ventana.py
 import sys
 import os
+import json
+import time
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QComboBox, QListWidget, QPushButton, QLabel, 
                              QTextEdit, QSplitter, QProgressBar, QMessageBox,
                              QGroupBox, QGridLayout, QListWidgetItem)
 from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QThread, pyqtSignal, QUrl, Qt
+from PyQt5.QtCore import QUrl, Qt
 from PyQt5.QtGui import QFont, QPixmap, QIcon
 
 # Imports del proyecto
-from config import CIUDAD_DEFAULT
-from grafo.osm_datos import (obtener_grafo_ciudad, obtener_hospitales, 
-                            guardar_hospitales, cargar_hospitales, 
-                            obtener_nodos_principales)
+from config import CIUDAD_DEFAULT, PESO_RUTEO
+from grafo.osm_datos import obtener_hospitales, guardar_hospitales, cargar_hospitales
+from grafo.registro_ciudades import registro_ciudades, ciudades_probables
 from grafo.grafo import procesar_rutas_hospitales
-from grafo.utilidades import nodo_mas_cercano, coordenadas_nodo
-from mapa import generar_mapa_html, generar_mapa_simple
+from mapa import generar_mapa_base, datos_mapa
+from grafo import metricas
+from ui.planificador import (PlanificadorTrabajos, CARGAR_GRAFO, CARGAR_HOSPITALES,
+                             CALCULAR_RUTAS, RENDERIZAR, PRECARGAR, PRECALENTAR)
 
-class WorkerThread(QThread):
-    """
-    Hilo de trabajo para operaciones pesadas
-    """
-    finished = pyqtSignal(object)
-    error = pyqtSignal(str)
-    progress = pyqtSignal(str)
-    
-    def __init__(self, task, *args, **kwargs):
-        super().__init__()
-        self.task = task
-        self.args = args
-        self.kwargs = kwargs
-    
-    def run(self):
-        try:
-            if self.task == 'cargar_grafo':
-                self.progress.emit("Descargando grafo de la ciudad...")
-                ciudad = self.args[0]
-                grafo = obtener_grafo_ciudad(ciudad)
-                self.finished.emit(grafo)
-                
-            elif self.task == 'cargar_hospitales':
-                self.progress.emit("Buscando hospitales...")
-                ciudad = self.args[0]
-                hospitales = obtener_hospitales()
-                self.finished.emit(hospitales)
-                
-            elif self.task == 'calcular_rutas':
-                self.progress.emit("Calculando rutas más cortas...")
-                G, nodo_origen, hospitales = self.args
-                resultado = procesar_rutas_hospitales(G, nodo_origen, hospitales)
-                self.finished.emit(resultado)
-                
-        except Exception as e:
-            self.error.emit(str(e))
+# Funciones de los trabajos: corren en el planificador y reciben su contexto
+def _trabajo_cargar_ciudad(contexto, ciudad):
+    # Grafo, índice espacial, hospitales del archivo y puntos de origen (que
+    # consultan el servicio de ubicación: mejor fuera del hilo de la interfaz)
+    return registro_ciudades.obtener(ciudad, progreso=contexto.progreso)
+
+def _trabajo_cargar_hospitales(contexto, ciudad):
+    contexto.progreso("Buscando hospitales...")
+    return obtener_hospitales()
+
+def _trabajo_calcular_rutas(contexto, G, nodo_origen, hospitales):
+    contexto.progreso("Calculando rutas más cortas...")
+    return procesar_rutas_hospitales(G, nodo_origen, hospitales)
+
+def _trabajo_renderizar(contexto, G, nodo_origen, resultado):
+    contexto.progreso("Preparando mapa...")
+    return datos_mapa(G, nodo_origen, resultado)
+
+def _trabajo_precargar(contexto, ciudad):
+    # Cada etapa informa su progreso, que a la vez es un punto de cancelación
+    return registro_ciudades.obtener(ciudad, progreso=contexto.progreso)
+
+def _trabajo_precalentar(contexto, ciudades):
+    return registro_ciudades.precalentar(ciudades, cancelado=lambda: contexto.cancelado)
 
 class VentanaPrincipal(QMainWindow):
-    def __init__(self):
+    def __init__(self, inicio_aplicacion=None):
         super().__init__()
         self.G = None
+        self.ciudad = None
+        self.datos_ciudad = None
         self.hospitales = []
         self.nodos_principales = []
-        self.worker = None
+        
+        # Trabajos en segundo plano: la ciudad y las rutas tienen su propia clave,
+        # así un pedido nuevo reemplaza al anterior del mismo tipo
+        self.planificador = PlanificadorTrabajos(trabajadores=2, parent=self)
+        self.planificador.progreso.connect(self.on_progress)
+        self.planificador.actividad.connect(self.on_actividad)
+        
+        # time.perf_counter() al iniciar el proceso, para informar el arranque en frío
+        self.inicio_aplicacion = inicio_aplicacion or time.perf_counter()
+        
+        # La página del mapa se carga una vez; los resultados se envían por runJavaScript
+        self.mapa_listo = False
+        self.datos_mapa_pendientes = None
         
         self.init_ui()
         self.cargar_datos_iniciales()
+        self.precargar_ciudad_default()
     
     def init_ui(self):
         """
@@ -118,8 +124,10 @@ class VentanaPrincipal(QMainWindow):
         # Selector de ciudad
         config_layout.addWidget(QLabel("Ciudad:"), 0, 0)
         self.ciudad_combo = QComboBox()
-        self.ciudad_combo.addItems([CIUDAD_DEFAULT, "Arequipa, Peru", "Cusco, Peru", "Trujillo, Peru"])
+        self.ciudad_combo.addItems([CIUDAD_DEFAULT, "Juliaca, Peru", "Arequipa, Peru", "Cusco, Peru", "Trujillo, Peru"])
         self.ciudad_combo.setEditable(True)
+        # Elegir una ciudad que ya está en memoria la activa al instante
+        self.ciudad_combo.activated.connect(self.on_ciudad_elegida)
         config_layout.addWidget(self.ciudad_combo, 0, 1)
         
         # Botón para cargar datos
@@ -194,6 +202,7 @@ class VentanaPrincipal(QMainWindow):
         
         # Vista web para el mapa
         self.web_view = QWebEngineView()
+        self.web_view.loadFinished.connect(self.on_mapa_cargado)
         map_layout.addWidget(self.web_view)
         
         # Cargar mapa inicial
@@ -249,15 +258,40 @@ class VentanaPrincipal(QMainWindow):
     
     def cargar_mapa_inicial(self):
         """
-        Carga un mapa inicial centrado en Lima
+        Carga la página de mapa persistente centrada en la ciudad por defecto
         """
         try:
-            archivo_mapa = generar_mapa_simple(-15.8402, -70.0219)
+            archivo_mapa = generar_mapa_base()
             if archivo_mapa and os.path.exists(archivo_mapa):
                 self.web_view.load(QUrl.fromLocalFile(os.path.abspath(archivo_mapa)))
         except Exception as e:
             print(f"Error cargando mapa inicial: {e}")
     
+    def on_mapa_cargado(self, ok):
+        """
+        La página del mapa terminó de cargar: enviar lo que haya quedado pendiente
+        """
+        self.mapa_listo = ok
+        if ok and self.datos_mapa_pendientes is not None:
+            datos, self.datos_mapa_pendientes = self.datos_mapa_pendientes, None
+            self.actualizar_mapa(datos)
+    
+    def actualizar_mapa(self, datos):
+        """
+        Reemplaza rutas y marcadores en la página ya cargada (sin recargarla)
+        """
+        if not self.mapa_listo:
+            self.datos_mapa_pendientes = datos
+            return
+        with metricas.tramo('serializar_mapa'):
+            script = f"actualizarMapa({json.dumps(datos, separators=(',', ':'))}, true);"
+        
+        # runJavaScript es asíncrono: el tramo termina cuando la página responde
+        inicio = time.perf_counter()
+        self.web_view.page().runJavaScript(
+            script, lambda _: metricas.observar('etapa_segundos', time.perf_counter() - inicio,
+                                                etapa='actualizar_vista'))
+    
     def cargar_datos_iniciales(self):
         """
         Intenta cargar datos guardados previamente
@@ -271,6 +305,31 @@ class VentanaPrincipal(QMainWindow):
         except Exception as e:
             print(f"Error cargando datos iniciales: {e}")
     
+    def precargar_ciudad_default(self):
+        """
+        Carga en segundo plano el grafo, el índice espacial y los hospitales
+        de la ciudad por defecto mientras la ventana ya está visible
+        """
+        self.planificador.enviar(PRECARGAR, _trabajo_precargar, CIUDAD_DEFAULT,
+                                 al_terminar=self.on_precarga_lista, al_fallar=self.on_error,
+                                 clave='ciudad')
+    
+    def on_precarga_lista(self, datos):
+        """
+        Callback de la precarga: deja la ciudad por defecto lista para calcular
+        """
+        if not datos:
+            self.status_label.setText("No se pudo precargar la ciudad; usa Cargar Datos")
+            return
+        
+        self.aplicar_ciudad(CIUDAD_DEFAULT, datos)
+        
+        total = time.perf_counter() - self.inicio_aplicacion
+        detalle = ", ".join(f"{etapa} {segundos:.2f} s" for etapa, segundos in datos['tiempos'].items())
+        print(f"⏱️ Precarga de {CIUDAD_DEFAULT}: {detalle}")
+        print(f"⏱️ Listo para calcular rutas {total:.2f} s después del inicio")
+        self.status_label.setText(f"{CIUDAD_DEFAULT} lista en {total:.1f} s")
+    
     def cargar_datos_ciudad(self):
         """
         Carga los datos de la ciudad seleccionada
@@ -280,54 +339,73 @@ class VentanaPrincipal(QMainWindow):
             QMessageBox.warning(self, "Error", "Por favor selecciona una ciudad")
             return
         
-        self.btn_cargar_datos.setEnabled(False)
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setRange(0, 0)  # Progreso indeterminado
+        # Ciudad ya residente: cambio inmediato, sin leer el disco
+        if registro_ciudades.residente(ciudad):
+            self.planificador.cancelar('ciudad')
+            self.aplicar_ciudad(ciudad, registro_ciudades.obtener(ciudad))
+            return
         
-        # Cargar grafo
-        self.worker = WorkerThread('cargar_grafo', ciudad)
-        self.worker.finished.connect(self.on_grafo_cargado)
-        self.worker.error.connect(self.on_error)
-        self.worker.progress.connect(self.on_progress)
-        self.worker.start()
+        # Cargar grafo (reemplaza a la precarga o a una carga anterior en curso)
+        self.planificador.enviar(CARGAR_GRAFO, _trabajo_cargar_ciudad, ciudad,
+                                 al_terminar=lambda datos: self.on_grafo_cargado(datos, ciudad),
+                                 al_fallar=self.on_error, clave='ciudad')
+    
+    def on_ciudad_elegida(self, _indice):
+        ciudad = self.ciudad_combo.currentText().strip()
+        if ciudad != self.ciudad and registro_ciudades.residente(ciudad):
+            self.cargar_datos_ciudad()
     
-    def on_grafo_cargado(self, grafo):
+    def on_grafo_cargado(self, datos, ciudad):
         """
         Callback cuando el grafo ha sido cargado
         """
-        if grafo:
-            self.G = grafo
-            self.status_label.setText("Grafo cargado exitosamente")
-            
-            # Obtener nodos principales
-            self.nodos_principales = obtener_nodos_principales(self.G)
-            self.actualizar_combo_origen()
+        if datos:
+            self.aplicar_ciudad(ciudad, datos)
             
-            # Cargar hospitales
-            ciudad = self.ciudad_combo.currentText().strip()
-            self.worker = WorkerThread('cargar_hospitales', ciudad)
-            self.worker.finished.connect(self.on_hospitales_cargados)
-            self.worker.error.connect(self.on_error)
-            self.worker.progress.connect(self.on_progress)
-            self.worker.start()
+            # Sin hospitales guardados: buscarlos
+            if not datos['hospitales']:
+                self.planificador.enviar(CARGAR_HOSPITALES, _trabajo_cargar_hospitales, ciudad,
+                                         al_terminar=self.on_hospitales_cargados,
+                                         al_fallar=self.on_error, clave='ciudad')
         else:
             self.on_error("No se pudo cargar el grafo")
     
+    def aplicar_ciudad(self, ciudad, datos):
+        """
+        Activa una ciudad cargada (grafo, puntos de origen y hospitales) y
+        precalienta en segundo plano las ciudades probables
+        """
+        # Las rutas pedidas sobre el grafo anterior ya no sirven
+        self.planificador.cancelar('rutas')
+        
+        self.ciudad = ciudad
+        self.datos_ciudad = datos
+        self.G = datos['G']
+        self.nodos_principales = datos['nodos_principales']
+        self.actualizar_combo_origen()
+        if datos['hospitales']:
+            self.hospitales = datos['hospitales']
+            self.actualizar_lista_hospitales()
+            self.btn_calcular.setEnabled(True)
+        self.status_label.setText(f"{ciudad} lista")
+        
+        self.planificador.enviar(PRECALENTAR, _trabajo_precalentar, ciudades_probables(ciudad),
+                                 visible=False)
+    
     def on_hospitales_cargados(self, hospitales):
         """
         Callback cuando los hospitales han sido cargados
         """
         if hospitales:
             self.hospitales = hospitales
+            if self.datos_ciudad is not None:
+                self.datos_ciudad['hospitales'] = hospitales
             guardar_hospitales(hospitales)  # Guardar para uso futuro
             self.actualizar_lista_hospitales()
             self.status_label.setText(f"Cargados {len(hospitales)} hospitales")
             self.btn_calcular.setEnabled(True)
         else:
             self.on_error("No se encontraron hospitales")
-        
-        self.progress_bar.setVisible(False)
-        self.btn_cargar_datos.setEnabled(True)
     
     def actualizar_combo_origen(self):
         """
@@ -376,18 +454,14 @@ class VentanaPrincipal(QMainWindow):
         else:
             hospitales_seleccionados = self.hospitales
         
-        # Calcular rutas
-        self.btn_calcular.setEnabled(False)
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setRange(0, 0)
-        
-        self.worker = WorkerThread('calcular_rutas', self.G, nodo_origen, hospitales_seleccionados)
-        self.worker.finished.connect(self.on_rutas_calculadas)
-        self.worker.error.connect(self.on_error)
-        self.worker.progress.connect(self.on_progress)
-        self.worker.start()
+        # Calcular rutas: si se vuelve a pulsar, solo cuenta el último pedido
+        G = self.G
+        self.planificador.enviar(CALCULAR_RUTAS, _trabajo_calcular_rutas, G, nodo_origen,
+                                 hospitales_seleccionados,
+                                 al_terminar=lambda resultado: self.on_rutas_calculadas(G, nodo_origen, resultado),
+                                 al_fallar=self.on_error, clave='rutas')
     
-    def on_rutas_calculadas(self, resultado):
+    def on_rutas_calculadas(self, G, nodo_origen, resultado):
         """
         Callback cuando las rutas han sido calculadas
         """
@@ -395,20 +469,23 @@ class VentanaPrincipal(QMainWindow):
             # Mostrar resultados
             self.mostrar_resultados(resultado)
             
-            # Generar mapa
-            nodo_origen = self.origen_combo.currentData()
-            archivo_mapa = generar_mapa_html(self.G, nodo_origen, resultado)
-            
-            if archivo_mapa and os.path.exists(archivo_mapa):
-                self.web_view.load(QUrl.fromLocalFile(os.path.abspath(archivo_mapa)))
-                self.status_label.setText("Rutas calculadas y mapa generado")
-            else:
-                self.status_label.setText("Rutas calculadas pero error generando mapa")
+            # Preparar los datos del mapa en segundo plano y actualizarlo en su lugar
+            self.planificador.enviar(RENDERIZAR, _trabajo_renderizar, G, nodo_origen, resultado,
+                                     al_terminar=self.on_mapa_renderizado,
+                                     al_fallar=self.on_error_mapa, clave='rutas')
         else:
             self.on_error("No se pudieron calcular las rutas")
-        
-        self.progress_bar.setVisible(False)
-        self.btn_calcular.setEnabled(True)
+    
+    def on_mapa_renderizado(self, datos):
+        """
+        Callback cuando los datos del mapa están listos
+        """
+        self.actualizar_mapa(datos)
+        self.status_label.setText("Rutas calculadas y mapa actualizado")
+    
+    def on_error_mapa(self, mensaje):
+        print(f"Error actualizando mapa: {mensaje}")
+        self.status_label.setText("Rutas calculadas pero error actualizando mapa")
     
     def mostrar_resultados(self, resultado):
         """
@@ -424,10 +501,11 @@ class VentanaPrincipal(QMainWindow):
             texto_resultados += f"Distancia máxima: {stats['distancia_maxima']:.0f}m\n"
             texto_resultados += f"Distancia promedio: {stats['distancia_promedio']:.0f}m\n\n"
         
-        # Detalles de cada ruta
+        # Detalles de cada ruta (ordenadas por el mismo criterio que el más cercano)
+        criterio = 'tiempo' if PESO_RUTEO == 'travel_time' else 'longitud'
         rutas_ordenadas = sorted(
             resultado['rutas'].items(),
-            key=lambda x: x[1]['longitud']
+            key=lambda x: x[1][criterio]
         )
         
         for i, (nodo, ruta_info) in enumerate(rutas_ordenadas):
@@ -445,19 +523,29 @@ class VentanaPrincipal(QMainWindow):
         
         self.resultados_text.setPlainText(texto_resultados)
     
-    def on_progress(self, mensaje):
+    def on_progress(self, trabajo, mensaje, fraccion):
         """
         Actualiza el mensaje de progreso
         """
         self.status_label.setText(mensaje)
+        if fraccion is None:
+            self.progress_bar.setRange(0, 0)
+        else:
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(int(fraccion * 100))
+    
+    def on_actividad(self, pendientes):
+        """
+        Muestra la barra de progreso mientras haya trabajos en curso
+        """
+        if pendientes and self.progress_bar.isHidden():
+            self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(pendientes > 0)
     
     def on_error(self, mensaje):
         """
         Maneja errores
         """
-        self.progress_bar.setVisible(False)
-        self.btn_cargar_datos.setEnabled(True)
-        self.btn_calcular.setEnabled(True)
         self.status_label.setText(f"Error: {mensaje}")
         QMessageBox.critical(self, "Error", mensaje)
     
@@ -465,7 +553,6 @@ class VentanaPrincipal(QMainWindow):
         """
         Limpia recursos al cerrar la aplicación
         """
-        if self.worker and self.worker.isRunning():
-            self.worker.terminate()
-            self.worker.wait()
+        # Cancelación cooperativa: los trabajos abandonan en su próximo punto de control
+        self.planificador.cerrar()
         event.accept()
\ No newline at end of file